@@ -12,8 +12,18 @@ def create_app(config_name='default'):
     # Cargar configuración
     app.config.from_object(config[config_name])
     
+    # Proveedor JSON (orjson si está disponible)
+    from .json_provider import init_json
+    init_json(app)
+    
     # Inicializar extensiones
+    from .db_pool import configure_engine, init_pool
+    configure_engine(app)
     db.init_app(app)
+    init_pool(app, db)
+    
+    from .instrumentation import init_instrumentation
+    init_instrumentation(app, db)
     migrate = Migrate(app, db)
     
     # Configurar Flask-Login
@@ -46,6 +56,48 @@ def create_app(config_name='default'):
     from .api import bp as api_bp
     app.register_blueprint(api_bp)
     
+    # Comandos CLI
+    from .search import search_cli, ensure_search_index
+    app.cli.add_command(search_cli)
+    
+    from .counters import counters_cli
+    app.cli.add_command(counters_cli)
+    
+    from .images import images_cli, image_src, image_srcset
+    app.cli.add_command(images_cli)
+    app.jinja_env.globals.update(image_src=image_src, image_srcset=image_srcset)
+    
+    from .uploads import uploads_cli, init_uploads
+    init_uploads(app)
+    app.cli.add_command(uploads_cli)
+    
+    from .compression import assets_cli, init_compression
+    init_compression(app)
+    app.cli.add_command(assets_cli)
+    
+    from .content import content_cli
+    app.cli.add_command(content_cli)
+    
+    from .export import export_command
+    app.cli.add_command(export_command)
+    
+    from .importer import import_command
+    app.cli.add_command(import_command)
+    
+    from .seed import seed_command
+    app.cli.add_command(seed_command)
+    
+    from .stats import stats_cli
+    app.cli.add_command(stats_cli)
+    
+    from .query_log import queries_cli
+    app.cli.add_command(queries_cli)
+    
+    # Caché de respuestas
+    from .cache import cache_cli, init_cache
+    init_cache(app)
+    app.cli.add_command(cache_cli)
+    
     # Configurar CORS para el blueprint API
     CORS(app, resources={r"/api/*": {"origins": app.config['CORS_ORIGINS']}})
     
@@ -54,6 +106,7 @@ def create_app(config_name='default'):
         try:
             db.create_all()
             print("Tablas creadas/verficadas exitosamente")
+            ensure_search_index()
         except Exception as e:
             print(f"Error al crear tablas: {e}")
             # En producción, las migraciones deberían manejar esto
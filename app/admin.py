@@ -1,8 +1,14 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, jsonify
 from flask_login import login_required, current_user
 from .decorators import admin_required
 from .models import db, User, Post, Comment
-from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from .pagination import paginate_listing, InvalidCursor
+from .cache import get_cache
+from .db_pool import pool_info
+from .stats import dashboard_stats
+from .tokens import revoke_tokens
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -11,40 +17,28 @@ bp = Blueprint('admin', __name__, url_prefix='/admin')
 @admin_required
 def dashboard():
     """Panel de administración principal"""
-    # Estadísticas generales
-    total_users = User.query.count()
-    total_posts = Post.query.count()
-    total_comments = Comment.query.count()
+    # Totales, categorías y altas diarias desde la instantánea (app/stats.py)
+    stats = dashboard_stats()
     
-    # Usuarios recientes
-    recent_users = User.query.order_by(User.created_at.desc()).limit(5).all()
-    
-    # Publicaciones recientes
-    recent_posts = Post.query.order_by(Post.created_at.desc()).limit(5).all()
-    
-    # Estadísticas por categoría
-    category_stats = db.session.query(
-        Post.category,
-        func.count(Post.id).label('count')
-    ).group_by(Post.category).all()
+    # Usuarios y publicaciones recientes (índices sobre created_at)
+    recent_users = User.query.order_by(User.created_at.desc(), User.id.desc()).limit(5).all()
+    recent_posts = Post.query.options(joinedload(Post.author)) \
+        .order_by(Post.created_at.desc(), Post.id.desc()).limit(5).all()
     
     return render_template('admin/dashboard.html',
-                         total_users=total_users,
-                         total_posts=total_posts,
-                         total_comments=total_comments,
                          recent_users=recent_users,
                          recent_posts=recent_posts,
-                         category_stats=category_stats)
+                         **stats)
 
 @bp.route('/users')
 @login_required
 @admin_required
 def users():
     """Gestión de usuarios"""
-    page = request.args.get('page', 1, type=int)
-    pagination = User.query.order_by(User.created_at.desc()).paginate(
-        page=page, per_page=20, error_out=False
-    )
+    try:
+        pagination = paginate_listing(select(User), User, per_page=20)
+    except InvalidCursor:
+        abort(400)
     users = pagination.items
     return render_template('admin/users.html', users=users, pagination=pagination)
 
@@ -66,6 +60,7 @@ def change_role(user_id):
         return redirect(url_for('admin.users'))
     
     user.role = new_role
+    revoke_tokens(user)
     db.session.commit()
     
     flash(f'Rol de {user.username} cambiado a {new_role}.', 'success')
@@ -84,6 +79,7 @@ def toggle_active(user_id):
         return redirect(url_for('admin.users'))
     
     user.is_active = not user.is_active
+    revoke_tokens(user)
     db.session.commit()
     
     status = 'activado' if user.is_active else 'desactivado'
@@ -95,10 +91,10 @@ def toggle_active(user_id):
 @admin_required
 def posts():
     """Gestión de publicaciones"""
-    page = request.args.get('page', 1, type=int)
-    pagination = Post.query.order_by(Post.created_at.desc()).paginate(
-        page=page, per_page=20, error_out=False
-    )
+    try:
+        pagination = paginate_listing(select(Post).options(joinedload(Post.author)), Post, per_page=20)
+    except InvalidCursor:
+        abort(400)
     posts = pagination.items
     return render_template('admin/posts.html', posts=posts, pagination=pagination)
 
@@ -107,9 +103,23 @@ def posts():
 @admin_required
 def comments():
     """Gestión de comentarios"""
-    page = request.args.get('page', 1, type=int)
-    pagination = Comment.query.order_by(Comment.created_at.desc()).paginate(
-        page=page, per_page=20, error_out=False
-    )
+    try:
+        pagination = paginate_listing(select(Comment).options(joinedload(Comment.author)), Comment, per_page=20)
+    except InvalidCursor:
+        abort(400)
     comments = pagination.items
     return render_template('admin/comments.html', comments=comments, pagination=pagination)
+
+@bp.route('/cache')
+@login_required
+@admin_required
+def cache_stats():
+    """Estadísticas de la caché de respuestas"""
+    return jsonify(get_cache().info())
+
+@bp.route('/db-pool')
+@login_required
+@admin_required
+def db_pool_stats():
+    """Estadísticas del pool de conexiones del proceso"""
+    return jsonify(pool_info())
@@ -1,10 +1,26 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, stream_with_context
 from flask_cors import CORS
 from functools import wraps
 import jwt
-from datetime import datetime, timedelta
-from werkzeug.security import check_password_hash
+from sqlalchemy import insert, select
+from sqlalchemy.orm import joinedload
 from .models import db, User, Post, Comment
+from .tags import parse_tag_names, set_post_tags, tag_posts_statement, tag_cloud, get_tag_or_404
+from . import counters, stats
+from .cache import cached, invalidate
+from .conditional import conditional, post_validator, post_list_validator
+from .search import index_post, index_new_posts, remove_post, search_statement, tokenize_query
+from .pagination import paginate_listing, pagination_meta, per_page_arg, InvalidCursor
+from .passwords import PasswordPoolBusy
+from .uploads import release_upload
+from .content import render_post, enqueue_render, rendered_fields, render_stored
+from .tokens import TokenIdentity, TokenError, decode_token, create_access_token, create_refresh_token
+from .background import submit
+from .export import EXPORTS, iter_lines, iter_chunks, parse_since
+from .json_provider import json_response
+from .serializers import (POST_LIST_FIELDS, POST_DETAIL_FIELDS, POST_WRITE_FIELDS, COMMENT_WRITE_FIELDS,
+                          USER_TOKEN_FIELDS, parse_fields, post_load_options, serialize_post, post_fragment,
+                          post_list_fragment, serialize_comment, serialize_tag, serialize_user)
 
 bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -12,7 +28,11 @@ bp = Blueprint('api', __name__, url_prefix='/api')
 CORS(bp)
 
 def token_required(f):
-    """Decorador para requerir token JWT"""
+    """Decorador para requerir token JWT.
+    
+    La autorización usa solo los claims del token (sin consultar el usuario);
+    la vista recibe un ``TokenIdentity``.
+    """
     @wraps(f)
     def decorated(*args, **kwargs):
         token = request.headers.get('Authorization')
@@ -20,28 +40,67 @@ def token_required(f):
         if not token:
             return jsonify({'error': 'Token faltante'}), 401
         
+        # Remover 'Bearer ' si está presente
+        if token.startswith('Bearer '):
+            token = token[7:]
+        
         try:
-            # Remover 'Bearer ' si está presente
-            if token.startswith('Bearer '):
-                token = token[7:]
-            
-            # Decodificar token
-            from flask import current_app
-            data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.get(data['user_id'])
-            
-            if not current_user:
-                return jsonify({'error': 'Usuario no encontrado'}), 401
-                
+            current_user = TokenIdentity(decode_token(token))
         except jwt.ExpiredSignatureError:
             return jsonify({'error': 'Token expirado'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Token inválido'}), 401
+        except TokenError as e:
+            return jsonify({'error': str(e)}), 401
         
         return f(current_user, *args, **kwargs)
     
     return decorated
 
+def token_response(user):
+    """Respuesta con tokens de acceso y refresco"""
+    return jsonify({
+        'token': create_access_token(user),
+        'refresh_token': create_refresh_token(user),
+        'expires_in': int(current_app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds()),
+        'user': serialize_user(user, USER_TOKEN_FIELDS)
+    }), 200
+
+def batch_items(key):
+    """Extraer la lista de elementos de una petición por lotes.
+    
+    Retorna ``(items, error_response)``.
+    """
+    data = request.get_json(silent=True)
+    items = data.get(key) if isinstance(data, dict) else None
+    
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({'error': f'Lista {key} requerida'}), 400)
+    
+    limit = current_app.config['API_BATCH_MAX_ITEMS']
+    if len(items) > limit:
+        return None, (jsonify({'error': f'Máximo {limit} elementos por lote'}), 413)
+    
+    return items, None
+
+def batch_response(results):
+    """Respuesta con el resultado de cada elemento en el orden recibido"""
+    created = sum(1 for result in results if 'id' in result)
+    return jsonify({
+        'created': created,
+        'failed': len(results) - created,
+        'results': results
+    }), 201 if created else 400
+
+def text_field(item, name, max_length, required=True):
+    """Validar un campo de texto de un elemento de lote; retorna (valor, error)"""
+    value = item.get(name)
+    if value is None or value == '':
+        return None, (f'{name} requerido' if required else None)
+    if not isinstance(value, str):
+        return None, f'{name} debe ser texto'
+    if max_length and len(value) > max_length:
+        return None, f'{name} supera {max_length} caracteres'
+    return value, None
+
 # ==================== AUTENTICACIÓN ====================
 
 @bp.route('/auth/login', methods=['POST'])
@@ -54,79 +113,87 @@ def login():
     
     user = User.query.filter_by(username=data['username']).first()
     
-    if not user or not user.check_password(data['password']):
+    try:
+        valid = user is not None and user.check_password(data['password'])
+    except PasswordPoolBusy as e:
+        return jsonify({'error': 'Servidor ocupado, reintentar'}), 503, {'Retry-After': str(e.retry_after)}
+    
+    if not valid:
         return jsonify({'error': 'Credenciales inválidas'}), 401
     
-    # Generar token
-    from flask import current_app
-    token = jwt.encode({
-        'user_id': user.id,
-        'exp': datetime.utcnow() + current_app.config['JWT_ACCESS_TOKEN_EXPIRES']
-    }, current_app.config['JWT_SECRET_KEY'], algorithm='HS256')
+    # Guardar el hash actualizado si se volvió a hashear
+    if db.session.is_modified(user):
+        db.session.commit()
     
-    return jsonify({
-        'token': token,
-        'user': {
-            'id': user.id,
-            'username': user.username,
-            'email': user.email,
-            'role': user.role
-        }
-    }), 200
+    if not user.is_active:
+        return jsonify({'error': 'Usuario desactivado'}), 403
+    
+    return token_response(user)
+
+@bp.route('/auth/refresh', methods=['POST'])
+def refresh():
+    """Obtener un nuevo token de acceso con un token de refresco"""
+    data = request.get_json()
+    
+    if not data or not data.get('refresh_token'):
+        return jsonify({'error': 'refresh_token requerido'}), 400
+    
+    try:
+        claims = decode_token(data['refresh_token'], token_type='refresh')
+    except jwt.ExpiredSignatureError:
+        return jsonify({'error': 'Token expirado'}), 401
+    except TokenError as e:
+        return jsonify({'error': str(e)}), 401
+    
+    # Se consulta el usuario para emitir los claims vigentes (rol, estado)
+    user = db.session.get(User, claims['user_id'])
+    if not user or not user.is_active:
+        return jsonify({'error': 'Usuario desactivado'}), 401
+    
+    return token_response(user)
 
 # ==================== PUBLICACIONES ====================
 
 @bp.route('/posts', methods=['GET'])
+@conditional(post_list_validator)
+@cached(tags=lambda: ['posts'])
 def get_posts():
-    """Listar todas las publicaciones"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
+    """Listar todas las publicaciones.
     
-    pagination = Post.query.order_by(Post.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    Por defecto sin el contenido completo; ``?fields=id,title,...`` elige los campos.
+    """
+    per_page = per_page_arg()
     
-    posts = [{
-        'id': post.id,
-        'title': post.title,
-        'content': post.content,
-        'category': post.category,
-        'image_url': post.image_url,
-        'created_at': post.created_at.isoformat(),
-        'updated_at': post.updated_at.isoformat(),
-        'author': {
-            'id': post.author.id,
-            'username': post.author.username
-        }
-    } for post in pagination.items]
+    try:
+        fields = parse_fields(request.args.get('fields'), POST_LIST_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify({
-        'posts': posts,
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': pagination.page
-    }), 200
+    try:
+        pagination = paginate_listing(select(Post).options(*post_load_options(fields)), Post, per_page)
+    except InvalidCursor:
+        return jsonify({'error': 'Cursor inválido'}), 400
+    
+    return json_response({
+        'posts': post_list_fragment(pagination.items, fields),
+        **pagination_meta(pagination)
+    })
 
 @bp.route('/posts/<int:post_id>', methods=['GET'])
+@conditional(post_validator)
+@cached(tags=lambda post_id: [f'post:{post_id}'])
 def get_post(post_id):
     """Obtener una publicación específica"""
-    post = Post.query.get_or_404(post_id)
+    try:
+        fields = parse_fields(request.args.get('fields'), POST_DETAIL_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify({
-        'id': post.id,
-        'title': post.title,
-        'content': post.content,
-        'category': post.category,
-        'image_url': post.image_url,
-        'created_at': post.created_at.isoformat(),
-        'updated_at': post.updated_at.isoformat(),
-        'author': {
-            'id': post.author.id,
-            'username': post.author.username,
-            'email': post.author.email
-        },
-        'comments_count': len(post.comments)
-    }), 200
+    post = db.first_or_404(
+        select(Post).options(*post_load_options(fields, detail=True)).where(Post.id == post_id)
+    )
+    
+    return json_response(post_fragment(post, fields, detail=True))
 
 @bp.route('/posts', methods=['POST'])
 @token_required
@@ -137,6 +204,11 @@ def create_post(current_user):
     if not data or not data.get('title') or not data.get('content'):
         return jsonify({'error': 'Título y contenido requeridos'}), 400
     
+    try:
+        tag_names = parse_tag_names(data.get('tags'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     post = Post(
         title=data['title'],
         content=data['content'],
@@ -144,17 +216,18 @@ def create_post(current_user):
         user_id=current_user.id
     )
     
+    render_post(post)
     db.session.add(post)
+    index_post(post)
+    counters.post_created(post)
+    if tag_names:
+        set_post_tags(post, tag_names)
     db.session.commit()
+    enqueue_render(post)
     
     return jsonify({
         'message': 'Publicación creada',
-        'post': {
-            'id': post.id,
-            'title': post.title,
-            'content': post.content,
-            'category': post.category
-        }
+        'post': serialize_post(post, POST_WRITE_FIELDS)
     }), 201
 
 @bp.route('/posts/<int:post_id>', methods=['PUT'])
@@ -168,6 +241,11 @@ def update_post(current_user, post_id):
     
     data = request.get_json()
     
+    try:
+        tag_names = parse_tag_names(data['tags']) if 'tags' in data else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     if data.get('title'):
         post.title = data['title']
     if data.get('content'):
@@ -175,16 +253,17 @@ def update_post(current_user, post_id):
     if data.get('category'):
         post.category = data['category']
     
+    if data.get('content'):
+        render_post(post)
+    index_post(post)
+    if tag_names is not None:
+        set_post_tags(post, tag_names)
     db.session.commit()
+    enqueue_render(post)
     
     return jsonify({
         'message': 'Publicación actualizada',
-        'post': {
-            'id': post.id,
-            'title': post.title,
-            'content': post.content,
-            'category': post.category
-        }
+        'post': serialize_post(post, POST_WRITE_FIELDS)
     }), 200
 
 @bp.route('/posts/<int:post_id>', methods=['DELETE'])
@@ -196,27 +275,134 @@ def delete_post(current_user, post_id):
     if post.user_id != current_user.id:
         return jsonify({'error': 'No autorizado'}), 403
     
+    image_url = post.image_url
+    remove_post(post.id)
+    counters.post_deleted(post)
     db.session.delete(post)
     db.session.commit()
+    release_upload(image_url)
     
     return jsonify({'message': 'Publicación eliminada'}), 200
 
+@bp.route('/posts/batch', methods=['POST'])
+@token_required
+def create_posts_batch(current_user):
+    """Crear varias publicaciones en una sola transacción"""
+    items, error = batch_items('posts')
+    if error:
+        return error
+    
+    results = [None] * len(items)
+    rows = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = {'index': index, 'error': 'Elemento inválido'}
+            continue
+        
+        title, title_error = text_field(item, 'title', 200)
+        content, content_error = text_field(item, 'content', None)
+        category, category_error = text_field(item, 'category', 50, required=False)
+        error = title_error or content_error or category_error
+        if error:
+            results[index] = {'index': index, 'error': error}
+            continue
+        
+        rows.append((index, {
+            'title': title,
+            'content': content,
+            'category': category or 'otros',
+            'user_id': current_user.id,
+            **rendered_fields(content)
+        }))
+    
+    if rows:
+        ids = db.session.scalars(
+            insert(Post).returning(Post.id, sort_by_parameter_order=True),
+            [values for _, values in rows]
+        ).all()
+        index_new_posts([(post_id, values['title'], values['content'])
+                         for post_id, (_, values) in zip(ids, rows)])
+        counters.posts_created(current_user.id, len(ids))
+        stats.posts_added([values['category'] for _, values in rows])
+        db.session.commit()
+        invalidate('posts')
+        
+        for post_id, (index, values) in zip(ids, rows):
+            results[index] = {'index': index, 'id': post_id}
+            # Cuerpos grandes: HTML en segundo plano
+            if values['content_html'] is None:
+                submit(render_stored, post_id)
+    
+    return batch_response(results)
+
+@bp.route('/search', methods=['GET'])
+def search():
+    """Buscar publicaciones por relevancia"""
+    query = request.args.get('q', '')
+    per_page = per_page_arg()
+    
+    if not query.strip():
+        return jsonify({'error': 'Parámetro q requerido'}), 400
+    
+    try:
+        fields = parse_fields(request.args.get('fields'), POST_LIST_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    stmt, order_by = search_statement(query)
+    try:
+        pagination = paginate_listing(stmt.options(*post_load_options(fields)), Post, per_page, order_by=order_by,
+                                      count_key=('search', *tokenize_query(query)))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return json_response({
+        'query': query,
+        'posts': post_list_fragment(pagination.items, fields),
+        **pagination_meta(pagination)
+    })
+
+# ==================== ETIQUETAS ====================
+
+@bp.route('/tags', methods=['GET'])
+@cached(tags=lambda: ['posts'])
+def get_tags():
+    """Etiquetas más usadas con su número de publicaciones"""
+    return jsonify({'tags': [serialize_tag(tag) for tag in tag_cloud()]}), 200
+
+@bp.route('/tags/<slug>/posts', methods=['GET'])
+@cached(tags=lambda slug: ['posts'])
+def get_tag_posts(slug):
+    """Listar las publicaciones de una etiqueta"""
+    per_page = per_page_arg()
+    
+    try:
+        fields = parse_fields(request.args.get('fields'), POST_LIST_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    tag = get_tag_or_404(slug)
+    try:
+        pagination = paginate_listing(tag_posts_statement(tag).options(*post_load_options(fields)), Post, per_page,
+                                      total=tag.posts_count)
+    except InvalidCursor:
+        return jsonify({'error': 'Cursor inválido'}), 400
+    
+    return json_response({
+        'tag': serialize_tag(tag),
+        'posts': post_list_fragment(pagination.items, fields),
+        **pagination_meta(pagination)
+    })
+
 # ==================== COMENTARIOS ====================
 
 @bp.route('/posts/<int:post_id>/comments', methods=['GET'])
 def get_comments(post_id):
     """Obtener comentarios de una publicación"""
     post = Post.query.get_or_404(post_id)
+    query = Comment.query.options(joinedload(Comment.author)).filter_by(post_id=post.id)
     
-    comments = [{
-        'id': comment.id,
-        'content': comment.content,
-        'created_at': comment.created_at.isoformat(),
-        'author': {
-            'id': comment.author.id,
-            'username': comment.author.username
-        }
-    } for comment in post.comments.order_by(Comment.created_at.desc()).all()]
+    comments = [serialize_comment(comment) for comment in query.order_by(Comment.created_at.desc()).all()]
     
     return jsonify({'comments': comments}), 200
 
@@ -237,16 +423,88 @@ def create_comment(current_user, post_id):
     )
     
     db.session.add(comment)
+    counters.comment_created(comment)
     db.session.commit()
     
     return jsonify({
         'message': 'Comentario creado',
-        'comment': {
-            'id': comment.id,
-            'content': comment.content
-        }
+        'comment': serialize_comment(comment, COMMENT_WRITE_FIELDS)
     }), 201
 
+@bp.route('/comments/batch', methods=['POST'])
+@token_required
+def create_comments_batch(current_user):
+    """Crear varios comentarios, en una o varias publicaciones, en una sola transacción"""
+    items, error = batch_items('comments')
+    if error:
+        return error
+    
+    # Validar todas las publicaciones referenciadas con una consulta
+    post_ids = {item.get('post_id') for item in items
+                if isinstance(item, dict) and isinstance(item.get('post_id'), int)}
+    existing = set(db.session.scalars(select(Post.id).where(Post.id.in_(post_ids)))) if post_ids else set()
+    
+    results = [None] * len(items)
+    rows = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = {'index': index, 'error': 'Elemento inválido'}
+            continue
+        
+        content, error = text_field(item, 'content', None)
+        post_id = item.get('post_id')
+        if not error and not (isinstance(post_id, int) and post_id in existing):
+            error = 'Publicación no encontrada'
+        if error:
+            results[index] = {'index': index, 'error': error}
+            continue
+        
+        rows.append((index, {
+            'content': content,
+            'post_id': post_id,
+            'user_id': current_user.id
+        }))
+    
+    if rows:
+        ids = db.session.scalars(
+            insert(Comment).returning(Comment.id, sort_by_parameter_order=True),
+            [values for _, values in rows]
+        ).all()
+        counters.comments_created([(values['post_id'], values['user_id']) for _, values in rows])
+        stats.comments_added(len(rows))
+        db.session.commit()
+        invalidate('posts', *{f"post:{values['post_id']}" for _, values in rows})
+        
+        for comment_id, (index, _) in zip(ids, rows):
+            results[index] = {'index': index, 'id': comment_id}
+    
+    return batch_response(results)
+
+# ==================== EXPORTACIÓN ====================
+
+@bp.route('/export/<kind>', methods=['GET'])
+@token_required
+def export(current_user, kind):
+    """Exportar publicaciones, comentarios o usuarios como NDJSON (solo admin)"""
+    if not current_user.is_admin():
+        return jsonify({'error': 'No autorizado'}), 403
+    if kind not in EXPORTS:
+        return jsonify({'error': 'Tipo de exportación desconocido'}), 404
+    
+    try:
+        since = parse_since(request.args.get('since'))
+    except ValueError:
+        return jsonify({'error': 'Parámetro since inválido'}), 400
+    
+    compress = request.accept_encodings['gzip'] > 0
+    body = stream_with_context(iter_chunks(iter_lines(kind, since), compress))
+    
+    response = current_app.response_class(body, mimetype='application/x-ndjson')
+    response.headers['Vary'] = 'Accept-Encoding'
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
 # ==================== USUARIOS ====================
 
 @bp.route('/users/<int:user_id>', methods=['GET'])
@@ -254,11 +512,4 @@ def get_user(user_id):
     """Obtener información de usuario"""
     user = User.query.get_or_404(user_id)
     
-    return jsonify({
-        'id': user.id,
-        'username': user.username,
-        'email': user.email,
-        'role': user.role,
-        'created_at': user.created_at.isoformat(),
-        'posts_count': len(user.posts)
-    }), 200
+    return jsonify(serialize_user(user)), 200
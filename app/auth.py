@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required, current_user
 from .models import db, User
+from .passwords import PasswordPoolBusy
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -37,7 +38,11 @@ def register():
         
         # Crear nuevo usuario
         user = User(username=username, email=email)
-        user.set_password(password)
+        try:
+            user.set_password(password)
+        except PasswordPoolBusy as e:
+            flash('El servidor está ocupado. Inténtalo de nuevo en unos segundos.', 'warning')
+            return render_template('auth/register.html'), 503, {'Retry-After': str(e.retry_after)}
         
         try:
             db.session.add(user)
@@ -74,7 +79,16 @@ def login():
         user = User.query.filter_by(email=email).first()
         
         # Verificar credenciales
-        if user and user.check_password(password):
+        try:
+            valid = user is not None and user.check_password(password)
+        except PasswordPoolBusy as e:
+            flash('El servidor está ocupado. Inténtalo de nuevo en unos segundos.', 'warning')
+            return render_template('auth/login.html'), 503, {'Retry-After': str(e.retry_after)}
+        
+        if valid:
+            # Guardar el hash actualizado si se volvió a hashear
+            if db.session.is_modified(user):
+                db.session.commit()
             login_user(user, remember=bool(remember))
             flash(f'¡Bienvenido, {user.username}!', 'success')
             
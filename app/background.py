@@ -0,0 +1,44 @@
+"""
+Trabajos en segundo plano dentro del proceso
+
+Un ``ThreadPoolExecutor`` por proceso para tareas que no deben retrasar la
+respuesta (variantes de imágenes, renderizado de contenido grande). Cada
+trabajo corre en su propio contexto de aplicación y sesión.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from .models import db
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config['BACKGROUND_WORKERS'],
+                    thread_name_prefix='background'
+                )
+    return _executor
+
+
+def submit(fn, *args):
+    """Ejecutar ``fn(*args)`` en segundo plano con la aplicación actual"""
+    app = current_app._get_current_object()
+    return _get_executor().submit(_run_in_app, app, fn, *args)
+
+
+def _run_in_app(app, fn, *args):
+    with app.app_context():
+        try:
+            return fn(*args)
+        except Exception:
+            app.logger.exception(f'Error en trabajo en segundo plano {fn.__name__}{args}')
+        finally:
+            db.session.remove()
@@ -0,0 +1,394 @@
+"""
+Caché de respuestas para páginas públicas y la API
+
+Backends intercambiables (``CACHE_BACKEND``):
+- ``memory``: LRU en memoria del proceso con TTL. Las invalidaciones no llegan
+  a los demás workers, así que solo sirve con un único proceso.
+- ``sqlite``: archivo SQLite compartido por todos los workers de gunicorn.
+- ``null``: sin caché.
+
+Cada respuesta se guarda con etiquetas (``posts``, ``post:<id>``). Al hacer
+commit de cambios en Post o Comment se invalidan exactamente las etiquetas
+afectadas, sin importar desde qué blueprint se escribió.
+
+Además hay una caché por proceso de fragmentos JSON por publicación
+(``FRAGMENT_CACHE_SIZE``), con las mismas etiquetas, que usa
+``app/serializers.py`` para armar los listados sin volver a serializar.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+import click
+from flask import current_app, has_app_context, make_response, request, session
+from flask.cli import AppGroup
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .models import Post, Comment
+
+cache_cli = AppGroup('cache', help='Gestión de la caché de respuestas.')
+
+# Cabeceras que nunca se guardan con la respuesta
+UNCACHED_HEADERS = {'set-cookie', 'x-cache'}
+
+
+class CacheStats:
+    """Contadores de uso de la caché"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def as_dict(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+
+class NullCache:
+    """Backend que no guarda nada"""
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key):
+        self.stats.misses += 1
+        return None
+
+    def set(self, key, value, tags=(), ttl=None):
+        pass
+
+    def invalidate(self, tags):
+        pass
+
+    def clear(self):
+        pass
+
+    def info(self):
+        return {'backend': 'null', 'entries': 0, **self.stats.as_dict()}
+
+
+class MemoryCache:
+    """LRU en memoria con TTL, local a cada proceso"""
+
+    def __init__(self, max_entries=1024, default_ttl=60):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.stats = CacheStats()
+        self._entries = OrderedDict()  # key -> (expires, value, tags)
+        self._tags = {}  # tag -> set(keys)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                self.stats.misses += 1
+                self.stats.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry[1]
+
+    def set(self, key, value, tags=(), ttl=None):
+        expires = time.monotonic() + (ttl or self.default_ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires, value, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats.evictions += 1
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.stats.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def info(self):
+        return {'backend': 'memory', 'entries': len(self._entries),
+                'max_entries': self.max_entries, **self.stats.as_dict()}
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class SQLiteCache:
+    """Caché en un archivo SQLite compartido entre procesos.
+
+    Las entradas y las invalidaciones son visibles para todos los workers;
+    los contadores de uso son los del proceso actual.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS entries ('
+        ' key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS entry_tags ('
+        ' tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key))',
+        'CREATE INDEX IF NOT EXISTS ix_entry_tags_key ON entry_tags (key)',
+        'CREATE INDEX IF NOT EXISTS ix_entries_expires ON entries (expires)',
+    )
+
+    def __init__(self, path, max_entries=10000, default_ttl=60):
+        self.path = path
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.stats = CacheStats()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._write() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _connection(self):
+        """Conexión propia de cada hilo, en modo autocommit"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value FROM entries WHERE key = ? AND expires > ?', (key, time.time())
+        ).fetchone()
+        if row is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return pickle.loads(row[0])
+
+    def set(self, key, value, tags=(), ttl=None):
+        expires = time.time() + (ttl or self.default_ttl)
+        with self._write() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (key, value, expires) VALUES (?, ?, ?)',
+                (key, pickle.dumps(value), expires)
+            )
+            conn.execute('DELETE FROM entry_tags WHERE key = ?', (key,))
+            conn.executemany('INSERT OR IGNORE INTO entry_tags (tag, key) VALUES (?, ?)',
+                             [(tag, key) for tag in tags])
+            self._evict(conn)
+
+    def _evict(self, conn):
+        """Eliminar entradas expiradas y, si sobran, las que expiran antes"""
+        now = time.time()
+        keys = [row[0] for row in conn.execute('SELECT key FROM entries WHERE expires <= ?', (now,))]
+        excess = conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0] - len(keys) - self.max_entries
+        if excess > 0:
+            keys += [row[0] for row in conn.execute(
+                'SELECT key FROM entries WHERE expires > ? ORDER BY expires LIMIT ?', (now, excess))]
+        if keys:
+            self._delete_keys(conn, keys)
+            self.stats.evictions += len(keys)
+
+    def _delete_keys(self, conn, keys):
+        conn.executemany('DELETE FROM entries WHERE key = ?', [(key,) for key in keys])
+        conn.executemany('DELETE FROM entry_tags WHERE key = ?', [(key,) for key in keys])
+
+    def invalidate(self, tags):
+        with self._write() as conn:
+            keys = {row[0] for tag in tags for row in conn.execute(
+                'SELECT key FROM entry_tags WHERE tag = ?', (tag,))}
+            if keys:
+                self._delete_keys(conn, keys)
+                self.stats.invalidations += len(keys)
+
+    def clear(self):
+        with self._write() as conn:
+            conn.execute('DELETE FROM entries')
+            conn.execute('DELETE FROM entry_tags')
+
+    def info(self):
+        entries = self._connection().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        return {'backend': 'sqlite', 'entries': entries,
+                'max_entries': self.max_entries, **self.stats.as_dict()}
+
+
+def init_cache(app):
+    """Crear el backend configurado y registrarlo en la aplicación"""
+    backend = app.config['CACHE_BACKEND']
+    ttl = app.config['CACHE_DEFAULT_TTL']
+    max_entries = app.config['CACHE_MAX_ENTRIES']
+
+    if backend == 'memory':
+        cache = MemoryCache(max_entries=max_entries, default_ttl=ttl)
+    elif backend == 'sqlite':
+        path = app.config['CACHE_SQLITE_PATH'] or os.path.join(app.instance_path, 'response_cache.sqlite')
+        cache = SQLiteCache(path, max_entries=max_entries, default_ttl=ttl)
+    else:
+        cache = NullCache()
+
+    app.extensions['response_cache'] = cache
+
+    size = app.config['FRAGMENT_CACHE_SIZE']
+    app.extensions['fragment_cache'] = (
+        MemoryCache(max_entries=size, default_ttl=app.config['FRAGMENT_CACHE_TTL']) if size else NullCache()
+    )
+
+    # Totales de los listados (app/pagination.py)
+    app.extensions['count_cache'] = MemoryCache(max_entries=app.config['COUNT_CACHE_MAX_ENTRIES'],
+                                                default_ttl=app.config['COUNT_CACHE_TTL'])
+    return cache
+
+
+def get_cache():
+    return current_app.extensions['response_cache']
+
+
+def get_fragment_cache():
+    return current_app.extensions['fragment_cache']
+
+
+def invalidate(*tags):
+    """Invalidar manualmente las respuestas con estas etiquetas"""
+    if tags:
+        get_cache().invalidate(tags)
+        get_fragment_cache().invalidate(tags)
+
+
+def clear_caches():
+    """Vaciar la caché de respuestas y la de fragmentos"""
+    get_cache().clear()
+    get_fragment_cache().clear()
+
+
+def _request_key(vary_user):
+    """Clave de caché: ruta + argumentos ordenados + estado de autenticación"""
+    args = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+    if not vary_user:
+        auth = 'public'
+    elif current_user.is_authenticated:
+        auth = f'user:{current_user.id}'
+    else:
+        auth = 'anon'
+    return f'{request.path}?{args}|{auth}'
+
+
+def cached(tags, ttl=None, anonymous_only=False):
+    """Decorador para cachear respuestas GET exitosas.
+
+    ``tags`` es una función que recibe los argumentos de la vista y retorna
+    las etiquetas de invalidación. Con ``anonymous_only`` las peticiones de
+    usuarios autenticados (o con mensajes flash pendientes) no usan la caché.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if request.method != 'GET':
+                return f(*args, **kwargs)
+            if anonymous_only and (current_user.is_authenticated or session.get('_flashes')):
+                return f(*args, **kwargs)
+
+            cache = get_cache()
+            key = _request_key(vary_user=anonymous_only)
+
+            hit = cache.get(key)
+            if hit is not None:
+                status, headers, body = hit
+                response = current_app.response_class(body, status=status, headers=headers)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough:
+                headers = [(k, v) for k, v in response.headers.items()
+                           if k.lower() not in UNCACHED_HEADERS]
+                cache.set(key, (response.status_code, headers, response.get_data()),
+                          tags=tags(**kwargs), ttl=ttl)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return decorated
+    return decorator
+
+
+# ==================== INVALIDACIÓN POR ESCRITURAS ====================
+
+def _tags_for(obj):
+    """Etiquetas afectadas por un cambio en un objeto del modelo"""
+    if isinstance(obj, Post):
+        return {'posts', f'post:{obj.id}'}
+    if isinstance(obj, Comment):
+        # Los listados incluyen ``comments_count``
+        return {'posts', f'post:{obj.post_id}'}
+    return set()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_tags(session, flush_context):
+    tags = session.info.setdefault('cache_tags', set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tags |= _tags_for(obj)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    tags = session.info.pop('cache_tags', None)
+    if tags and has_app_context() and 'response_cache' in current_app.extensions:
+        get_cache().invalidate(tags)
+        get_fragment_cache().invalidate(tags)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_tags(session):
+    session.info.pop('cache_tags', None)
+
+
+@cache_cli.command('stats')
+def stats_command():
+    """Mostrar los contadores de la caché"""
+    for name, value in get_cache().info().items():
+        click.echo(f'{name}: {value}')
+
+
+@cache_cli.command('clear')
+def clear_command():
+    """Vaciar la caché de respuestas"""
+    clear_caches()
+    click.echo('Caché vaciada')
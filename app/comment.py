@@ -1,6 +1,7 @@
 from flask import Blueprint, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from .models import db, Comment, Post
+from . import counters
 
 bp = Blueprint('comment', __name__, url_prefix='/comment')
 
@@ -22,6 +23,7 @@ def create(post_id):
     )
     
     db.session.add(comment)
+    counters.comment_created(comment)
     db.session.commit()
     
     flash('Comentario agregado exitosamente.', 'success')
@@ -65,6 +67,7 @@ def delete(comment_id):
         return redirect(url_for('post.view', post_id=comment.post_id))
     
     post_id = comment.post_id
+    counters.comment_deleted(comment)
     db.session.delete(comment)
     db.session.commit()
     
@@ -0,0 +1,150 @@
+"""
+Compresión de respuestas (gzip / brotli)
+
+Las respuestas dinámicas de texto mayores que ``COMPRESS_MIN_SIZE`` se
+comprimen según ``Accept-Encoding`` con niveles bajos, pensados para
+latencia. Los archivos estáticos se comprimen una sola vez con la máxima
+compresión (``flask assets compress``) y se sirven las variantes ``.br`` /
+``.gz`` directamente.
+"""
+import gzip
+import mimetypes
+import os
+
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import AppGroup
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional; sin él solo se usa gzip
+    brotli = None
+
+assets_cli = AppGroup('assets', help='Archivos estáticos.')
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+    'application/json', 'application/x-ndjson', 'image/svg+xml',
+}
+
+# Extensiones de archivos estáticos que se precomprimen
+STATIC_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+
+# Codificación -> extensión del archivo precomprimido
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+
+def negotiate_encoding():
+    """Elegir 'br', 'gzip' o None según Accept-Encoding"""
+    accept = request.accept_encodings
+    br = accept['br'] if brotli is not None else 0
+    gz = accept['gzip']
+    if br and br >= gz:
+        return 'br'
+    if gz:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def compress_response(response):
+    """Comprimir una respuesta dinámica si el cliente lo admite"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or 'Content-Encoding' in response.headers
+            or not 200 <= response.status_code < 300 or response.status_code == 204):
+        return response
+
+    config = current_app.config
+    if response.content_length is not None and response.content_length < config['COMPRESS_MIN_SIZE']:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    level = config['COMPRESS_LEVEL_BROTLI'] if encoding == 'br' else config['COMPRESS_LEVEL_GZIP']
+    response.set_data(compress(response.get_data(), encoding, level))
+    response.headers['Content-Encoding'] = encoding
+
+    # El cuerpo ya no es idéntico byte a byte: el ETag pasa a ser débil
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def precompressed_static(static_view):
+    """Envolver la vista de archivos estáticos para servir variantes .br / .gz"""
+
+    def static(filename):
+        folder = current_app.static_folder
+        original = safe_join(folder, filename)
+        if original is None or not filename.endswith(STATIC_EXTENSIONS) or not os.path.isfile(original):
+            return static_view(filename=filename)
+
+        accepted = request.accept_encodings
+        for encoding, ext in PRECOMPRESSED:
+            variant = original + ext
+            if not accepted[encoding] or not os.path.isfile(variant):
+                continue
+            # Ignorar variantes más antiguas que el original
+            if os.path.getmtime(variant) < os.path.getmtime(original):
+                continue
+            response = send_from_directory(folder, filename + ext,
+                                           mimetype=mimetypes.guess_type(filename)[0])
+            response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+            return response
+
+        response = static_view(filename=filename)
+        response.vary.add('Accept-Encoding')
+        return response
+
+    return static
+
+
+def init_compression(app):
+    """Registrar la compresión de respuestas y de archivos estáticos"""
+    if 'static' in app.view_functions:
+        app.view_functions['static'] = precompressed_static(app.view_functions['static'])
+    if app.config['COMPRESS_RESPONSES']:
+        app.after_request(compress_response)
+
+
+@assets_cli.command('compress')
+def compress_command():
+    """Generar las variantes .gz y .br de los archivos estáticos de texto"""
+    folder = current_app.static_folder
+    upload_folder = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+    total = 0
+
+    for root, _, filenames in os.walk(folder):
+        if os.path.abspath(root).startswith(upload_folder):
+            continue
+        for filename in filenames:
+            if not filename.endswith(STATIC_EXTENSIONS):
+                continue
+            path = os.path.join(root, filename)
+            with open(path, 'rb') as f:
+                data = f.read()
+
+            variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.append(('.br', brotli.compress(data, quality=11)))
+            for ext, compressed in variants:
+                with open(path + ext, 'wb') as f:
+                    f.write(compressed)
+
+            sizes = ', '.join(f'{ext} {len(compressed)} B' for ext, compressed in variants)
+            click.echo(f'{os.path.relpath(path, folder)}: {len(data)} B -> {sizes}')
+            total += 1
+
+    click.echo(f'{total} archivos comprimidos' + ('' if brotli else ' (brotli no instalado: solo .gz)'))
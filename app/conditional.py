@@ -0,0 +1,125 @@
+"""
+Peticiones GET condicionales (ETag / Last-Modified)
+
+Los validadores se calculan con consultas ligeras sobre ``updated_at`` sin
+cargar el contenido ni renderizar la respuesta; si el cliente ya tiene la
+versión actual se responde ``304 Not Modified`` directamente.
+"""
+import hashlib
+from functools import wraps
+
+from flask import current_app, request, session
+from flask_login import current_user
+from sqlalchemy import func, select
+from sqlalchemy.orm import load_only
+
+from .models import db, Post, Comment
+from .pagination import paginate_listing, per_page_arg, InvalidCursor
+
+
+class Validator:
+    """ETag y fecha de última modificación de una representación"""
+
+    def __init__(self, parts, last_modified=None, weak=False):
+        digest = hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+        self.etag = digest[:32]
+        self.last_modified = last_modified
+        self.weak = weak
+
+    def matches(self):
+        """Comprobar si la versión del cliente sigue vigente"""
+        # If-None-Match tiene prioridad y admite comparación débil en GET
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(self.etag)
+        if request.if_modified_since and self.last_modified:
+            return self.last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+        return False
+
+    def apply(self, response):
+        response.set_etag(self.etag, weak=self.weak)
+        if self.last_modified:
+            response.last_modified = self.last_modified
+        # Obligar a revalidar en cada uso; las páginas con sesión no se comparten
+        response.cache_control.no_cache = True
+        if current_user.is_authenticated:
+            response.cache_control.private = True
+        return response
+
+
+def conditional(validator):
+    """Decorador para responder 304 a GET condicionales.
+
+    ``validator`` recibe los argumentos de la vista y retorna un
+    ``Validator``, o None si la respuesta no debe ser condicional.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if request.method != 'GET':
+                return f(*args, **kwargs)
+
+            current = validator(**kwargs)
+            if current is None:
+                return f(*args, **kwargs)
+
+            if current.matches():
+                return current.apply(current_app.response_class(status=304))
+
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                current.apply(response)
+            return response
+        return decorated
+    return decorator
+
+
+def _post_state(post_id):
+    """Fecha de modificación de una publicación y de sus comentarios.
+
+    ``content_version`` cambia al renderizar el HTML en segundo plano o con
+    ``flask content rerender``, que no modifican ``updated_at``.
+    """
+    return db.session.execute(
+        select(Post.updated_at, Post.comments_count, Post.content_version,
+               select(func.max(Comment.updated_at)).where(Comment.post_id == post_id).scalar_subquery())
+        .where(Post.id == post_id)
+    ).first()
+
+
+def post_validator(post_id):
+    """Validador de la representación JSON de una publicación"""
+    row = _post_state(post_id)
+    if row is None:
+        return None
+    updated_at, comments_count, content_version, _ = row
+    return Validator(('post', post_id, request.query_string, updated_at, comments_count, content_version),
+                     last_modified=updated_at)
+
+
+def post_page_validator(post_id):
+    """Validador (débil) de la página HTML de una publicación con sus comentarios"""
+    if session.get('_flashes'):
+        return None
+    row = _post_state(post_id)
+    if row is None:
+        return None
+    updated_at, comments_count, content_version, comments_updated_at = row
+    last_modified = max(filter(None, (updated_at, comments_updated_at)), default=None)
+    user = current_user.id if current_user.is_authenticated else 'anon'
+    return Validator(('post-page', post_id, updated_at, comments_count, content_version, comments_updated_at, user),
+                     last_modified=last_modified, weak=True)
+
+
+def post_list_validator():
+    """Validador de una página de /api/posts, derivado de los cambios en esa página"""
+    per_page = per_page_arg()
+    stmt = select(Post).options(load_only(Post.id, Post.created_at, Post.updated_at, Post.user_id,
+                                          Post.comments_count))
+    try:
+        pagination = paginate_listing(stmt, Post, per_page)
+    except InvalidCursor:
+        return None
+    parts = ['posts', request.query_string, pagination.total]
+    parts += [f'{post.id}:{post.updated_at}:{post.user_id}:{post.comments_count}' for post in pagination.items]
+    last_modified = max((post.updated_at for post in pagination.items if post.updated_at), default=None)
+    return Validator(parts, last_modified=last_modified)
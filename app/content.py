@@ -0,0 +1,136 @@
+"""
+HTML del contenido de publicaciones generado al guardar
+
+bleach es lento para cuerpos grandes, así que el HTML sanitizado, el extracto,
+el número de palabras y el tiempo de lectura se calculan una vez al crear o
+actualizar la publicación y se guardan en ``Post``; las vistas solo los leen.
+Los cuerpos mayores que ``CONTENT_RENDER_ASYNC_THRESHOLD`` se sanitizan en
+segundo plano después del commit.
+"""
+import html
+import math
+import re
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import or_, select, update
+
+from .models import db, Post
+from .cache import clear_caches, invalidate
+from .background import submit
+from .utils import sanitize_html, SANITIZER_VERSION
+from .query_log import tracks_queries
+
+content_cli = AppGroup('content', help='Renderizado del contenido de publicaciones.')
+
+EXCERPT_LENGTH = 150
+WORDS_PER_MINUTE = 200
+
+TAG_RE = re.compile(r'<[^>]+>')
+SPACE_RE = re.compile(r'\s+')
+
+
+def render_content(content):
+    """Sanitizar el contenido y calcular los campos derivados"""
+    content_html = sanitize_html(content)
+    text = SPACE_RE.sub(' ', html.unescape(TAG_RE.sub(' ', content_html))).strip()
+    word_count = len(text.split())
+
+    excerpt = text
+    if len(text) > EXCERPT_LENGTH:
+        excerpt = text[:EXCERPT_LENGTH].rsplit(' ', 1)[0] + '…'
+
+    return {
+        'content_html': content_html,
+        'excerpt': excerpt,
+        'word_count': word_count,
+        'reading_time': max(1, math.ceil(word_count / WORDS_PER_MINUTE)),
+        'content_version': SANITIZER_VERSION,
+    }
+
+
+def provisional_excerpt(content):
+    """Extracto en texto plano a partir del principio del cuerpo, sin
+    sanitizar el contenido completo"""
+    return render_content(content[:EXCERPT_LENGTH * 10])['excerpt']
+
+
+def rendered_fields(content):
+    """Campos renderizados a guardar junto con ``content``.
+
+    Si el cuerpo es grande el HTML queda vacío para generarlo en segundo
+    plano después del commit.
+    """
+    threshold = current_app.config['CONTENT_RENDER_ASYNC_THRESHOLD']
+    if threshold and len(content) > threshold:
+        return {
+            'content_html': None,
+            'content_version': None,
+            'excerpt': provisional_excerpt(content),
+        }
+    return render_content(content)
+
+
+def render_post(post):
+    """Actualizar los campos renderizados de una publicación.
+
+    Se ejecuta antes del commit; ``enqueue_render`` completa después del
+    commit los que hayan quedado pendientes.
+    """
+    for name, value in rendered_fields(post.content).items():
+        setattr(post, name, value)
+
+
+def enqueue_render(post):
+    """Renderizar en segundo plano si ``render_post`` lo dejó pendiente"""
+    if post.content_html is None:
+        submit(render_stored, post.id)
+
+
+def render_stored(post_id):
+    """Renderizar el contenido guardado de una publicación"""
+    content = db.session.scalar(select(Post.content).where(Post.id == post_id))
+    if content is None:
+        return False
+
+    # Solo si nadie cambió el contenido mientras tanto
+    result = db.session.execute(
+        update(Post)
+        .where(Post.id == post_id, Post.content == content)
+        .values(**render_content(content), updated_at=Post.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if result.rowcount:
+        invalidate('posts', f'post:{post_id}')
+    return bool(result.rowcount)
+
+
+@content_cli.command('rerender')
+@click.option('--all', 'rerender_all', is_flag=True, help='Regenerar también las que están al día.')
+@click.option('--batch-size', default=200, show_default=True, help='Publicaciones por transacción.')
+@tracks_queries
+def rerender_command(rerender_all, batch_size):
+    """Regenerar el HTML tras cambiar ALLOWED_TAGS o ALLOWED_ATTRIBUTES"""
+    stmt = select(Post.id, Post.content).order_by(Post.id).limit(batch_size)
+    if not rerender_all:
+        stmt = stmt.where(or_(Post.content_version.is_(None), Post.content_version != SANITIZER_VERSION))
+
+    total = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(stmt.where(Post.id > last_id)).all()
+        if not rows:
+            break
+        for post_id, content in rows:
+            db.session.execute(
+                update(Post).where(Post.id == post_id)
+                .values(**render_content(content), updated_at=Post.updated_at)
+            )
+        db.session.commit()
+        total += len(rows)
+        last_id = rows[-1][0]
+
+    clear_caches()
+    click.echo(f'{total} publicaciones renderizadas (sanitizador {SANITIZER_VERSION})')
@@ -0,0 +1,154 @@
+"""
+Contadores denormalizados de publicaciones, comentarios y etiquetas
+
+Los contadores se actualizan con UPDATE atómicos (``col = col + n``) dentro
+de la transacción de la escritura, así no hay actualizaciones perdidas entre
+peticiones concurrentes. ``flask counters repair`` los recalcula en bloque.
+
+Un contador no es una modificación de la fila: los UPDATE conservan
+``updated_at`` (que si no cambiaría por su ``onupdate``), del que dependen
+la API, los ETag y ``Last-Modified``.
+"""
+import click
+from flask.cli import AppGroup
+from collections import Counter
+
+from sqlalchemy import bindparam, func, select, update
+
+from .models import db, User, Post, Comment, Tag, post_tags
+
+counters_cli = AppGroup('counters', help='Mantenimiento de contadores denormalizados.')
+
+
+def _keep_updated_at(table):
+    """Valores de UPDATE que conservan ``updated_at`` si la tabla lo tiene"""
+    return {'updated_at': table.c.updated_at} if 'updated_at' in table.c else {}
+
+
+def _add(model, object_id, **deltas):
+    """Sumar ``deltas`` a las columnas contador de una fila"""
+    values = {name: getattr(model, name) + delta for name, delta in deltas.items()}
+    db.session.execute(update(model).where(model.id == object_id)
+                       .values(**values, **_keep_updated_at(model.__table__)))
+
+
+def _add_many(model, column, deltas):
+    """Sumar ``deltas`` ({id: n}) a una columna contador con un executemany"""
+    if not deltas:
+        return
+    table = model.__table__
+    db.session.execute(
+        update(table).where(table.c.id == bindparam('row_id'))
+        .values({column: table.c[column] + bindparam('delta'), **_keep_updated_at(table)}),
+        [{'row_id': row_id, 'delta': delta} for row_id, delta in deltas.items()]
+    )
+
+
+def post_created(post):
+    """Actualizar contadores tras crear una publicación"""
+    _add(User, post.user_id, posts_count=1)
+
+
+def post_deleted(post):
+    """Actualizar contadores antes de eliminar una publicación.
+
+    Los comentarios de la publicación se eliminan en cascada, así que también
+    se descuentan de sus autores.
+    """
+    _add(User, post.user_id, posts_count=-1)
+
+    rows = db.session.execute(
+        select(Comment.user_id, func.count(Comment.id))
+        .where(Comment.post_id == post.id)
+        .group_by(Comment.user_id)
+    ).all()
+    for user_id, count in rows:
+        _add(User, user_id, comments_count=-count)
+
+    db.session.execute(
+        update(Tag).where(Tag.id.in_(select(post_tags.c.tag_id).where(post_tags.c.post_id == post.id)))
+        .values(posts_count=Tag.posts_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def comment_created(comment):
+    """Actualizar contadores tras crear un comentario"""
+    _add(Post, comment.post_id, comments_count=1)
+    _add(User, comment.user_id, comments_count=1)
+
+
+def posts_created(user_id, count):
+    """Actualizar contadores tras insertar varias publicaciones de un usuario"""
+    _add(User, user_id, posts_count=count)
+
+
+def posts_created_by(user_ids):
+    """Actualizar contadores tras insertar publicaciones en bloque de varios autores.
+
+    ``user_ids`` tiene un elemento por publicación.
+    """
+    _add_many(User, 'posts_count', Counter(user_ids))
+
+
+def comments_created(rows):
+    """Actualizar contadores tras insertar comentarios en bloque.
+
+    ``rows`` son pares ``(post_id, user_id)``.
+    """
+    _add_many(Post, 'comments_count', Counter(post_id for post_id, _ in rows))
+    _add_many(User, 'comments_count', Counter(user_id for _, user_id in rows))
+
+
+def comment_deleted(comment):
+    """Actualizar contadores antes de eliminar un comentario"""
+    _add(Post, comment.post_id, comments_count=-1)
+    _add(User, comment.user_id, comments_count=-1)
+
+
+def tags_changed(deltas):
+    """Actualizar contadores de etiquetas ({tag_id: n}) tras enlazar o desenlazar publicaciones"""
+    _add_many(Tag, 'posts_count', {tag_id: delta for tag_id, delta in deltas.items() if delta})
+
+
+def repair_counters():
+    """Recalcular todos los contadores con UPDATE ... SET = (subconsulta)"""
+    post_comments = (
+        select(func.count(Comment.id)).where(Comment.post_id == Post.id).scalar_subquery()
+    )
+    user_posts = (
+        select(func.count(Post.id)).where(Post.user_id == User.id).scalar_subquery()
+    )
+    user_comments = (
+        select(func.count(Comment.id)).where(Comment.user_id == User.id).scalar_subquery()
+    )
+    tag_posts = (
+        select(func.count()).select_from(post_tags).where(post_tags.c.tag_id == Tag.id).scalar_subquery()
+    )
+
+    # Solo se escriben las filas desincronizadas
+    posts_fixed = db.session.execute(
+        update(Post).where(Post.comments_count != post_comments)
+        .values(comments_count=post_comments, updated_at=Post.updated_at)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    users_fixed = db.session.execute(
+        update(User).where((User.posts_count != user_posts) | (User.comments_count != user_comments))
+        .values(posts_count=user_posts, comments_count=user_comments)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    tags_fixed = db.session.execute(
+        update(Tag).where(Tag.posts_count != tag_posts)
+        .values(posts_count=tag_posts)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return posts_fixed, users_fixed, tags_fixed
+
+
+@counters_cli.command('repair')
+def repair_command():
+    """Recalcular los contadores de publicaciones, usuarios y etiquetas"""
+    posts_fixed, users_fixed, tags_fixed = repair_counters()
+    click.echo(f'Contadores corregidos: {posts_fixed} publicaciones, {users_fixed} usuarios, '
+               f'{tags_fixed} etiquetas')
@@ -0,0 +1,207 @@
+"""
+Pool de conexiones a la base de datos
+
+El tamaño del pool se deriva de los hilos de cada worker de gunicorn más los
+hilos en segundo plano (``app/background.py``): cada hilo usa como mucho una
+conexión a la vez, así que con ese tamaño ninguna petición espera por una
+conexión salvo que algo la retenga de más. Las conexiones se verifican antes
+de usarse (``pool_pre_ping``) y se reciclan periódicamente.
+
+En PostgreSQL las consultas hechas durante una petición tienen un límite de
+tiempo (``DB_STATEMENT_TIMEOUT``); los comandos CLI y los trabajos en segundo
+plano no tienen límite.
+
+``PoolStats`` registra la espera por conexión, la saturación y la rotación
+de conexiones de cada proceso (``/admin/db-pool``).
+"""
+import logging
+import threading
+import time
+
+from flask import current_app, has_request_context
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    """Contadores de uso del pool de conexiones del proceso"""
+
+    def __init__(self, slow_wait=0.1):
+        self.slow_wait = slow_wait
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.slow_waits = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.disconnects = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self._lock = threading.Lock()
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+            if seconds >= self.slow_wait:
+                self.slow_waits += 1
+        if timed_out or seconds >= self.slow_wait:
+            logger.warning('Espera de %.0f ms por una conexión del pool%s',
+                           seconds * 1000, ' (tiempo agotado)' if timed_out else '')
+
+    def checkout(self):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def checkin(self):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def disconnect(self):
+        with self._lock:
+            self.disconnects += 1
+
+    def as_dict(self, capacity=None):
+        info = {
+            'checkouts': self.checkouts,
+            'checked_out': self.checked_out,
+            'peak_checked_out': self.peak_checked_out,
+            'wait_avg_ms': round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            'wait_max_ms': round(self.wait_max * 1000, 3),
+            'slow_waits': self.slow_waits,
+            'timeouts': self.timeouts,
+            'connects': self.connects,
+            'disconnects': self.disconnects,
+        }
+        if capacity:
+            info['saturation'] = round(self.checked_out / capacity, 3)
+            info['peak_saturation'] = round(self.peak_checked_out / capacity, 3)
+        return info
+
+
+class InstrumentedQueuePool(QueuePool):
+    """``QueuePool`` que mide el tiempo de espera por una conexión"""
+
+    stats = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            if self.stats is not None:
+                self.stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        if self.stats is not None:
+            self.stats.record_wait(time.perf_counter() - start)
+        return record
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def pool_size(config):
+    """Conexiones por proceso: una por hilo de gunicorn y por hilo en segundo plano"""
+    return config['DB_POOL_SIZE'] or config['GUNICORN_THREADS'] + config['BACKGROUND_WORKERS']
+
+
+def engine_options(config):
+    """Opciones de ``create_engine`` para la base de datos configurada.
+
+    SQLite conserva las opciones por defecto de Flask-SQLAlchemy (la base en
+    memoria de los tests usa ``StaticPool``).
+    """
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        return {}
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': pool_size(config),
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,
+    }
+
+
+def configure_engine(app):
+    """Completar ``SQLALCHEMY_ENGINE_OPTIONS`` antes de ``db.init_app``"""
+    options = engine_options(app.config)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def instrument(engine, stats):
+    """Registrar los contadores de ``stats`` en los eventos del pool de ``engine``"""
+    engine.pool.stats = stats
+    event.listen(engine, 'connect', lambda dbapi_connection, record: stats.connect())
+    event.listen(engine, 'close', lambda dbapi_connection, record: stats.disconnect())
+    event.listen(engine, 'checkin', lambda dbapi_connection, record: stats.checkin())
+
+    @event.listens_for(engine, 'checkout')
+    def checkout(dbapi_connection, record, proxy):
+        stats.checkout()
+
+
+def _statement_timeout(engine, timeout):
+    """Aplicar ``statement_timeout`` a las conexiones usadas en peticiones.
+
+    El valor se fija a nivel de sesión y solo se cambia cuando difiere del
+    que ya tiene la conexión, así no añade consultas en cada petición.
+    """
+    @event.listens_for(engine, 'checkout')
+    def set_timeout(dbapi_connection, record, proxy):
+        wanted = timeout if has_request_context() else 0
+        if record.info.get('statement_timeout') == wanted:
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f'SET statement_timeout = {int(wanted)}')
+        finally:
+            cursor.close()
+        dbapi_connection.commit()
+        record.info['statement_timeout'] = wanted
+
+
+def init_pool(app, db):
+    """Instrumentar el pool y registrar el límite de tiempo de las consultas"""
+    with app.app_context():
+        engine = db.engine
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        stats = PoolStats(slow_wait=app.config['DB_POOL_SLOW_WAIT'])
+        instrument(engine, stats)
+        app.extensions['db_pool_stats'] = stats
+    if engine.dialect.name == 'postgresql' and app.config['DB_STATEMENT_TIMEOUT']:
+        _statement_timeout(engine, app.config['DB_STATEMENT_TIMEOUT'])
+
+
+def pool_info():
+    """Configuración y contadores del pool del proceso actual"""
+    from .models import db
+
+    config = current_app.config
+    pool = db.engine.pool
+    info = {'pool': type(pool).__name__}
+    capacity = None
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        info.update(size=pool.size(), max_overflow=pool._max_overflow, timeout=pool.timeout(),
+                    checked_in=pool.checkedin(), overflow=pool.overflow(),
+                    workers=config['WEB_CONCURRENCY'], max_connections=config['WEB_CONCURRENCY'] * capacity)
+    stats = current_app.extensions.get('db_pool_stats')
+    if stats is not None:
+        info.update(stats.as_dict(capacity))
+    return info
@@ -0,0 +1,105 @@
+"""
+Exportación en streaming (NDJSON) de publicaciones, comentarios y usuarios
+
+Las filas se leen por lotes con ``yield_per`` (cursor del servidor en
+PostgreSQL) seleccionando solo columnas, sin materializar objetos del modelo,
+y se emiten en bloques de líneas JSON, opcionalmente comprimidas con gzip.
+La memoria usada no depende del tamaño de la tabla.
+"""
+import sys
+import zlib
+from datetime import datetime
+
+import click
+from sqlalchemy import select
+
+from .json_provider import dumps_bytes
+from .models import db, User, Post, Comment
+
+# Tipo -> (modelo, columnas exportadas, columna para ``since``)
+EXPORTS = {
+    'posts': (Post, ('id', 'title', 'content', 'category', 'image_url', 'user_id',
+                     'comments_count', 'created_at', 'updated_at'), 'updated_at'),
+    'comments': (Comment, ('id', 'post_id', 'user_id', 'content', 'created_at', 'updated_at'), 'updated_at'),
+    'users': (User, ('id', 'username', 'email', 'role', 'is_active', 'posts_count',
+                     'comments_count', 'created_at'), 'created_at'),
+}
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_since(value):
+    """Convertir el parámetro ``since`` (ISO 8601) a datetime; ValueError si es inválido"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value)
+
+
+def iter_lines(kind, since=None):
+    """Generar una línea NDJSON (bytes) por fila"""
+    model, columns, since_column = EXPORTS[kind]
+    stmt = select(*(getattr(model, name) for name in columns)).order_by(model.id)
+    if since is not None:
+        stmt = stmt.where(getattr(model, since_column) >= since)
+
+    rows = db.session.execute(stmt.execution_options(yield_per=BATCH_SIZE))
+    for row in rows:
+        yield dumps_bytes(dict(zip(columns, row))) + b'\n'
+
+
+def iter_chunks(lines, compress=False):
+    """Agrupar las líneas en bloques de ~64 KB, comprimidos con gzip si se pide"""
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = []
+    size = 0
+
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            data = b''.join(buffer)
+            buffer, size = [], 0
+            data = compressor.compress(data) if compressor else data
+            if data:
+                yield data
+
+    data = b''.join(buffer)
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+
+@click.command('export')
+@click.argument('kind', type=click.Choice(sorted(EXPORTS)))
+@click.option('--since', help='Solo filas creadas o modificadas desde esta fecha (ISO 8601).')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='Archivo de salida (por defecto stdout).')
+@click.option('--gzip', 'compress', is_flag=True, help='Comprimir con gzip (automático si el archivo termina en .gz).')
+def export_command(kind, since, output, compress):
+    """Exportar publicaciones, comentarios o usuarios como NDJSON"""
+    try:
+        since = parse_since(since)
+    except ValueError:
+        raise click.BadParameter('fecha ISO 8601 inválida', param_hint='--since')
+
+    compress = compress or bool(output and output.endswith('.gz'))
+    stream = open(output, 'wb') if output else sys.stdout.buffer
+    lines = 0
+    try:
+        def counted():
+            nonlocal lines
+            for line in iter_lines(kind, since):
+                lines += 1
+                yield line
+
+        for chunk in iter_chunks(counted(), compress):
+            stream.write(chunk)
+    finally:
+        if output:
+            stream.close()
+        else:
+            stream.flush()
+
+    if output:
+        click.echo(f'{lines} filas exportadas a {output}')
@@ -1,5 +1,11 @@
-from flask import Blueprint, render_template, request
+from flask import Blueprint, render_template, request, abort
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
 from .models import Post
+from .pagination import paginate_listing, InvalidCursor
+from .search import search_statement, tokenize_query
+from .cache import cached
+from .tags import tag_posts_statement, get_tag_or_404
 
 bp = Blueprint('home', __name__)
 
@@ -9,37 +15,52 @@ def index():
     return render_template('home.html')
 
 @bp.route('/blog')
+@cached(tags=lambda: ['posts'], anonymous_only=True)
 def blog():
     """Listar todas las publicaciones del blog con paginación"""
-    page = request.args.get('page', 1, type=int)
     per_page = 6
     
-    pagination = Post.query.order_by(Post.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    try:
+        pagination = paginate_listing(select(Post).options(joinedload(Post.author)), Post, per_page)
+    except InvalidCursor:
+        abort(400)
     
     posts = pagination.items
     
     return render_template('blog.html', posts=posts, pagination=pagination)
 
+@bp.route('/tag/<slug>')
+@cached(tags=lambda slug: ['posts'], anonymous_only=True)
+def tag(slug):
+    """Publicaciones de una etiqueta, con el total del contador de la etiqueta"""
+    per_page = 6
+    tag = get_tag_or_404(slug)
+    
+    try:
+        pagination = paginate_listing(tag_posts_statement(tag).options(joinedload(Post.author)), Post, per_page,
+                                      total=tag.posts_count)
+    except InvalidCursor:
+        abort(400)
+    
+    return render_template('blog.html', posts=pagination.items, pagination=pagination, tag=tag)
+
 @bp.route('/search')
 def search():
     """Buscar publicaciones por título o contenido"""
     query = request.args.get('q', '')
-    page = request.args.get('page', 1, type=int)
     per_page = 6
     
-    if query:
-        # Buscar en título y contenido
-        search_filter = Post.title.ilike(f'%{query}%') | Post.content.ilike(f'%{query}%')
-        pagination = Post.query.filter(search_filter).order_by(Post.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-    else:
-        pagination = Post.query.order_by(Post.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+    try:
+        if query:
+            # Buscar en el índice de texto completo, ordenado por relevancia
+            stmt, order_by = search_statement(query)
+            pagination = paginate_listing(stmt.options(joinedload(Post.author)), Post, per_page, order_by=order_by,
+                                          count_key=('search', *tokenize_query(query)))
+        else:
+            pagination = paginate_listing(select(Post).options(joinedload(Post.author)), Post, per_page)
+    except InvalidCursor:
+        abort(400)
     
     posts = pagination.items
     
-    return render_template('search.html', posts=posts, pagination=pagination, query=query)
\ No newline at end of file
+    return render_template('search.html', posts=posts, pagination=pagination, query=query)
@@ -0,0 +1,153 @@
+"""
+Variantes redimensionadas de las imágenes de publicaciones
+
+Al subir una imagen la petición solo guarda el original y encola la
+generación de variantes (miniatura para las tarjetas del blog, mediana para
+la vista de la publicación, y WebP si Pillow lo soporta). Las variantes se
+guardan en ``Post.image_variants`` para que las plantillas emitan ``srcset``.
+Sin Pillow instalado se sirve siempre el original.
+"""
+import os
+
+import click
+from flask import current_app, url_for
+from flask.cli import AppGroup
+from sqlalchemy import select, update
+
+from .models import db, Post
+from .cache import invalidate
+from .uploads import upload_path
+from .background import submit
+from .query_log import tracks_queries
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow es opcional
+    Image = None
+
+images_cli = AppGroup('images', help='Procesamiento de imágenes subidas.')
+
+# Nombre de la variante -> ancho máximo en píxeles
+VARIANTS = {
+    'thumb': 400,
+    'medium': 1200,
+}
+
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 82, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 80, 'method': 4},
+}
+
+
+def enqueue_variants(post):
+    """Encolar la generación de variantes de la imagen de una publicación.
+
+    Debe llamarse después del commit para que el trabajo vea la fila.
+    """
+    if Image is None or not post.image_url:
+        return
+
+    mode = current_app.config['IMAGE_PROCESSING']
+    if mode == 'sync':
+        generate_variants(post.id, post.image_url)
+    elif mode == 'background':
+        submit(generate_variants, post.id, post.image_url)
+
+
+def _variant_format(original_format):
+    # Los GIF se recomprimen como PNG; el resto conserva su formato
+    return 'JPEG' if original_format in ('JPEG', 'MPO') else 'PNG'
+
+
+def _save(image, image_url, fmt, overwrite):
+    # Las variantes de un original direccionado por contenido no cambian:
+    # si ya existen (subida duplicada) no se vuelven a codificar
+    path = upload_path(image_url)
+    if overwrite or not os.path.exists(path):
+        image.save(path, fmt, **SAVE_OPTIONS[fmt])
+
+
+def generate_variants(post_id, image_url, overwrite=False):
+    """Generar y registrar las variantes de una imagen"""
+    source = upload_path(image_url)
+    stem, _ = os.path.splitext(os.path.basename(image_url))
+    folder = os.path.dirname(image_url)
+    webp = features.check('webp')
+    variants = {}
+
+    with Image.open(source) as original:
+        if getattr(original, 'is_animated', False):
+            # Las animaciones se sirven tal cual
+            return None
+        fmt = _variant_format(original.format)
+        image = ImageOps.exif_transpose(original)
+        if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        for name, max_width in VARIANTS.items():
+            resized = image.copy()
+            if resized.width > max_width:
+                resized.thumbnail((max_width, max_width * 10), Image.LANCZOS)
+
+            ext = 'jpg' if fmt == 'JPEG' else 'png'
+            variant = {'width': resized.width, 'height': resized.height,
+                       'src': f'{folder}/{stem}_{name}.{ext}'}
+            _save(resized, variant['src'], fmt, overwrite)
+
+            if webp:
+                variant['webp'] = f'{folder}/{stem}_{name}.webp'
+                _save(resized, variant['webp'], 'WEBP', overwrite)
+
+            variants[name] = variant
+
+    # Solo si la publicación sigue teniendo la misma imagen
+    result = db.session.execute(
+        update(Post)
+        .where(Post.id == post_id, Post.image_url == image_url)
+        .values(image_variants=variants, updated_at=Post.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if result.rowcount:
+        invalidate('posts', f'post:{post_id}')
+    return variants
+
+
+def image_src(post, variant):
+    """URL de una variante, o del original si aún no existe"""
+    variants = post.image_variants or {}
+    if variant in variants:
+        return url_for('static', filename=variants[variant]['src'])
+    return url_for('static', filename=post.image_url)
+
+
+def image_srcset(post, fmt='src'):
+    """Valor de ``srcset`` con todas las variantes en el formato indicado"""
+    variants = post.image_variants or {}
+    return ', '.join(
+        f"{url_for('static', filename=v[fmt])} {v['width']}w"
+        for v in sorted(variants.values(), key=lambda v: v['width']) if fmt in v
+    )
+
+
+@images_cli.command('process')
+@click.option('--all', 'process_all', is_flag=True, help='Regenerar también las que ya tienen variantes.')
+@tracks_queries
+def process_command(process_all):
+    """Generar las variantes pendientes (por ejemplo, tras un reinicio)"""
+    if Image is None:
+        raise click.ClickException('Pillow no está instalado')
+
+    stmt = select(Post.id, Post.image_url).where(Post.image_url.isnot(None))
+    if not process_all:
+        stmt = stmt.where(Post.image_variants.is_(None))
+
+    total = 0
+    for post_id, image_url in db.session.execute(stmt).all():
+        try:
+            generate_variants(post_id, image_url, overwrite=process_all)
+            total += 1
+        except (OSError, ValueError) as e:
+            click.echo(f'Error en {image_url}: {e}', err=True)
+    click.echo(f'Variantes generadas para {total} imágenes')
@@ -0,0 +1,169 @@
+"""
+Instrumentación de peticiones
+
+Con ``METRICS_ENABLED`` cada petición registra, por endpoint, su latencia,
+código de estado, tamaño de respuesta, tiempo en la base de datos y número de
+consultas, además de las peticiones en curso (``app/metrics.py``). Se
+exponen en ``/metrics`` en formato Prometheus, para administradores o con
+``Authorization: Bearer <METRICS_TOKEN>``.
+
+Con ``QUERY_COUNT_HEADER`` activado, cada respuesta incluye el número de
+sentencias SQL ejecutadas durante la petición (``X-Query-Count``) y el tiempo
+pasado en la base de datos (``X-DB-Time``, en ms). Lo usan los benchmarks
+(``benchmarks/suite.py``) para medir consultas por petición desde fuera del
+proceso; en producción debe quedar desactivado.
+
+Con ``QUERY_STATS_ENABLED`` el tiempo de cada sentencia se acumula por huella
+y endpoint y las lentas se registran con su plan (``app/query_log.py``).
+"""
+import hmac
+import os
+import time
+
+from flask import Blueprint, abort, current_app, g, has_app_context, has_request_context, request
+from flask_login import current_user
+from sqlalchemy import event
+
+from .metrics import Registry, QUERY_BUCKETS, SIZE_BUCKETS
+from .query_log import create_query_stats, record_statement, start_tracking
+
+bp = Blueprint('metrics', __name__)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start')
+    if not starts or not has_app_context():
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+        g.query_time = g.get('query_time', 0.0) + elapsed
+    if 'query_stats' in current_app.extensions:
+        record_statement(conn, statement, parameters, executemany, elapsed)
+
+
+def _query_failed(context):
+    # Sin after_cursor_execute: descartar el inicio de la sentencia fallida
+    starts = context.connection.info.get('query_start') if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def _reset_queries():
+    # ``g`` vive en el contexto de aplicación, que puede abarcar varias peticiones (tests)
+    g.query_count = 0
+    g.query_time = 0.0
+
+
+def _query_headers(response):
+    if not current_app.config['QUERY_COUNT_HEADER']:
+        return response
+    response.headers['X-Query-Count'] = str(g.get('query_count', 0))
+    response.headers['X-DB-Time'] = f'{g.get("query_time", 0.0) * 1000:.2f}'
+    return response
+
+
+# ==================== MÉTRICAS ====================
+
+def create_registry(config, instance_path):
+    directory = config['METRICS_DIR']
+    if directory == '':
+        directory = os.path.join(instance_path, 'metrics')
+    registry = Registry(directory, flush_interval=config['METRICS_FLUSH_INTERVAL'])
+    registry.counter('http_requests_total', 'Peticiones HTTP atendidas', ('endpoint', 'method', 'status'))
+    registry.histogram('http_request_duration_seconds', 'Latencia de las peticiones HTTP', ('endpoint', 'method'))
+    registry.gauge('http_requests_in_progress', 'Peticiones HTTP en curso')
+    registry.histogram('http_response_size_bytes', 'Tamaño del cuerpo de las respuestas', ('endpoint',),
+                       buckets=SIZE_BUCKETS)
+    registry.histogram('http_request_db_seconds', 'Tiempo en la base de datos por petición', ('endpoint',))
+    registry.histogram('http_request_queries', 'Consultas SQL por petición', ('endpoint',),
+                       buckets=QUERY_BUCKETS)
+    return registry
+
+
+def _endpoint():
+    return request.endpoint or 'none'
+
+
+def _start_request():
+    g.metrics_recorded = False
+    g.request_start = time.perf_counter()
+    current_app.extensions['metrics'].inc('http_requests_in_progress')
+
+
+def _record(status, response=None):
+    if g.get('metrics_recorded') or 'request_start' not in g:
+        return
+    g.metrics_recorded = True
+    registry = current_app.extensions['metrics']
+    endpoint = _endpoint()
+    registry.inc('http_requests_total', (endpoint, request.method, str(status)))
+    registry.observe('http_request_duration_seconds', time.perf_counter() - g.request_start,
+                     (endpoint, request.method))
+    registry.observe('http_request_db_seconds', g.get('query_time', 0.0), (endpoint,))
+    registry.observe('http_request_queries', g.get('query_count', 0), (endpoint,))
+    # Respuestas en streaming: el tamaño no se conoce
+    if response is not None and response.content_length is not None:
+        registry.observe('http_response_size_bytes', response.content_length, (endpoint,))
+
+
+def _record_response(response):
+    _record(response.status_code, response)
+    return response
+
+
+def _finish_request(exc):
+    if 'request_start' not in g:
+        return
+    # Sin after_request (excepción no manejada) la respuesta es un 500
+    _record(500)
+    del g.request_start
+    current_app.extensions['metrics'].inc('http_requests_in_progress', amount=-1)
+
+
+def _authorized():
+    token = current_app.config['METRICS_TOKEN']
+    header = request.headers.get('Authorization', '')
+    if token and header.startswith('Bearer ') and hmac.compare_digest(header[7:].encode(), token.encode()):
+        return True
+    return current_user.is_authenticated and current_user.is_admin()
+
+
+@bp.route('/metrics')
+def metrics():
+    """Métricas de todos los workers en formato Prometheus"""
+    if not _authorized():
+        abort(403)
+    registry = current_app.extensions['metrics']
+    return current_app.response_class(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_instrumentation(app, db):
+    """Registrar el conteo de consultas, las métricas y el registro de consultas lentas"""
+    metrics_enabled = app.config['METRICS_ENABLED']
+    query_stats_enabled = app.config['QUERY_STATS_ENABLED']
+    if not (metrics_enabled or query_stats_enabled or app.config['QUERY_COUNT_HEADER']):
+        return
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _query_failed)
+    app.before_request(_reset_queries)
+
+    if query_stats_enabled:
+        app.extensions['query_stats'] = create_query_stats(app.config, app.instance_path)
+        app.before_request(start_tracking)
+
+    if metrics_enabled:
+        app.extensions['metrics'] = create_registry(app.config, app.instance_path)
+        app.before_request(_start_request)
+        app.after_request(_record_response)
+        app.teardown_request(_finish_request)
+        app.register_blueprint(bp)
+    app.after_request(_query_headers)
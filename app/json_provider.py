@@ -0,0 +1,109 @@
+"""
+Proveedor JSON de la aplicación
+
+``JSON_PROVIDER = 'orjson'`` usa orjson (serialización en C directamente a
+bytes) y, si no está instalado, el codificador estándar de Flask. Con ambos
+las fechas se emiten en ISO 8601, así los serializadores pueden devolver
+objetos ``datetime`` sin convertirlos fila por fila.
+
+``json_response`` admite valores ``RawJSON`` (JSON ya serializado) que se
+insertan tal cual: los listados se arman concatenando los fragmentos
+cacheados de cada publicación.
+"""
+import decimal
+import json
+import uuid
+from datetime import date
+
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional; sin él se usa el codificador estándar
+    orjson = None
+
+
+class RawJSON(bytes):
+    """Bytes que ya son JSON válido y no se vuelven a serializar"""
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f'{type(value).__name__} no serializable')
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Codificador estándar de Flask con fechas en ISO 8601"""
+
+    default = staticmethod(_default)
+
+    def dumps_bytes(self, obj):
+        return self.dumps(obj, separators=(',', ':')).encode()
+
+
+class OrjsonProvider(JSONProvider):
+    """Proveedor basado en orjson.
+
+    Las claves se emiten en el orden de los diccionarios (sin ordenar), que
+    es el orden de ``?fields=``.
+    """
+
+    mimetype = 'application/json'
+    compact = None
+
+    def _options(self, indent=False):
+        options = orjson.OPT_NON_STR_KEYS
+        return options | orjson.OPT_INDENT_2 if indent else options
+
+    def dumps_bytes(self, obj, indent=False):
+        return orjson.dumps(obj, default=_default, option=self._options(indent))
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj, indent=bool(kwargs.get('indent'))).decode()
+
+    def loads(self, s, **kwargs):
+        # Opciones del módulo json (p. ej. object_hook de la cookie de sesión)
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
+
+
+def init_json(app):
+    """Registrar el proveedor configurado en ``JSON_PROVIDER``"""
+    if app.config['JSON_PROVIDER'] == 'orjson' and orjson is not None:
+        app.json = OrjsonProvider(app)
+    else:
+        app.json = StdlibJSONProvider(app)
+
+
+def dumps_bytes(obj):
+    return current_app.json.dumps_bytes(obj)
+
+
+def json_response(data, status=200):
+    """Respuesta JSON en la que los valores ``RawJSON`` se insertan sin serializar.
+
+    ``data`` puede ser un ``RawJSON`` o un diccionario; solo se buscan
+    fragmentos en el primer nivel.
+    """
+    if isinstance(data, RawJSON):
+        body = bytes(data)
+    else:
+        raw = [(key, value) for key, value in data.items() if isinstance(value, RawJSON)]
+        rest = dumps_bytes({key: value for key, value in data.items() if not isinstance(value, RawJSON)})
+        parts = [dumps_bytes(key) + b':' + value for key, value in raw]
+        if rest != b'{}':
+            parts.append(rest.strip()[1:-1])
+        body = b'{' + b','.join(parts) + b'}'
+    return current_app.response_class(body + b'\n', status=status, mimetype='application/json')
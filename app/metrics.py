@@ -0,0 +1,291 @@
+"""
+Métricas en formato de texto de Prometheus
+
+Cada proceso acumula sus contadores, histogramas y gauges en memoria y un
+hilo los vuelca cada ``METRICS_FLUSH_INTERVAL`` segundos (y al terminar) a un
+archivo JSON propio en ``METRICS_DIR``. ``/metrics`` suma los archivos de todos los
+workers de gunicorn, así el resultado no depende del worker que atiende el
+scrape. Los gauges solo se suman para los procesos que siguen vivos.
+
+Al leer las métricas, los archivos de workers terminados se funden en
+``archived.json`` (contadores e histogramas; sus gauges se descartan) y se
+borran: los contadores no retroceden al reciclar un worker y el número de
+archivos no crece. El directorio se vacía al desplegar.
+"""
+import atexit
+import fcntl
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Límites (segundos) de los histogramas de latencia
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Registry:
+    """Métricas del proceso actual y agregación de las de todos los procesos"""
+
+    ARCHIVE = 'archived.json'
+
+    def __init__(self, directory=None, flush_interval=5):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.pid = os.getpid()
+        self.path = None
+        self.definitions = {}  # nombre -> (tipo, ayuda, etiquetas, límites)
+        self.values = {}  # (nombre, valores de etiquetas) -> valor o [cubetas, suma, cuenta]
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            atexit.register(self.flush)
+
+    def _start_flusher(self):
+        """Archivo e hilo de volcado del proceso actual.
+
+        Se crean con la primera métrica registrada, ya en el worker: si la
+        aplicación se cargó antes del fork, el proceso hijo usa su propio pid.
+        """
+        if not self.directory or (self.path and self.pid == os.getpid()):
+            return
+        with self._lock:
+            if self.path and self.pid == os.getpid():
+                return
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.values = {}
+            self.path = os.path.join(self.directory, f'{self.pid}-{uuid.uuid4().hex[:8]}.json')
+
+        def loop():
+            while True:
+                time.sleep(self.flush_interval)
+                self.flush()
+
+        threading.Thread(target=loop, name='metrics-flush', daemon=True).start()
+
+    # ---------- definición ----------
+
+    def counter(self, name, help, labels=()):
+        self.definitions[name] = ('counter', help, tuple(labels), None)
+
+    def gauge(self, name, help, labels=()):
+        self.definitions[name] = ('gauge', help, tuple(labels), None)
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.definitions[name] = ('histogram', help, tuple(labels), tuple(buckets))
+
+    # ---------- registro ----------
+
+    def inc(self, name, labels=(), amount=1):
+        self._start_flusher()
+        key = (name, tuple(labels))
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def observe(self, name, value, labels=()):
+        self._start_flusher()
+        buckets = self.definitions[name][3]
+        key = (name, tuple(labels))
+        with self._lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * len(buckets), 0.0, 0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    entry[0][index] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    # ---------- persistencia ----------
+
+    def _snapshot(self):
+        with self._lock:
+            return {'pid': self.pid,
+                    'values': [[name, list(labels), value if not isinstance(value, list)
+                                else [list(value[0]), value[1], value[2]]]
+                               for (name, labels), value in self.values.items()]}
+
+    def flush(self):
+        """Escribir las métricas del proceso en su archivo"""
+        if not self.path or self.pid != os.getpid():
+            return
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self._snapshot(), f)
+        os.replace(tmp, self.path)
+
+    def _read(self, name):
+        try:
+            with open(os.path.join(self.directory, name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # Archivo a medio escribir o borrado entre listdir y open
+            return None
+
+    def _write(self, name, snapshot):
+        path = os.path.join(self.directory, name)
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(f'{path}.tmp', path)
+
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    def _dead_files(self):
+        dead = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json') or name == self.ARCHIVE:
+                continue
+            try:
+                pid = int(name.split('-', 1)[0])
+            except ValueError:
+                continue
+            if pid != self.pid and not _alive(pid):
+                dead.append(name)
+        return dead
+
+    def _fold(self, archive, snapshot):
+        """Sumar a ``archive`` los contadores e histogramas de un proceso terminado"""
+        merged = {(name, tuple(labels)): value for name, labels, value in archive['values']}
+        for name, labels, value in snapshot['values']:
+            definition = self.definitions.get(name)
+            if definition is None or definition[0] == 'gauge':
+                continue
+            key = (name, tuple(labels))
+            current = merged.get(key)
+            if current is None:
+                merged[key] = value
+            elif definition[0] == 'histogram':
+                merged[key] = [[a + b for a, b in zip(current[0], value[0])],
+                               current[1] + value[1], current[2] + value[2]]
+            else:
+                merged[key] = current + value
+        archive['values'] = [[name, list(labels), value] for (name, labels), value in merged.items()]
+
+    @contextmanager
+    def _archive_lock(self, mode):
+        """Cerrojo entre procesos sobre ``archived.json`` y los archivos que funde"""
+        with open(os.path.join(self.directory, 'archived.lock'), 'w') as lock:
+            fcntl.flock(lock, mode)
+            yield
+
+    def compact(self):
+        """Fundir en ``archived.json`` los archivos de procesos terminados y borrarlos.
+
+        Con un cerrojo exclusivo entre procesos; ``archived.json`` recuerda los
+        archivos ya fundidos por si el proceso muere antes de borrarlos.
+        """
+        dead = self._dead_files()
+        if not dead:
+            return
+        with self._archive_lock(fcntl.LOCK_EX):
+            archive = self._read(self.ARCHIVE) or {'pid': None, 'values': []}
+            for name in archive.pop('compacted', ()):
+                self._remove(name)
+            compacted = []
+            for name in dead:
+                snapshot = self._read(name)
+                if snapshot is None:
+                    continue
+                self._fold(archive, snapshot)
+                compacted.append(name)
+            if not compacted:
+                return
+            archive['compacted'] = compacted
+            self._write(self.ARCHIVE, archive)
+            for name in compacted:
+                self._remove(name)
+
+    def _snapshots(self):
+        if not self.directory:
+            return [self._snapshot()]
+        self.flush()
+        self.compact()
+        # Con el cerrojo compartido ningún compact() funde un archivo entre la
+        # lectura de archived.json y la suya; los que ya figuran como fundidos
+        # (compact() interrumpido antes de borrarlos) no se vuelven a sumar
+        with self._archive_lock(fcntl.LOCK_SH):
+            archive = self._read(self.ARCHIVE)
+            skip = {self.ARCHIVE, *(archive or {}).get('compacted', ())}
+            snapshots = [archive] + [self._read(name) for name in os.listdir(self.directory)
+                                     if name.endswith('.json') and name not in skip]
+        return [snapshot for snapshot in snapshots if snapshot is not None]
+
+    def collect(self):
+        """Valores sumados de todos los procesos: {nombre: {etiquetas: valor}}"""
+        merged = {}
+        for snapshot in self._snapshots():
+            pid = snapshot['pid']
+            alive = pid is not None and (pid == self.pid or _alive(pid))
+            for name, labels, value in snapshot['values']:
+                definition = self.definitions.get(name)
+                if definition is None or (definition[0] == 'gauge' and not alive):
+                    continue
+                series = merged.setdefault(name, {})
+                labels = tuple(labels)
+                if definition[0] == 'histogram':
+                    current = series.setdefault(labels, [[0] * len(definition[3]), 0.0, 0])
+                    current[0] = [a + b for a, b in zip(current[0], value[0])]
+                    current[1] += value[1]
+                    current[2] += value[2]
+                else:
+                    series[labels] = series.get(labels, 0) + value
+        return merged
+
+    # ---------- exposición ----------
+
+    def render(self):
+        """Métricas agregadas en el formato de texto de Prometheus (0.0.4)"""
+        merged = self.collect()
+        lines = []
+        for name, (kind, help, label_names, buckets) in self.definitions.items():
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(merged.get(name, {}).items()):
+                if kind != 'histogram':
+                    lines.append(f'{name}{_labels(label_names, labels)} {_number(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip((*buckets, math.inf), (*value[0], value[2] - sum(value[0]))):
+                    cumulative += count
+                    le = (('le', _number(bound) if bound == math.inf else str(bound)),)
+                    lines.append(f'{name}_bucket{_labels(label_names, labels, le)} {cumulative}')
+                lines.append(f'{name}_sum{_labels(label_names, labels)} {_number(value[1])}')
+                lines.append(f'{name}_count{_labels(label_names, labels)} {value[2]}')
+        return '\n'.join(lines) + '\n'
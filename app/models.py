@@ -1,6 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from .passwords import hash_password, verify_password, needs_rehash
 from datetime import datetime
 import secrets
 
@@ -9,12 +9,18 @@ db = SQLAlchemy()
 # Tabla intermedia para relación many-to-many entre Post y Tag
 post_tags = db.Table('post_tags',
     db.Column('post_id', db.Integer, db.ForeignKey('posts.id'), primary_key=True),
-    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id'), primary_key=True)
+    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id'), primary_key=True),
+    # Publicaciones de una etiqueta (la clave primaria empieza por post_id)
+    db.Index('ix_post_tags_tag_id_post_id', 'tag_id', 'post_id')
 )
 
 class User(UserMixin, db.Model):
     """Modelo de Usuario"""
     __tablename__ = 'users'
+    __table_args__ = (
+        # Usuarios recientes del panel y listado de administración
+        db.Index('ix_users_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -24,13 +30,28 @@ class User(UserMixin, db.Model):
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Contadores denormalizados (ver app/counters.py)
+    posts_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comments_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    # Se incrementa para revocar todos los tokens JWT del usuario (ver app/tokens.py)
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     def set_password(self, password):
         """Hashear contraseña"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        """Verificar contraseña"""
-        return check_password_hash(self.password_hash, password)
+        """Verificar contraseña.
+        
+        Si es correcta y el hash usa parámetros antiguos se vuelve a hashear;
+        el llamador debe hacer commit para guardarlo.
+        """
+        if not verify_password(self.password_hash, password):
+            return False
+        if needs_rehash(self.password_hash):
+            self.set_password(password)
+        return True
     
     def is_admin(self):
         """Verificar si es administrador"""
@@ -46,20 +67,37 @@ class User(UserMixin, db.Model):
 class Post(db.Model):
     """Modelo de Publicación"""
     __tablename__ = 'posts'
+    __table_args__ = (
+        # Todos los listados ordenan por (created_at, id); también cursores
+        db.Index('ix_posts_created_at_id', 'created_at', 'id'),
+        db.Index('ix_posts_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_posts_category', 'category'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
     category = db.Column(db.String(50), default='otros')
-    image_url = db.Column(db.String(300))
+    image_url = db.Column(db.String(300), index=True)
+    image_variants = db.Column(db.JSON(none_as_null=True))  # ver app/images.py
+    # HTML sanitizado y campos derivados, generados al guardar (ver app/content.py)
+    content_html = db.Column(db.Text)
+    excerpt = db.Column(db.String(300))
+    word_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    reading_time = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # minutos
+    content_version = db.Column(db.String(12))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
+    # Contador denormalizado (ver app/counters.py)
+    comments_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     # Relaciones
     author = db.relationship('User', backref=db.backref('posts', lazy=True, cascade='all, delete-orphan'))
     comments = db.relationship('Comment', backref='post', lazy=True, cascade='all, delete-orphan')
-    tags = db.relationship('Tag', secondary=post_tags, lazy='subquery',
+    # Las etiquetas se cargan solo cuando se acceden o con selectinload()
+    tags = db.relationship('Tag', secondary=post_tags, lazy=True,
                           backref=db.backref('posts', lazy=True))
     
     def __repr__(self):
@@ -68,6 +106,12 @@ class Post(db.Model):
 class Comment(db.Model):
     """Modelo de Comentario"""
     __tablename__ = 'comments'
+    __table_args__ = (
+        # Comentarios de una publicación, del más reciente al más antiguo
+        db.Index('ix_comments_post_id_created_at', 'post_id', 'created_at'),
+        db.Index('ix_comments_created_at_id', 'created_at', 'id'),
+        db.Index('ix_comments_user_id', 'user_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
@@ -85,15 +129,34 @@ class Comment(db.Model):
 class Tag(db.Model):
     """Modelo de Tag/Etiqueta"""
     __tablename__ = 'tags'
+    __table_args__ = (
+        # Nube de etiquetas: las más usadas primero
+        db.Index('ix_tags_posts_count_id', 'posts_count', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), unique=True, nullable=False)
     slug = db.Column(db.String(50), unique=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Contador denormalizado (ver app/counters.py)
+    posts_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     def __repr__(self):
         return f'<Tag {self.name}>'
 
+class SiteStat(db.Model):
+    """Estadística agregada del panel de administración (ver app/stats.py)"""
+    __tablename__ = 'site_stats'
+    
+    # users, posts, comments, category, users_daily, posts_daily, comments_daily, reconciled_at
+    metric = db.Column(db.String(20), primary_key=True)
+    bucket = db.Column(db.String(50), primary_key=True, default='')  # categoría o fecha ISO
+    value = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<SiteStat {self.metric}:{self.bucket}={self.value}>'
+
 class PasswordResetToken(db.Model):
     """Modelo para tokens de recuperación de contraseña"""
     __tablename__ = 'password_reset_tokens'
@@ -0,0 +1,183 @@
+"""
+Paginación por cursor (keyset) y conteos cacheados para los listados
+"""
+import base64
+import json
+import math
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import func, literal, select, text, tuple_
+
+from .models import db
+
+
+class InvalidCursor(ValueError):
+    """Cursor mal formado o manipulado"""
+
+
+def encode_cursor(created_at, item_id):
+    """Codificar (created_at, id) como cursor opaco"""
+    raw = json.dumps([created_at.isoformat(), item_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decodificar un cursor a (created_at, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(item_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor('Cursor inválido') from e
+
+
+class KeysetPagination:
+    """Página de resultados obtenida por cursor sobre (created_at, id)"""
+
+    is_keyset = True
+    page = None
+
+    def __init__(self, items, per_page, has_next, has_prev, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.total = total
+
+    @property
+    def pages(self):
+        """Número aproximado de páginas según el total cacheado"""
+        if not self.total:
+            return 0
+        return math.ceil(self.total / self.per_page)
+
+    @property
+    def next_cursor(self):
+        if not self.has_next or not self.items:
+            return None
+        last = self.items[-1]
+        return encode_cursor(last.created_at, last.id)
+
+    @property
+    def prev_cursor(self):
+        if not self.has_prev or not self.items:
+            return None
+        first = self.items[0]
+        return encode_cursor(first.created_at, first.id)
+
+
+def keyset_paginate(stmt, model, per_page, after=None, before=None, total=None):
+    """Obtener una página en orden (created_at, id) descendente.
+
+    ``after`` devuelve los elementos siguientes al cursor y ``before`` los
+    anteriores. El costo no depende de la profundidad de la página.
+    """
+    key = tuple_(model.created_at, model.id)
+
+    if before:
+        created_at, item_id = decode_cursor(before)
+        bound = tuple_(literal(created_at, model.created_at.type), literal(item_id, model.id.type))
+        stmt = stmt.where(key > bound).order_by(model.created_at.asc(), model.id.asc())
+    else:
+        if after:
+            created_at, item_id = decode_cursor(after)
+            bound = tuple_(literal(created_at, model.created_at.type), literal(item_id, model.id.type))
+            stmt = stmt.where(key < bound)
+        stmt = stmt.order_by(model.created_at.desc(), model.id.desc())
+
+    # Un elemento extra indica si hay más resultados en esa dirección
+    items = db.session.scalars(stmt.limit(per_page + 1)).all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+
+    if before:
+        items.reverse()
+        return KeysetPagination(items, per_page, has_next=True, has_prev=has_more, total=total)
+
+    return KeysetPagination(items, per_page, has_next=has_more, has_prev=bool(after), total=total)
+
+
+def cached_count(key, stmt):
+    """Contar los resultados de una consulta, cacheado durante COUNT_CACHE_TTL segundos.
+
+    La caché es un LRU de ``COUNT_CACHE_MAX_ENTRIES`` claves (``init_cache``):
+    las búsquedas crean una clave por consulta distinta.
+    """
+    cache = current_app.extensions['count_cache']
+    value = cache.get(key)
+    if value is None:
+        value = db.session.scalar(select(func.count()).select_from(stmt.order_by(None).subquery()))
+        cache.set(key, value)
+    return value
+
+
+def estimated_count(model):
+    """Total aproximado de filas de una tabla.
+
+    En PostgreSQL, las tablas grandes usan la estimación del planificador
+    (pg_class.reltuples) en lugar de un COUNT(*) completo.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        estimate = db.session.scalar(
+            text('SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)'),
+            {'table': model.__tablename__}
+        )
+        if estimate is not None and estimate >= current_app.config['COUNT_ESTIMATE_THRESHOLD']:
+            return estimate
+
+    return cached_count(('table', model.__tablename__), select(model.id))
+
+
+def per_page_arg(default=10):
+    """``per_page`` de la petición limitado a ``API_MAX_PER_PAGE``"""
+    per_page = request.args.get('per_page', default, type=int)
+    return max(1, min(per_page, current_app.config['API_MAX_PER_PAGE']))
+
+
+def paginate_listing(stmt, model, per_page, order_by=None, count_key=None, total=None):
+    """Paginar un listado según los parámetros de la petición.
+
+    Con ``after`` o ``before`` se usa el modo cursor; si no, paginación por
+    número de página con el total cacheado en vez de un COUNT(*) por petición.
+    ``total`` evita el conteo cuando ya se conoce (p. ej. un contador
+    denormalizado). ``stmt`` no debe incluir ORDER BY.
+
+    Los cursores recorren (created_at, id): con otro ``order_by`` (p. ej. la
+    relevancia de una búsqueda) se rechazan con ``InvalidCursor``.
+    """
+    has_cursor = 'after' in request.args or 'before' in request.args
+    if has_cursor and order_by is not None:
+        raise InvalidCursor('Este listado no admite paginación por cursor')
+
+    if total is None:
+        total = estimated_count(model) if count_key is None else cached_count(count_key, stmt)
+
+    if has_cursor:
+        return keyset_paginate(
+            stmt, model, per_page,
+            after=request.args.get('after') or None,
+            before=request.args.get('before') or None,
+            total=total
+        )
+
+    if order_by is None:
+        order_by = (model.created_at.desc(), model.id.desc())
+
+    page = request.args.get('page', 1, type=int)
+    pagination = db.paginate(stmt.order_by(*order_by), page=page, per_page=per_page,
+                             error_out=False, count=False)
+    pagination.total = total
+    return pagination
+
+
+def pagination_meta(pagination):
+    """Metadatos de paginación para las respuestas JSON"""
+    is_keyset = getattr(pagination, 'is_keyset', False)
+    return {
+        'total': pagination.total,
+        'pages': pagination.pages,
+        'current_page': pagination.page,
+        'next_cursor': pagination.next_cursor if is_keyset else None,
+        'prev_cursor': pagination.prev_cursor if is_keyset else None
+    }
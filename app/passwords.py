@@ -0,0 +1,102 @@
+"""
+Hash y verificación de contraseñas en un pool de procesos acotado
+
+scrypt/PBKDF2 consumen CPU durante decenas de milisegundos; ejecutarlos en
+los hilos de gunicorn bloquea el renderizado de páginas. Este módulo los
+envía a un ``ProcessPoolExecutor`` con un límite de trabajos en espera: si
+el pool está saturado se lanza ``PasswordPoolBusy`` para que la vista
+responda 503 en lugar de acumular peticiones.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+
+class PasswordPoolBusy(Exception):
+    """El pool de contraseñas no admite más trabajos"""
+
+    retry_after = 1
+
+
+class PasswordPool:
+    """Pool de procesos con admisión limitada"""
+
+    def __init__(self, workers, queue_limit, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        # Trabajos en ejecución más los que pueden esperar en cola
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Se crea en el primer uso, ya dentro del worker de gunicorn
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+        return self._executor
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordPoolBusy('Demasiadas operaciones de contraseña en curso')
+        try:
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _get_pool():
+    """Pool de la aplicación actual, o None para ejecutar en el hilo actual"""
+    if not has_app_context() or not current_app.config['PASSWORD_POOL_WORKERS']:
+        return None
+    pool = current_app.extensions.get('password_pool')
+    if pool is None:
+        pool = PasswordPool(
+            workers=current_app.config['PASSWORD_POOL_WORKERS'],
+            queue_limit=current_app.config['PASSWORD_POOL_QUEUE_LIMIT'],
+            timeout=current_app.config['PASSWORD_POOL_QUEUE_TIMEOUT']
+        )
+        current_app.extensions['password_pool'] = pool
+    return pool
+
+
+def hash_method():
+    if has_app_context():
+        return current_app.config['PASSWORD_HASH_METHOD']
+    return DEFAULT_METHOD
+
+
+def hash_password(password):
+    """Generar el hash de una contraseña con el método configurado"""
+    pool = _get_pool()
+    if pool is None:
+        return generate_password_hash(password, method=hash_method())
+    return pool.run(generate_password_hash, password, hash_method())
+
+
+def verify_password(password_hash, password):
+    """Verificar una contraseña contra su hash"""
+    pool = _get_pool()
+    if pool is None:
+        return check_password_hash(password_hash, password)
+    return pool.run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """Comprobar si el hash usa parámetros distintos a los configurados"""
+    method = password_hash.split('$', 1)[0]
+    return method != hash_method()
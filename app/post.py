@@ -1,9 +1,15 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, current_app
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
 from .models import db, Post, Comment
-import os
-import uuid
+from .search import index_post, remove_post
+from . import counters
+from .cache import cached
+from .conditional import conditional, post_page_validator
+from .images import enqueue_variants
+from .uploads import store_upload, release_upload
+from .content import render_post, enqueue_render
+from .tags import parse_tag_names, set_post_tags
+from sqlalchemy.orm import joinedload, selectinload
 
 bp = Blueprint('post', __name__, url_prefix='/post')
 
@@ -13,28 +19,20 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
 
 def save_image(file):
-    """Guardar imagen y retornar la URL"""
+    """Guardar imagen y retornar la URL.
+    
+    El nombre es el hash del contenido, así que las imágenes repetidas se
+    guardan una sola vez.
+    """
     if file and allowed_file(file.filename):
-        # Generar nombre único
         ext = file.filename.rsplit('.', 1)[1].lower()
-        filename = f"{uuid.uuid4().hex}.{ext}"
-        
-        # Crear carpeta si no existe
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        os.makedirs(upload_folder, exist_ok=True)
-        
-        # Guardar archivo
-        filepath = os.path.join(upload_folder, filename)
-        file.save(filepath)
-        
-        # Retornar URL relativa
-        return f"uploads/{filename}"
+        return store_upload(file, ext)
     return None
 
 @bp.route('/post')
 def post():
     """Listar todas las publicaciones"""
-    posts = Post.query.order_by(Post.created_at.desc()).all()
+    posts = Post.query.options(joinedload(Post.author)).order_by(Post.created_at.desc()).all()
     return render_template('post/post.html', posts=posts)
 
 @bp.route('/create', methods=['GET', 'POST'])
@@ -50,6 +48,11 @@ def create():
         if not title or not content:
             flash('El título y el contenido son obligatorios.', 'danger')
             return render_template('post/create.html')
+        try:
+            tag_names = parse_tag_names(request.form.get('tags', ''))
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return render_template('post/create.html')
         
         # Manejar imagen
         image_url = None
@@ -69,9 +72,18 @@ def create():
             user_id=current_user.id
         )
         
+        render_post(post)
         db.session.add(post)
+        index_post(post)
+        counters.post_created(post)
+        if tag_names:
+            set_post_tags(post, tag_names)
         db.session.commit()
         
+        # Las variantes de la imagen y el HTML de cuerpos grandes se generan en segundo plano
+        enqueue_variants(post)
+        enqueue_render(post)
+        
         flash('¡Publicación creada exitosamente!', 'success')
         return redirect(url_for('home.blog'))
     
@@ -97,24 +109,42 @@ def update(post_id):
         if not title or not content:
             flash('El título y el contenido son obligatorios.', 'danger')
             return render_template('post/update.html', post=post)
+        try:
+            tag_names = parse_tag_names(request.form.get('tags', ''))
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return render_template('post/update.html', post=post)
         
         # Manejar imagen
+        new_image = False
+        old_image_url = post.image_url
         if 'image' in request.files:
             file = request.files['image']
             if file.filename:
                 image_url = save_image(file)
-                if image_url:
-                    post.image_url = image_url
-                else:
+                if image_url is None:
                     flash('Formato de imagen no válido.', 'warning')
+                elif image_url != old_image_url:
+                    post.image_url = image_url
+                    post.image_variants = None
+                    new_image = True
+                # La misma imagen: se conservan el archivo y sus variantes
         
         # Actualizar publicación
         post.title = title
         post.content = content
         post.category = category
         
+        render_post(post)
+        index_post(post)
+        set_post_tags(post, tag_names)
         db.session.commit()
         
+        enqueue_render(post)
+        if new_image:
+            enqueue_variants(post)
+            release_upload(old_image_url)
+        
         flash('¡Publicación actualizada exitosamente!', 'success')
         return redirect(url_for('post.view', post_id=post.id))
     
@@ -132,8 +162,12 @@ def delete(post_id):
         return redirect(url_for('home.blog'))
     
     if request.method == 'POST':
+        image_url = post.image_url
+        remove_post(post.id)
+        counters.post_deleted(post)
         db.session.delete(post)
         db.session.commit()
+        release_upload(image_url)
         
         flash('Publicación eliminada exitosamente.', 'info')
         return redirect(url_for('home.blog'))
@@ -141,8 +175,11 @@ def delete(post_id):
     return render_template('post/delete.html', post=post)
 
 @bp.route('/view/<int:post_id>')
+@conditional(post_page_validator)
+@cached(tags=lambda post_id: [f'post:{post_id}'], anonymous_only=True)
 def view(post_id):
     """Ver detalles de una publicación"""
-    post = Post.query.get_or_404(post_id)
-    comments = post.comments.order_by(Comment.created_at.desc()).all()
+    post = Post.query.options(joinedload(Post.author), selectinload(Post.tags)).get_or_404(post_id)
+    comments = Comment.query.options(joinedload(Comment.author)).filter_by(post_id=post.id) \
+        .order_by(Comment.created_at.desc()).all()
     return render_template('post/view.html', post=post, comments=comments)
\ No newline at end of file
@@ -0,0 +1,304 @@
+"""
+Registro de consultas lentas y estadísticas por huella de sentencia
+
+Cada sentencia SQL se agrupa por su huella normalizada (literales y
+parámetros sustituidos por ``?``, listas ``IN`` y filas de ``VALUES``
+colapsadas) y por el endpoint de Flask que la ejecutó (``-`` fuera de una
+petición). Se acumulan ejecuciones, tiempo total y máximo.
+
+Fuera de las peticiones solo se registra en los workers que ya atendieron
+alguna (trabajos en segundo plano) y en los comandos largos marcados con
+``@tracks_queries`` (seed, import, rerender...): el arranque de la aplicación
+(``create_all``) y los comandos cortos, como ``flask queries top``, no dejan
+estadísticas ni archivos.
+
+Las que tardan más de ``SLOW_QUERY_THRESHOLD`` ms se registran en el log con
+la forma de sus parámetros (tipos, nunca valores) y, la primera vez que
+aparece cada huella, se captura su plan (``EXPLAIN QUERY PLAN`` en SQLite,
+``EXPLAIN`` en PostgreSQL) en segundo plano con una conexión propia.
+
+Como las métricas (``app/metrics.py``), cada worker vuelca sus estadísticas
+a un archivo en ``QUERY_STATS_DIR``; ``flask queries top`` las suma y muestra
+las huellas más costosas. Los archivos de procesos terminados se funden en
+``archived.json``.
+"""
+import logging
+import os
+import re
+from functools import lru_cache, wraps
+
+import click
+from flask import current_app, has_request_context, request
+from flask.cli import AppGroup
+
+from . import background
+from .metrics import Registry
+
+logger = logging.getLogger(__name__)
+
+queries_cli = AppGroup('queries', help='Estadísticas de consultas SQL y consultas lentas.')
+
+OTHER = '(otras huellas)'
+SORT_KEYS = {
+    'total': lambda entry: entry['total'],
+    'avg': lambda entry: entry['total'] / entry['count'],
+    'max': lambda entry: entry['max'],
+    'count': lambda entry: entry['count'],
+    'slow': lambda entry: entry['slow'],
+}
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|\$\d+|(?<![:\w]):\w+')
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_VALUES = re.compile(r'\bVALUES\s*\([^()]*\)(?:\s*,\s*\([^()]*\))*', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement):
+    """Huella de una sentencia: igual para todas las ejecuciones con distintos valores"""
+    normalized = _STRING.sub('?', statement)
+    normalized = _PLACEHOLDER.sub('?', normalized)
+    normalized = _NUMBER.sub('?', normalized)
+    normalized = _IN_LIST.sub('IN (...)', normalized)
+    normalized = _VALUES.sub('VALUES (...)', normalized)
+    return _SPACES.sub(' ', normalized).strip()
+
+
+def _type_name(value):
+    return 'NULL' if value is None else type(value).__name__
+
+
+def _shape(parameters):
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{key}: {_type_name(value)}' for key, value in parameters.items()) + '}'
+    names = [_type_name(value) for value in parameters]
+    if len(names) > 3 and len(set(names)) == 1:
+        return f'({names[0]} × {len(names)})'
+    return '(' + ', '.join(names) + ')'
+
+
+def parameter_shape(parameters, executemany=False):
+    """Tipos de los parámetros enlazados, sin sus valores"""
+    if not parameters:
+        return '()'
+    if executemany:
+        return f'{len(parameters)} × {_shape(parameters[0])}'
+    return _shape(parameters)
+
+
+def _explain_sql(dialect_name, statement):
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect_name == 'sqlite' else 'EXPLAIN '
+    return prefix + statement
+
+
+def _format_plan(rows):
+    # SQLite: (id, parent, notused, detail); PostgreSQL: una línea de texto por fila
+    return '\n'.join(str(row[-1]) for row in rows)
+
+
+class QueryStats(Registry):
+    """Estadísticas por huella y endpoint del proceso actual"""
+
+    def __init__(self, directory=None, flush_interval=5, max_fingerprints=1000):
+        super().__init__(directory, flush_interval)
+        self.max_fingerprints = max_fingerprints
+        self.fingerprints = set()
+        self.plans = {}  # huella -> plan, o None mientras se captura
+        self.outside_requests = False  # registrar sentencias ejecutadas fuera de una petición
+
+    def record(self, fingerprint, endpoint, elapsed, slow=False):
+        self._start_flusher()
+        with self._lock:
+            if fingerprint not in self.fingerprints:
+                if len(self.fingerprints) >= self.max_fingerprints:
+                    fingerprint = OTHER
+                else:
+                    self.fingerprints.add(fingerprint)
+            entry = self.values.get((fingerprint, endpoint))
+            if entry is None:
+                entry = self.values[(fingerprint, endpoint)] = [0, 0.0, 0.0, 0]
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+            entry[3] += slow
+
+    def claim_plan(self, fingerprint):
+        """True si el plan de la huella aún no se ha pedido (solo se captura una vez)"""
+        with self._lock:
+            if fingerprint in self.plans:
+                return False
+            self.plans[fingerprint] = None
+            return True
+
+    def set_plan(self, fingerprint, plan):
+        with self._lock:
+            self.plans[fingerprint] = plan
+
+    def _snapshot(self):
+        with self._lock:
+            return {'pid': self.pid,
+                    'values': [[fingerprint, endpoint, list(entry)]
+                               for (fingerprint, endpoint), entry in self.values.items()],
+                    'plans': {fingerprint: plan for fingerprint, plan in self.plans.items() if plan}}
+
+    def _fold(self, archive, snapshot):
+        merged = {(fingerprint, endpoint): entry for fingerprint, endpoint, entry in archive['values']}
+        for fingerprint, endpoint, entry in snapshot['values']:
+            current = merged.get((fingerprint, endpoint))
+            if current is None:
+                merged[(fingerprint, endpoint)] = entry
+            else:
+                merged[(fingerprint, endpoint)] = [current[0] + entry[0], current[1] + entry[1],
+                                                   max(current[2], entry[2]), current[3] + entry[3]]
+        archive['values'] = [[fingerprint, endpoint, entry] for (fingerprint, endpoint), entry in merged.items()]
+        archive['plans'] = {**archive.get('plans', {}), **snapshot.get('plans', {})}
+
+    def top(self, limit=10, sort='total', endpoint=None):
+        """Huellas más costosas de todos los procesos"""
+        merged = {}
+        for snapshot in self._snapshots():
+            for fingerprint, entry_endpoint, (count, total, maximum, slow) in snapshot['values']:
+                if endpoint and entry_endpoint != endpoint:
+                    continue
+                entry = merged.setdefault(fingerprint, {'fingerprint': fingerprint, 'count': 0, 'total': 0.0,
+                                                        'max': 0.0, 'slow': 0, 'endpoints': {}, 'plan': None})
+                entry['count'] += count
+                entry['total'] += total
+                entry['max'] = max(entry['max'], maximum)
+                entry['slow'] += slow
+                entry['endpoints'][entry_endpoint] = entry['endpoints'].get(entry_endpoint, 0) + count
+            for fingerprint, plan in snapshot.get('plans', {}).items():
+                if fingerprint in merged:
+                    merged[fingerprint]['plan'] = plan
+        return sorted(merged.values(), key=SORT_KEYS[sort], reverse=True)[:limit]
+
+    def reset(self):
+        with self._lock:
+            self.values = {}
+            self.fingerprints = set()
+            self.plans = {}
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    os.remove(os.path.join(self.directory, name))
+
+
+def create_query_stats(config, instance_path):
+    directory = config['QUERY_STATS_DIR']
+    if directory == '':
+        directory = os.path.join(instance_path, 'query_stats')
+    return QueryStats(directory, flush_interval=config['METRICS_FLUSH_INTERVAL'],
+                      max_fingerprints=config['QUERY_STATS_MAX_FINGERPRINTS'])
+
+
+# ==================== CAPTURA ====================
+
+def capture_plan(fingerprint, statement, parameters):
+    """Ejecutar EXPLAIN con una conexión propia (trabajo en segundo plano)"""
+    from .models import db
+
+    with db.engine.connect() as connection:
+        rows = connection.exec_driver_sql(_explain_sql(connection.dialect.name, statement), parameters).all()
+    plan = _format_plan(rows)
+    current_app.extensions['query_stats'].set_plan(fingerprint, plan)
+    logger.info('Plan de la consulta lenta %s:\n%s', fingerprint, plan)
+
+
+def _capture_plan_inline(conn, fingerprint, statement, parameters):
+    # En la misma conexión de la sentencia, sin eventos ni cambio de
+    # transacción (tests con la base en memoria compartida)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(_explain_sql(conn.dialect.name, statement), parameters)
+        plan = _format_plan(cursor.fetchall())
+    finally:
+        cursor.close()
+    current_app.extensions['query_stats'].set_plan(fingerprint, plan)
+    logger.info('Plan de la consulta lenta %s:\n%s', fingerprint, plan)
+
+
+def tracks_queries(f):
+    """Registrar las sentencias de un comando CLI largo (fuera de peticiones)"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        stats = current_app.extensions.get('query_stats')
+        if stats is not None:
+            stats.outside_requests = True
+        return f(*args, **kwargs)
+    return decorated
+
+
+def start_tracking():
+    # Worker atendiendo peticiones: registrar también sus trabajos en segundo plano
+    current_app.extensions['query_stats'].outside_requests = True
+
+
+def record_statement(conn, statement, parameters, executemany, elapsed):
+    """Acumular una sentencia ejecutada; registrar y explicar las lentas"""
+    if statement.startswith('EXPLAIN'):
+        return
+    stats = current_app.extensions['query_stats']
+    if has_request_context():
+        endpoint = request.endpoint or 'none'
+    elif stats.outside_requests:
+        endpoint = '-'
+    else:
+        return
+    key = fingerprint(statement)
+    threshold = current_app.config['SLOW_QUERY_THRESHOLD']
+    slow = bool(threshold) and elapsed * 1000 >= threshold
+    stats.record(key, endpoint, elapsed, slow)
+    if not slow:
+        return
+    logger.warning('Consulta lenta (%.1f ms) en %s: %s parámetros=%s',
+                   elapsed * 1000, endpoint, key, parameter_shape(parameters, executemany))
+
+    mode = current_app.config['SLOW_QUERY_EXPLAIN']
+    keyword = statement.split(None, 1)[0].upper() if statement.strip() else ''
+    if mode == 'off' or executemany or keyword not in ('SELECT', 'WITH'):
+        return
+    if not stats.claim_plan(key):
+        return
+    if mode == 'sync':
+        _capture_plan_inline(conn, key, statement, parameters)
+    else:
+        background.submit(capture_plan, key, statement, parameters)
+
+
+# ==================== CLI ====================
+
+@queries_cli.command('top')
+@click.option('-n', '--limit', default=10, show_default=True, help='Huellas a mostrar.')
+@click.option('--sort', type=click.Choice(list(SORT_KEYS)), default='total', show_default=True,
+              help='Orden: tiempo total, medio, máximo, ejecuciones o consultas lentas.')
+@click.option('--endpoint', help='Solo las sentencias de este endpoint (- = fuera de peticiones).')
+@click.option('--plans', is_flag=True, help='Mostrar el plan capturado de las consultas lentas.')
+def top_command(limit, sort, endpoint, plans):
+    """Sentencias SQL más costosas sumando todos los workers"""
+    entries = current_app.extensions['query_stats'].top(limit, sort, endpoint)
+    if not entries:
+        click.echo('Sin estadísticas de consultas')
+        return
+    for rank, entry in enumerate(entries, 1):
+        click.echo(f"{rank}. {entry['total'] * 1000:.1f} ms en total · {entry['count']} ejecuciones · "
+                   f"media {entry['total'] / entry['count'] * 1000:.2f} ms · máx {entry['max'] * 1000:.1f} ms · "
+                   f"{entry['slow']} lentas")
+        endpoints = sorted(entry['endpoints'].items(), key=lambda item: -item[1])
+        click.echo('   ' + ', '.join(f'{name} ({count})' for name, count in endpoints))
+        click.echo(f"   {entry['fingerprint']}")
+        if plans and entry['plan']:
+            for line in entry['plan'].splitlines():
+                click.echo(f'      {line}')
+
+
+@queries_cli.command('reset')
+def reset_command():
+    """Borrar las estadísticas de consultas guardadas.
+
+    Los workers en marcha conservan las suyas en memoria y las vuelven a
+    escribir; para empezar de cero, reiniciarlos después.
+    """
+    current_app.extensions['query_stats'].reset()
+    click.echo('Estadísticas de consultas borradas')
@@ -0,0 +1,257 @@
+"""
+Motor de búsqueda de texto completo para publicaciones
+
+Mantiene un índice invertido según el motor de base de datos:
+- PostgreSQL: tabla ``posts_search`` con columna tsvector (configuración
+  'spanish') e índice GIN.
+- SQLite: tabla virtual FTS5 ``posts_fts`` con tokenizador unicode61 sin
+  diacríticos.
+Si ninguno está disponible se usa ILIKE como respaldo.
+"""
+import re
+import unicodedata
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import column, false, func, literal_column, select, table, text
+
+from .models import db, Post
+
+search_cli = AppGroup('search', help='Gestión del índice de búsqueda.')
+
+# Tablas del índice (solo se usan para construir consultas)
+posts_fts = table('posts_fts', column('rowid'), column('title'), column('content'))
+posts_search = table('posts_search', column('post_id'), column('document'))
+
+TAG_RE = re.compile(r'<[^>]+>')
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+# Diacríticos que NFKD separa de las letras latinas (á -> a + ́)
+COMBINING_RE = re.compile('[\u0300-\u036f]')
+
+# Peso del título frente al contenido en el ranking de FTS5 (bm25)
+FTS_TITLE_WEIGHT = 10.0
+FTS_CONTENT_WEIGHT = 1.0
+
+
+def normalize_text(value):
+    """Quitar etiquetas HTML y acentos, y pasar a minúsculas"""
+    if not value:
+        return ''
+    value = TAG_RE.sub(' ', value)
+    if not value.isascii():
+        value = COMBINING_RE.sub('', unicodedata.normalize('NFKD', value))
+    return value.lower()
+
+
+def tokenize_query(query):
+    """Extraer los términos de búsqueda normalizados"""
+    return TOKEN_RE.findall(normalize_text(query))
+
+
+def get_backend():
+    """Motor de búsqueda activo: 'postgres', 'fts5' o 'like'"""
+    return current_app.extensions.get('search_backend', 'like')
+
+
+# Tablas del índice, creadas fuera de los modelos: las migraciones
+# automáticas no deben compararlas ni eliminarlas
+INDEX_TABLES = ('posts_search', 'posts_fts')
+
+
+def is_index_table(name):
+    """Tabla del índice o tabla interna de FTS5 (posts_fts_data, posts_fts_idx...)"""
+    return name in INDEX_TABLES or name.startswith('posts_fts_')
+
+
+def create_index(conn):
+    """Crear las estructuras del índice en la conexión dada y retornar el motor"""
+    dialect = conn.dialect.name
+    if dialect == 'postgresql':
+        conn.execute(text(
+            'CREATE TABLE IF NOT EXISTS posts_search ('
+            ' post_id INTEGER PRIMARY KEY REFERENCES posts(id) ON DELETE CASCADE,'
+            ' document TSVECTOR NOT NULL)'
+        ))
+        conn.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_posts_search_document '
+            'ON posts_search USING GIN (document)'
+        ))
+        return 'postgres'
+    if dialect == 'sqlite':
+        conn.execute(text(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5('
+            'title, content, tokenize="unicode61 remove_diacritics 2")'
+        ))
+        return 'fts5'
+    return 'like'
+
+
+def ensure_search_index():
+    """Crear las estructuras del índice si no existen y registrar el motor"""
+    backend = 'like'
+
+    try:
+        with db.engine.begin() as conn:
+            backend = create_index(conn)
+    except Exception as e:
+        # Sin FTS5 o sin permisos: se mantiene la búsqueda por ILIKE
+        current_app.logger.warning(f'Índice de búsqueda no disponible: {e}')
+
+    current_app.extensions['search_backend'] = backend
+    return backend
+
+
+def index_post(post):
+    """Insertar o actualizar una publicación en el índice.
+
+    Se ejecuta dentro de la transacción actual; el llamador hace el commit.
+    """
+    backend = get_backend()
+    if backend == 'like':
+        return
+
+    if post.id is None:
+        db.session.flush()
+
+    _index_row(backend, post.id, post.title, post.content)
+
+
+def _index_row(backend, post_id, title, content):
+    """Escribir una fila del índice"""
+    title = normalize_text(title)
+    content = normalize_text(content)
+
+    if backend == 'postgres':
+        db.session.execute(text(
+            'INSERT INTO posts_search (post_id, document) VALUES (:id, '
+            "setweight(to_tsvector('spanish', :title), 'A') || "
+            "setweight(to_tsvector('spanish', :content), 'B')) "
+            'ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document'
+        ), {'id': post_id, 'title': title, 'content': content})
+    else:
+        db.session.execute(text('DELETE FROM posts_fts WHERE rowid = :id'), {'id': post_id})
+        db.session.execute(text(
+            'INSERT INTO posts_fts (rowid, title, content) VALUES (:id, :title, :content)'
+        ), {'id': post_id, 'title': title, 'content': content})
+
+
+def index_new_posts(rows):
+    """Indexar en bloque publicaciones recién insertadas.
+
+    ``rows`` son tuplas ``(id, title, content)``; se escriben con un único
+    executemany dentro de la transacción actual.
+    """
+    backend = get_backend()
+    if backend == 'like' or not rows:
+        return
+
+    _insert_rows(db.session, backend, rows)
+
+
+def _insert_rows(bind, backend, rows):
+    """Escribir filas nuevas del índice con un executemany en ``bind``"""
+    params = [{'id': post_id, 'title': normalize_text(title), 'content': normalize_text(content)}
+              for post_id, title, content in rows]
+    if backend == 'postgres':
+        bind.execute(text(
+            'INSERT INTO posts_search (post_id, document) VALUES (:id, '
+            "setweight(to_tsvector('spanish', :title), 'A') || "
+            "setweight(to_tsvector('spanish', :content), 'B'))"
+        ), params)
+    else:
+        bind.execute(text(
+            'INSERT INTO posts_fts (rowid, title, content) VALUES (:id, :title, :content)'
+        ), params)
+
+
+def remove_post(post_id):
+    """Eliminar una publicación del índice"""
+    backend = get_backend()
+    if backend == 'postgres':
+        db.session.execute(text('DELETE FROM posts_search WHERE post_id = :id'), {'id': post_id})
+    elif backend == 'fts5':
+        db.session.execute(text('DELETE FROM posts_fts WHERE rowid = :id'), {'id': post_id})
+
+
+def search_statement(query):
+    """Construir la consulta de publicaciones que coinciden y su orden por relevancia.
+
+    Retorna ``(stmt, order_by)``; ``stmt`` no incluye ORDER BY para que el
+    conteo de resultados no lo arrastre. Los resultados solo se paginan por
+    número de página: los cursores siguen la fecha, no la relevancia. Si la
+    consulta no contiene términos buscables no coincide ninguna publicación.
+    """
+    terms = tokenize_query(query)
+    if not terms:
+        return select(Post).where(false()), (Post.created_at.desc(),)
+
+    backend = get_backend()
+
+    if backend == 'postgres':
+        # Coincidencia por prefijo de cada término (búsqueda mientras se escribe)
+        tsquery = func.to_tsquery('spanish', ' & '.join(f'{term}:*' for term in terms))
+        stmt = (
+            select(Post)
+            .join(posts_search, posts_search.c.post_id == Post.id)
+            .where(posts_search.c.document.op('@@')(tsquery))
+        )
+        return stmt, (func.ts_rank_cd(posts_search.c.document, tsquery).desc(),
+                      Post.created_at.desc())
+
+    if backend == 'fts5':
+        # Términos entre comillas para no interpretar la sintaxis de FTS5
+        match = ' '.join(f'"{term}"*' for term in terms)
+        rank = func.bm25(literal_column('posts_fts'), FTS_TITLE_WEIGHT, FTS_CONTENT_WEIGHT)
+        stmt = (
+            select(Post)
+            .join(posts_fts, posts_fts.c.rowid == Post.id)
+            .where(literal_column('posts_fts').op('MATCH')(match))
+        )
+        return stmt, (rank, Post.created_at.desc())
+
+    pattern = f'%{query}%'
+    stmt = select(Post).where(Post.title.ilike(pattern) | Post.content.ilike(pattern))
+    return stmt, (Post.created_at.desc(),)
+
+
+def fill_index(bind, backend, batch_size=500):
+    """Vaciar el índice y llenarlo de nuevo a partir de la tabla posts.
+
+    ``bind`` es la sesión o una conexión (las migraciones usan la suya); el
+    commit queda a cargo del llamador. Retorna el número de publicaciones.
+    """
+    if backend == 'postgres':
+        bind.execute(text('DELETE FROM posts_search'))
+    elif backend == 'fts5':
+        bind.execute(text('DELETE FROM posts_fts'))
+    else:
+        return 0
+
+    # Solo las columnas indexadas, sin materializar objetos Post
+    rows = bind.execute(
+        select(Post.id, Post.title, Post.content)
+        .order_by(Post.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    total = 0
+    for batch in rows.partitions():
+        _insert_rows(bind, backend, batch)
+        total += len(batch)
+    return total
+
+
+def rebuild_index(batch_size=500):
+    """Reconstruir el índice completo a partir de la tabla posts"""
+    total = fill_index(db.session, get_backend(), batch_size)
+    db.session.commit()
+    return total
+
+
+@search_cli.command('reindex')
+@click.option('--batch-size', default=500, show_default=True, help='Publicaciones por lote.')
+def reindex_command(batch_size):
+    """Reconstruir el índice de búsqueda"""
+    total = rebuild_index(batch_size)
+    click.echo(f'Índice reconstruido ({get_backend()}): {total} publicaciones')
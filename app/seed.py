@@ -0,0 +1,272 @@
+"""
+Datos de prueba a escala
+
+``flask seed --profile small|medium|large`` genera usuarios, publicaciones con
+textos en español de longitudes realistas, etiquetas, metadatos de imágenes y
+comentarios repartidos con una ley de potencias (pocas publicaciones
+concentran la mayoría). Las filas se escriben por lotes con las mismas rutas
+que ``flask import`` (executemany, o ``COPY`` en PostgreSQL), y cada lote
+actualiza los contadores y estadísticas de sus filas en la misma transacción.
+
+Con la misma ``--seed`` y los mismos tamaños el contenido generado es
+idéntico, así los informes de rendimiento se pueden reproducir. Las fechas se
+reparten en los ``--days`` días anteriores al día actual.
+
+Las imágenes son solo metadatos (``image_url`` y ``image_variants``): los
+archivos no existen en disco.
+"""
+import hashlib
+import itertools
+import math
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import select
+
+from .models import db, User, Post, Comment, post_tags
+from .content import render_content, EXCERPT_LENGTH
+from .counters import comments_created, posts_created_by, tags_changed
+from .importer import Importer
+from .images import VARIANTS
+from .passwords import hash_password
+from .search import index_new_posts
+from .stats import rows_added
+from .query_log import tracks_queries
+
+# Nombre -> tamaños generados
+PROFILES = {
+    'small': {'users': 50, 'posts': 500, 'comments': 2_000, 'tags': 30},
+    'medium': {'users': 2_000, 'posts': 50_000, 'comments': 250_000, 'tags': 300},
+    'large': {'users': 20_000, 'posts': 500_000, 'comments': 3_000_000, 'tags': 2_000},
+}
+
+# Contraseña de todos los usuarios generados; el primero es administrador
+SEED_PASSWORD = 'seed-password'
+
+CATEGORIES = ('tecnologia', 'viajes', 'comida', 'educacion', 'otros')
+
+WORDS = (
+    'el la los las un una de del en con por para que como más pero muy también sobre entre cuando donde '
+    'todo cada otro mismo nuevo primer gran mejor bueno último propio tiempo día año vez forma parte caso '
+    'mundo vida trabajo casa ciudad país proyecto equipo sistema servidor aplicación usuario página datos '
+    'base consulta índice rendimiento memoria proceso código función módulo prueba error resultado '
+    'viaje montaña playa río camino tren comida receta cocina sabor mercado pan vino café libro historia '
+    'escuela clase estudiante profesor idea pregunta respuesta problema solución ejemplo hacer tener poder '
+    'decir ver dar saber querer llegar pasar deber poner parecer quedar creer llevar dejar seguir encontrar '
+    'llamar venir pensar salir volver tomar conocer vivir sentir tratar mirar contar empezar esperar buscar'
+).split()
+
+TAG_WORDS = (
+    'python flask django javascript bases-de-datos postgresql sqlite rendimiento seguridad despliegue '
+    'docker linux redes diseño recetas postres vegetariano viajes europa américa montaña playa fotografía '
+    'música cine libros historia ciencia educación idiomas programación tutorial opinión noticias'
+).split()
+
+
+def _sentence(rng):
+    words = [rng.choice(WORDS) for _ in range(max(3, int(rng.gauss(14, 6))))]
+    return ' '.join(words).capitalize() + rng.choice(('.', '.', '.', '?', '!'))
+
+
+def _paragraph(rng):
+    return ' '.join(_sentence(rng) for _ in range(rng.randint(2, 7)))
+
+
+def post_content(rng):
+    """Cuerpo con longitud log-normal: mediana ~400 palabras, cola hasta ~4000"""
+    words = min(4000, max(40, int(rng.lognormvariate(math.log(400), 0.7))))
+    paragraphs = []
+    while words > 0:
+        paragraph = _paragraph(rng)
+        paragraphs.append(paragraph)
+        words -= paragraph.count(' ') + 1
+    return '\n\n'.join(paragraphs)
+
+
+def title(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 10))).capitalize()[:200]
+
+
+def comment_content(rng):
+    return ' '.join(_sentence(rng) for _ in range(max(1, int(rng.expovariate(1 / 1.8)))))
+
+
+def tag_names(count):
+    """Nombres de etiquetas deterministas: palabras sueltas, parejas y luego numeradas"""
+    names = itertools.chain(TAG_WORDS, (f'{a} {b}' for a, b in itertools.permutations(TAG_WORDS, 2)),
+                            (f'tema {n}' for n in itertools.count(1)))
+    return list(itertools.islice(names, count))
+
+
+def zipf_weights(count, exponent, rng):
+    """Pesos acumulados de una ley de potencias sobre un orden aleatorio de ``count`` elementos"""
+    ranks = list(range(1, count + 1))
+    rng.shuffle(ranks)
+    return list(itertools.accumulate(1 / rank ** exponent for rank in ranks))
+
+
+def image_metadata(rng, pool_size=200):
+    """``image_url`` y variantes de una imagen de un conjunto reducido (imágenes repetidas)"""
+    name = hashlib.sha256(f'imagen-{rng.randrange(pool_size)}'.encode()).hexdigest()
+    folder = f'uploads/{name[:2]}/{name[2:4]}'
+    width, height = rng.choice(((1600, 1067), (1200, 1200), (1920, 1080), (800, 600)))
+    variants = {}
+    for variant, max_width in VARIANTS.items():
+        scale = min(1, max_width / width)
+        variants[variant] = {'width': round(width * scale), 'height': round(height * scale),
+                             'src': f'{folder}/{name}_{variant}.jpg', 'webp': f'{folder}/{name}_{variant}.webp'}
+    return f'{folder}/{name}.jpg', variants
+
+
+class Seeder:
+    """Genera y escribe por lotes los datos de un perfil"""
+
+    def __init__(self, sizes, seed=42, days=365, batch_size=5000, image_ratio=0.3, render=True):
+        self.sizes = sizes
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.image_ratio = image_ratio
+        self.render = render
+        self.importer = Importer(render=render)
+        self.end = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.start = self.end - timedelta(days=days)
+        self.user_ids = []
+        self.post_ids = []
+        self.post_dates = []
+        self.tag_ids = []
+
+    def _date(self, fraction):
+        return self.start + (self.end - self.start) * fraction
+
+    def _batches(self, count):
+        for offset in range(0, count, self.batch_size):
+            yield range(offset, min(offset + self.batch_size, count))
+
+    def seed_users(self):
+        password_hash = hash_password(SEED_PASSWORD)
+        count = self.sizes['users']
+        for batch in self._batches(count):
+            ids = self.importer.allocate_ids(User, len(batch))
+            rows = [{
+                'id': user_id, 'username': f'usuario{n}', 'email': f'usuario{n}@seed.test',
+                'password_hash': password_hash,
+                'role': 'admin' if n == 0 else ('editor' if self.rng.random() < 0.02 else 'user'),
+                'is_active': True, 'created_at': self._date(n / count),
+                'posts_count': 0, 'comments_count': 0, 'token_version': 0,
+            } for user_id, n in zip(ids, batch)]
+            self.importer.write(User.__table__, rows)
+            rows_added(User, rows)
+            self.user_ids.extend(ids)
+            db.session.commit()
+
+    def seed_tags(self):
+        # Reutiliza las etiquetas que ya existen con el mismo slug
+        tag_ids = self.importer.resolve_tags(tag_names(self.sizes['tags']))
+        self.tag_ids = sorted(set(tag_ids.values()))
+        db.session.commit()
+
+    def seed_posts(self):
+        count = self.sizes['posts']
+        # Autores y etiquetas con popularidad desigual
+        authors = zipf_weights(len(self.user_ids), 1.0, self.rng)
+        tags = zipf_weights(len(self.tag_ids), 1.1, self.rng) if self.tag_ids else None
+        for batch in self._batches(count):
+            ids = self.importer.allocate_ids(Post, len(batch))
+            rows, links = [], set()
+            for post_id, n in zip(ids, batch):
+                content = post_content(self.rng)
+                created_at = self._date((n + self.rng.random()) / count)
+                image_url, variants = image_metadata(self.rng) if self.rng.random() < self.image_ratio else (None, None)
+                row = {
+                    'id': post_id, 'title': title(self.rng), 'content': content,
+                    'category': self.rng.choice(CATEGORIES), 'image_url': image_url, 'image_variants': variants,
+                    'user_id': self.rng.choices(self.user_ids, cum_weights=authors)[0],
+                    'created_at': created_at, 'updated_at': created_at, 'comments_count': 0,
+                }
+                if self.render:
+                    row.update(render_content(content))
+                else:
+                    row.update(content_html=None, content_version=None, word_count=0, reading_time=1,
+                               excerpt=content[:EXCERPT_LENGTH])
+                rows.append(row)
+                if tags:
+                    links.update((post_id, tag_id) for tag_id in
+                                 self.rng.choices(self.tag_ids, cum_weights=tags, k=self.rng.randint(0, 4)))
+            self.importer.write(Post.__table__, rows)
+            index_new_posts([(row['id'], row['title'], row['content']) for row in rows])
+            self.importer.write(post_tags,
+                                [{'post_id': post_id, 'tag_id': tag_id} for post_id, tag_id in sorted(links)])
+            posts_created_by(row['user_id'] for row in rows)
+            tags_changed(Counter(tag_id for _, tag_id in links))
+            rows_added(Post, rows)
+            self.post_ids.extend(ids)
+            self.post_dates.extend(row['created_at'] for row in rows)
+            db.session.commit()
+
+    def seed_comments(self):
+        count = self.sizes['comments']
+        if not self.post_ids:
+            return
+        # Ley de potencias: unas pocas publicaciones reciben la mayoría de comentarios
+        posts = zipf_weights(len(self.post_ids), 1.1, self.rng)
+        users = zipf_weights(len(self.user_ids), 1.0, self.rng)
+        indexes = range(len(self.post_ids))
+        for batch in self._batches(count):
+            ids = self.importer.allocate_ids(Comment, len(batch))
+            rows = []
+            for comment_id, index in zip(ids, self.rng.choices(indexes, cum_weights=posts, k=len(batch))):
+                posted = self.post_dates[index]
+                created_at = posted + (self.end - posted) * self.rng.random() ** 3
+                rows.append({
+                    'id': comment_id, 'content': comment_content(self.rng), 'post_id': self.post_ids[index],
+                    'user_id': self.rng.choices(self.user_ids, cum_weights=users)[0],
+                    'created_at': created_at, 'updated_at': created_at,
+                })
+            self.importer.write(Comment.__table__, rows)
+            comments_created([(row['post_id'], row['user_id']) for row in rows])
+            rows_added(Comment, rows)
+            db.session.commit()
+
+    def run(self, progress=None):
+        for step in ('users', 'tags', 'posts', 'comments'):
+            started = time.perf_counter()
+            getattr(self, f'seed_{step}')()
+            if progress:
+                progress(step, self.sizes[step], time.perf_counter() - started)
+        self.importer.finish()
+
+
+@click.command('seed')
+@click.option('--profile', type=click.Choice(list(PROFILES)), default='small', show_default=True,
+              help='Tamaño de los datos generados.')
+@click.option('--users', type=int, help='Usuarios (por defecto según el perfil).')
+@click.option('--posts', type=int, help='Publicaciones (por defecto según el perfil).')
+@click.option('--comments', type=int, help='Comentarios (por defecto según el perfil).')
+@click.option('--tags', type=int, help='Etiquetas (por defecto según el perfil).')
+@click.option('--seed', 'seed_value', default=42, show_default=True, help='Semilla del generador.')
+@click.option('--days', default=365, show_default=True, help='Días en los que se reparten las fechas.')
+@click.option('--batch-size', default=5000, show_default=True, help='Filas por transacción.')
+@click.option('--image-ratio', default=0.3, show_default=True, help='Fracción de publicaciones con imagen.')
+@click.option('--no-render', is_flag=True,
+              help='No sanitizar el contenido ahora (ejecutar después `flask content rerender`).')
+@tracks_queries
+def seed_command(profile, users, posts, comments, tags, seed_value, days, batch_size, image_ratio, no_render):
+    """Generar datos de prueba a escala para medir el rendimiento"""
+    sizes = dict(PROFILES[profile])
+    sizes.update({name: value for name, value in
+                  (('users', users), ('posts', posts), ('comments', comments), ('tags', tags)) if value is not None})
+    if sizes['users'] < 1:
+        raise click.BadParameter('se necesita al menos un usuario', param_hint='--users')
+    if db.session.scalar(select(User.id).where(User.email == 'usuario0@seed.test')):
+        raise click.ClickException('La base de datos ya tiene datos generados (usuario0 existe)')
+
+    def progress(step, count, elapsed):
+        click.echo(f'{count} {step} en {elapsed:.1f} s ({count / elapsed if elapsed else 0:,.0f} filas/s)', err=True)
+
+    Seeder(sizes, seed=seed_value, days=days, batch_size=batch_size, image_ratio=image_ratio,
+           render=not no_render).run(progress)
+    click.echo(f'Datos generados: {sizes["users"]} usuarios, {sizes["posts"]} publicaciones, '
+               f'{sizes["comments"]} comentarios, {sizes["tags"]} etiquetas')
@@ -0,0 +1,169 @@
+"""
+Representaciones JSON de los modelos para la API
+
+Un serializador por modelo: cada campo declara las columnas que necesita, así
+las vistas pueden cargar solo esas columnas (``load_only``) cuando el cliente
+pide un subconjunto con ``?fields=``. Los listados usan por defecto una
+representación compacta sin el contenido completo.
+
+Las fechas se devuelven como ``datetime``; el proveedor JSON
+(``app/json_provider.py``) las emite en ISO 8601.
+
+Cada publicación serializada se guarda como fragmento de bytes en la caché de
+fragmentos, con la clave derivada de ``updated_at`` y ``comments_count``: una
+publicación modificada nunca reutiliza un fragmento viejo, y los listados se
+arman concatenando los fragmentos de las publicaciones que no cambiaron.
+"""
+from sqlalchemy.orm import joinedload, load_only, selectinload
+
+from .cache import get_fragment_cache
+from .json_provider import RawJSON, dumps_bytes
+from .models import User, Post, Comment, Tag
+
+
+def _author(obj, detail):
+    author = {'id': obj.author.id, 'username': obj.author.username}
+    if detail:
+        author['email'] = obj.author.email
+    return author
+
+
+def _column(name):
+    return lambda obj, detail: getattr(obj, name)
+
+
+def _fields(model, names):
+    """Campos que se copian tal cual de una columna del modelo"""
+    return {name: ((getattr(model, name),), _column(name)) for name in names}
+
+
+def serialize(registry, obj, fields, detail=False):
+    """Diccionario con los campos pedidos de un objeto"""
+    return {name: registry[name][1](obj, detail) for name in fields}
+
+
+# ==================== PUBLICACIONES ====================
+
+def _tags(post, detail):
+    return [{'name': tag.name, 'slug': tag.slug} for tag in post.tags]
+
+
+# Nombre -> (columnas necesarias, función que recibe (post, detail))
+POST_FIELDS = {
+    **_fields(Post, ('id', 'title', 'content', 'content_html', 'excerpt', 'word_count', 'reading_time',
+                     'category', 'image_url', 'comments_count', 'created_at', 'updated_at')),
+    'author': ((Post.user_id,), _author),
+    'tags': ((), _tags),
+}
+
+# Representación por defecto de los listados: sin contenido completo
+POST_LIST_FIELDS = ('id', 'title', 'excerpt', 'reading_time', 'category', 'image_url',
+                    'comments_count', 'created_at', 'updated_at', 'author')
+
+POST_DETAIL_FIELDS = ('id', 'title', 'content', 'content_html', 'excerpt', 'word_count', 'reading_time',
+                      'category', 'tags', 'image_url', 'created_at', 'updated_at', 'author', 'comments_count')
+
+# Respuesta de crear / actualizar
+POST_WRITE_FIELDS = ('id', 'title', 'content', 'category')
+
+
+def parse_fields(value, default):
+    """Campos pedidos en ``?fields=a,b``, en el orden de la petición.
+
+    Lanza ``ValueError`` con los nombres desconocidos.
+    """
+    if not value:
+        return default
+    fields = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in POST_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f'Campos desconocidos: {", ".join(unknown)}' if unknown else 'fields vacío')
+    return fields
+
+
+def post_load_options(fields, detail=False):
+    """Opciones de carga que leen solo las columnas de ``fields``.
+
+    ``id`` y ``created_at`` se cargan siempre porque los usa la paginación
+    por cursor; ``updated_at``, ``comments_count`` y ``content_version``,
+    porque forman la clave de la caché de fragmentos.
+    """
+    columns = {column.key: column for column in (Post.id, Post.created_at, Post.updated_at, Post.comments_count,
+                                                 Post.content_version)}
+    for name in fields:
+        columns.update((column.key, column) for column in POST_FIELDS[name][0])
+
+    options = [load_only(*columns.values())]
+    if 'author' in fields:
+        author_columns = (User.id, User.username, User.email) if detail else (User.id, User.username)
+        options.append(joinedload(Post.author).load_only(*author_columns))
+    if 'tags' in fields:
+        options.append(selectinload(Post.tags).load_only(Tag.name, Tag.slug))
+    return options
+
+
+def serialize_post(post, fields, detail=False):
+    """Diccionario con los campos pedidos de una publicación"""
+    return serialize(POST_FIELDS, post, fields, detail)
+
+
+def post_fragment(post, fields, detail=False):
+    """JSON (bytes) de una publicación, desde la caché de fragmentos si está vigente.
+
+    ``content_version`` forma parte de la clave: el renderizado en segundo
+    plano y ``flask content rerender`` conservan ``updated_at``.
+    """
+    cache = get_fragment_cache()
+    key = (f'{post.id}|{post.updated_at}|{post.comments_count}|{post.content_version}|'
+           f'{int(detail)}|{",".join(fields)}')
+    fragment = cache.get(key)
+    if fragment is None:
+        fragment = dumps_bytes(serialize_post(post, fields, detail))
+        cache.set(key, fragment, tags=(f'post:{post.id}',))
+    return RawJSON(fragment)
+
+
+def post_list_fragment(posts, fields):
+    """Array JSON de publicaciones armado con los fragmentos de cada una"""
+    return RawJSON(b'[' + b','.join(post_fragment(post, fields) for post in posts) + b']')
+
+
+# ==================== COMENTARIOS ====================
+
+COMMENT_FIELDS = {
+    **_fields(Comment, ('id', 'content', 'post_id', 'created_at', 'updated_at')),
+    'author': ((Comment.user_id,), _author),
+}
+
+COMMENT_LIST_FIELDS = ('id', 'content', 'created_at', 'author')
+
+COMMENT_WRITE_FIELDS = ('id', 'content')
+
+
+def serialize_comment(comment, fields=COMMENT_LIST_FIELDS):
+    return serialize(COMMENT_FIELDS, comment, fields)
+
+
+# ==================== ETIQUETAS ====================
+
+TAG_FIELDS = _fields(Tag, ('id', 'name', 'slug', 'posts_count'))
+
+TAG_LIST_FIELDS = ('name', 'slug', 'posts_count')
+
+
+def serialize_tag(tag, fields=TAG_LIST_FIELDS):
+    return serialize(TAG_FIELDS, tag, fields)
+
+
+# ==================== USUARIOS ====================
+
+USER_FIELDS = _fields(User, ('id', 'username', 'email', 'role', 'created_at', 'posts_count', 'comments_count'))
+
+# Usuario incluido en la respuesta de login / refresco
+USER_TOKEN_FIELDS = ('id', 'username', 'email', 'role')
+
+USER_DETAIL_FIELDS = ('id', 'username', 'email', 'role', 'created_at', 'posts_count', 'comments_count')
+
+
+def serialize_user(user, fields=USER_DETAIL_FIELDS):
+    return serialize(USER_FIELDS, user, fields)
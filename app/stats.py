@@ -0,0 +1,170 @@
+"""
+Estadísticas del panel de administración
+
+Totales, publicaciones por categoría y altas diarias se guardan en la tabla
+``site_stats`` (una fila por métrica y categoría o día). Las escrituras del
+ORM las actualizan con UPSERT atómicos (``value = value + n``) en la misma
+transacción, desde ``before_flush``; las inserciones en bloque con Core
+llaman a ``posts_added`` / ``comments_added``. El panel lee solo esta tabla.
+
+``reconcile_stats`` recalcula todo desde las tablas de origen: con
+``flask stats reconcile`` (cron) o, si la instantánea tiene más de
+``STATS_RECONCILE_INTERVAL`` segundos, en segundo plano al abrir el panel.
+"""
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, event, func, insert, inspect, select, union_all
+from sqlalchemy.orm import Session
+
+from .models import db, User, Post, Comment, SiteStat
+
+stats_cli = AppGroup('stats', help='Estadísticas del panel de administración.')
+
+TOTALS = ('users', 'posts', 'comments')
+DAILY = {User: 'users_daily', Post: 'posts_daily', Comment: 'comments_daily'}
+TOTAL = {User: 'users', Post: 'posts', Comment: 'comments'}
+RECONCILED = 'reconciled_at'
+
+
+def _day(value):
+    return (value or datetime.utcnow()).date().isoformat()
+
+
+def _category(value):
+    return value or Post.__table__.c.category.default.arg
+
+
+def _upsert(connection, deltas):
+    """Sumar ``deltas`` ({(metric, bucket): n}) creando las filas que falten"""
+    rows = [{'metric': metric, 'bucket': bucket, 'value': delta}
+            for (metric, bucket), delta in deltas.items() if delta]
+    if not rows:
+        return
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    table = SiteStat.__table__
+    stmt = upsert(table)
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.metric, table.c.bucket],
+                                      set_={'value': table.c.value + stmt.excluded.value})
+    connection.execute(stmt, rows)
+
+
+def _deltas_for(obj, sign, deltas):
+    model = type(obj)
+    deltas[(TOTAL[model], '')] += sign
+    deltas[(DAILY[model], _day(obj.created_at))] += sign
+    if model is Post:
+        deltas[('category', _category(obj.category))] += sign
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_writes(session, flush_context, instances):
+    deltas = Counter()
+    for obj in session.new:
+        if type(obj) in TOTAL:
+            _deltas_for(obj, 1, deltas)
+    for obj in session.deleted:
+        if type(obj) in TOTAL:
+            _deltas_for(obj, -1, deltas)
+    for obj in session.dirty:
+        if isinstance(obj, Post):
+            history = inspect(obj).attrs.category.history
+            if history.has_changes() and history.deleted:
+                deltas[('category', _category(history.deleted[0]))] -= 1
+                deltas[('category', _category(obj.category))] += 1
+    _upsert(session.connection(), deltas)
+
+
+def posts_added(categories):
+    """Registrar publicaciones insertadas en bloque (lista de categorías)"""
+    today = _day(None)
+    deltas = Counter({('posts', ''): len(categories), ('posts_daily', today): len(categories)})
+    deltas.update(('category', _category(category)) for category in categories)
+    _upsert(db.session.connection(), deltas)
+
+
+def comments_added(count):
+    """Registrar comentarios insertados en bloque"""
+    _upsert(db.session.connection(), {('comments', ''): count, ('comments_daily', _day(None)): count})
+
+
+def rows_added(model, rows):
+    """Registrar filas insertadas en bloque con su propio ``created_at`` (importación).
+
+    ``rows`` son los dicts insertados; las publicaciones incluyen ``category``.
+    """
+    deltas = Counter()
+    for row in rows:
+        deltas[(TOTAL[model], '')] += 1
+        deltas[(DAILY[model], _day(row['created_at']))] += 1
+        if model is Post:
+            deltas[('category', _category(row['category']))] += 1
+    _upsert(db.session.connection(), deltas)
+
+
+def reconcile_stats():
+    """Recalcular la instantánea completa desde las tablas de origen"""
+    since = datetime.utcnow().date() - timedelta(days=current_app.config['STATS_DAILY_RETENTION'] - 1)
+    since = datetime.combine(since, datetime.min.time())
+
+    rows = [{'metric': TOTAL[model], 'bucket': '', 'value': db.session.scalar(select(func.count(model.id)))}
+            for model in TOTAL]
+    rows += [{'metric': 'category', 'bucket': _category(category), 'value': count}
+             for category, count in db.session.execute(
+                 select(Post.category, func.count(Post.id)).group_by(Post.category))]
+    for model, metric in DAILY.items():
+        day = func.date(model.created_at)
+        rows += [{'metric': metric, 'bucket': str(bucket), 'value': count}
+                 for bucket, count in db.session.execute(
+                     select(day, func.count(model.id)).where(model.created_at >= since).group_by(day))]
+    rows.append({'metric': RECONCILED, 'bucket': '', 'value': int(time.time())})
+
+    db.session.execute(delete(SiteStat))
+    db.session.execute(insert(SiteStat), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def dashboard_stats():
+    """Instantánea para el panel, leída con una sola consulta por clave primaria"""
+    days = current_app.config['STATS_DASHBOARD_DAYS']
+    today = datetime.utcnow().date()
+    dates = [(today - timedelta(days=offset)).isoformat() for offset in range(days)]
+
+    columns = (SiteStat.metric, SiteStat.bucket, SiteStat.value)
+    rows = db.session.execute(union_all(
+        select(*columns).where(SiteStat.metric.in_((*TOTALS, 'category', RECONCILED))),
+        select(*columns).where(SiteStat.metric.in_(tuple(DAILY.values())), SiteStat.bucket >= dates[-1]),
+    )).all()
+    values = {(metric, bucket): value for metric, bucket, value in rows}
+
+    reconciled_at = values.get((RECONCILED, ''))
+    interval = current_app.config['STATS_RECONCILE_INTERVAL']
+    if interval and (reconciled_at is None or time.time() - reconciled_at > interval):
+        from .background import submit
+        submit(reconcile_stats)
+
+    categories = sorted(((bucket, value) for (metric, bucket), value in values.items()
+                         if metric == 'category' and value), key=lambda item: (-item[1], item[0]))
+    daily = [(date, *(values.get((DAILY[model], date), 0) for model in (User, Post, Comment)))
+             for date in dates]
+    return {
+        **{f'total_{metric}': values.get((metric, ''), 0) for metric in TOTALS},
+        'category_stats': categories,
+        'daily_stats': daily,
+        'stats_reconciled_at': datetime.utcfromtimestamp(reconciled_at) if reconciled_at else None,
+    }
+
+
+@stats_cli.command('reconcile')
+def reconcile_command():
+    """Recalcular las estadísticas del panel desde las tablas de origen"""
+    rows = reconcile_stats()
+    click.echo(f'Estadísticas recalculadas ({rows} filas)')
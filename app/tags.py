@@ -0,0 +1,125 @@
+"""
+Etiquetas de publicaciones
+
+Las etiquetas se identifican por ``slug`` (``utils.slugify``): al crear o
+editar una publicación se resuelven todas en bloque, creando las que no
+existen con un INSERT que ignora conflictos (dos peticiones pueden crear la
+misma etiqueta a la vez). Los enlaces en ``post_tags`` se escriben con Core y
+``Tag.posts_count`` se mantiene en la misma transacción (``app/counters.py``),
+así la nube de etiquetas no necesita un GROUP BY sobre ``post_tags``.
+"""
+from datetime import datetime
+
+from sqlalchemy import delete, insert, select
+
+from . import counters
+from .models import db, Post, Tag, post_tags
+from .utils import slugify
+
+MAX_TAGS_PER_POST = 10
+TAG_NAME_LENGTH = 50
+
+
+def parse_tag_names(value):
+    """Nombres de etiquetas desde una lista o un texto separado por comas.
+
+    Lanza ``ValueError`` si el valor no es válido.
+    """
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+        raise ValueError('tags debe ser una lista de textos')
+
+    names = {}
+    for name in value:
+        name = ' '.join(name.split())[:TAG_NAME_LENGTH]
+        slug = slugify(name)
+        if slug:
+            names.setdefault(slug, name)
+    if len(names) > MAX_TAGS_PER_POST:
+        raise ValueError(f'Máximo {MAX_TAGS_PER_POST} etiquetas por publicación')
+    return list(names.values())
+
+
+def _insert_ignore(connection):
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(Tag.__table__).on_conflict_do_nothing()
+
+
+def resolve_tags(names):
+    """Ids de etiquetas por slug ({slug: id}), creando en bloque las que faltan"""
+    by_slug = {slugify(name)[:TAG_NAME_LENGTH]: name for name in names}
+    by_slug.pop('', None)
+    if not by_slug:
+        return {}
+
+    stmt = select(Tag.slug, Tag.id).where(Tag.slug.in_(by_slug))
+    ids = dict(db.session.execute(stmt).all())
+
+    missing = [slug for slug in by_slug if slug not in ids]
+    if missing:
+        now = datetime.utcnow()
+        db.session.execute(_insert_ignore(db.session.connection()),
+                           [{'name': by_slug[slug], 'slug': slug, 'created_at': now} for slug in missing])
+        ids.update(db.session.execute(select(Tag.slug, Tag.id).where(Tag.slug.in_(missing))).all())
+    return ids
+
+
+def set_post_tags(post, names):
+    """Reemplazar las etiquetas de una publicación.
+
+    Se ejecuta dentro de la transacción actual; el llamador hace el commit.
+    """
+    new = post.id is None
+    if new:
+        db.session.flush()
+
+    wanted = set(resolve_tags(names).values())
+    current = set() if new else set(db.session.scalars(
+        select(post_tags.c.tag_id).where(post_tags.c.post_id == post.id)
+    ))
+    added, removed = wanted - current, current - wanted
+
+    if added:
+        db.session.execute(insert(post_tags), [{'post_id': post.id, 'tag_id': tag_id} for tag_id in added])
+    if removed:
+        db.session.execute(delete(post_tags).where(post_tags.c.post_id == post.id,
+                                                   post_tags.c.tag_id.in_(removed)))
+    if added or removed:
+        counters.tags_changed({**{tag_id: 1 for tag_id in added}, **{tag_id: -1 for tag_id in removed}})
+        # La publicación cambia: invalida cachés y fragmentos que dependen de updated_at
+        if not new:
+            post.updated_at = datetime.utcnow()
+        db.session.expire(post, ['tags'])
+
+
+def tag_posts_statement(tag):
+    """Publicaciones de una etiqueta (sin ORDER BY, para ``paginate_listing``).
+
+    Con EXISTS el planificador puede recorrer ``posts`` en el orden del
+    índice de fecha y comprobar cada enlace por clave primaria, sin ordenar
+    en memoria las publicaciones de la etiqueta.
+    """
+    return select(Post).where(
+        select(post_tags.c.post_id)
+        .where(post_tags.c.post_id == Post.id, post_tags.c.tag_id == tag.id)
+        .exists()
+    )
+
+
+def tag_cloud(limit=30):
+    """Etiquetas más usadas, ordenadas por nombre para mostrarlas"""
+    tags = db.session.scalars(
+        select(Tag).where(Tag.posts_count > 0)
+        .order_by(Tag.posts_count.desc(), Tag.id.desc()).limit(limit)
+    ).all()
+    return sorted(tags, key=lambda tag: tag.slug)
+
+
+def get_tag_or_404(slug):
+    return db.first_or_404(select(Tag).where(Tag.slug == slug))
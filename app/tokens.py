@@ -0,0 +1,177 @@
+"""
+Tokens JWT de acceso y de refresco
+
+El token de acceso lleva los claims necesarios para autorizar (rol, estado
+activo y versión de token), así que ``token_required`` no necesita cargar el
+usuario de la base de datos. Al cambiar el rol o desactivar un usuario se
+incrementa ``User.token_version`` y todos sus tokens anteriores dejan de ser
+válidos: de inmediato en el proceso que hace el cambio y, en los demás
+workers, como mucho ``JWT_VERSION_CHECK_TTL`` segundos después.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import jwt
+from flask import current_app, has_app_context
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from .models import db, User
+
+ALGORITHM = 'HS256'
+
+
+class TokenError(Exception):
+    """Token inválido, expirado o revocado"""
+
+
+class TokenIdentity:
+    """Usuario autenticado por token, construido solo con los claims"""
+
+    def __init__(self, claims):
+        self.id = claims['user_id']
+        self.role = claims['role']
+        self.is_active = claims['active']
+
+    def is_admin(self):
+        return self.role == 'admin'
+
+    def is_editor(self):
+        return self.role in ['editor', 'admin']
+
+    def load(self):
+        """Cargar el User completo cuando un endpoint lo necesite"""
+        return db.session.get(User, self.id)
+
+
+class TokenCache:
+    """Caché por proceso de tokens verificados y versiones de token"""
+
+    def __init__(self, max_tokens=10000, version_ttl=5):
+        self.max_tokens = max_tokens
+        self.version_ttl = version_ttl
+        self._tokens = OrderedDict()  # token -> claims
+        self._versions = {}  # user_id -> (token_version, checked_at)
+        self._lock = threading.Lock()
+
+    def get_claims(self, token):
+        with self._lock:
+            claims = self._tokens.get(token)
+            if claims is None:
+                return None
+            if claims['exp'] <= time.time():
+                del self._tokens[token]
+                return None
+            self._tokens.move_to_end(token)
+            return claims
+
+    def set_claims(self, token, claims):
+        with self._lock:
+            self._tokens[token] = claims
+            while len(self._tokens) > self.max_tokens:
+                self._tokens.popitem(last=False)
+
+    def get_version(self, user_id):
+        """Versión de token vigente, consultada como mucho cada ``version_ttl`` segundos"""
+        now = time.monotonic()
+        cached = self._versions.get(user_id)
+        if cached and now - cached[1] < self.version_ttl:
+            return cached[0]
+
+        version = db.session.scalar(
+            select(User.token_version).where(User.id == user_id, User.is_active.is_(True))
+        )
+        self._versions[user_id] = (version, now)
+        return version
+
+    def forget_user(self, user_id):
+        self._versions.pop(user_id, None)
+
+
+def get_token_cache():
+    cache = current_app.extensions.get('token_cache')
+    if cache is None:
+        cache = TokenCache(version_ttl=current_app.config['JWT_VERSION_CHECK_TTL'])
+        current_app.extensions['token_cache'] = cache
+    return cache
+
+
+def _encode(user, token_type, expires):
+    now = datetime.utcnow()
+    claims = {
+        'user_id': user.id,
+        'type': token_type,
+        'ver': user.token_version or 0,
+        'iat': now,
+        'exp': now + expires
+    }
+    if token_type == 'access':
+        claims['role'] = user.role
+        claims['active'] = bool(user.is_active)
+    return jwt.encode(claims, current_app.config['JWT_SECRET_KEY'], algorithm=ALGORITHM)
+
+
+def create_access_token(user):
+    return _encode(user, 'access', current_app.config['JWT_ACCESS_TOKEN_EXPIRES'])
+
+
+def create_refresh_token(user):
+    return _encode(user, 'refresh', current_app.config['JWT_REFRESH_TOKEN_EXPIRES'])
+
+
+def decode_token(token, token_type='access'):
+    """Verificar un token y retornar sus claims.
+
+    La firma se verifica una sola vez por token; después se usa la caché.
+    Lanza ``jwt.ExpiredSignatureError`` o ``TokenError``.
+    """
+    cache = get_token_cache()
+    claims = cache.get_claims(token)
+
+    if claims is None:
+        try:
+            claims = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=[ALGORITHM])
+        except jwt.ExpiredSignatureError:
+            raise
+        except jwt.InvalidTokenError as e:
+            raise TokenError('Token inválido') from e
+        cache.set_claims(token, claims)
+
+    if claims.get('type', 'access') != token_type or 'ver' not in claims:
+        raise TokenError('Token inválido')
+    if token_type == 'access' and not claims.get('active'):
+        raise TokenError('Usuario desactivado')
+    if cache.get_version(claims['user_id']) != claims['ver']:
+        raise TokenError('Token revocado')
+
+    return claims
+
+
+def revoke_tokens(user):
+    """Invalidar todos los tokens emitidos para un usuario.
+
+    Se ejecuta dentro de la transacción actual; el llamador hace el commit.
+    La versión cacheada se descarta tras el commit (antes, una petición
+    concurrente volvería a cachear la versión anterior); los demás procesos
+    la renuevan como mucho ``JWT_VERSION_CHECK_TTL`` segundos después.
+    """
+    db.session.execute(
+        update(User).where(User.id == user.id).values(token_version=User.token_version + 1)
+    )
+    db.session.info.setdefault('revoked_users', set()).add(user.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _forget_revoked(session):
+    revoked = session.info.pop('revoked_users', None)
+    if revoked and has_app_context():
+        cache = get_token_cache()
+        for user_id in revoked:
+            cache.forget_user(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_revoked(session):
+    session.info.pop('revoked_users', None)
@@ -0,0 +1,158 @@
+"""
+Almacenamiento de imágenes subidas direccionado por contenido
+
+Cada archivo se guarda como ``uploads/<ab>/<cd>/<sha256>.<ext>``: el hash se
+calcula mientras se escribe el archivo, las subidas idénticas reutilizan el
+mismo archivo y los directorios se reparten en dos niveles para no crecer sin
+límite. Como la URL cambia siempre que cambia el contenido, los archivos se
+sirven con ``Cache-Control: immutable``.
+
+Las referencias son las columnas ``Post.image_url``; un archivo se elimina
+cuando ninguna publicación lo usa.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+import click
+from flask import current_app, request
+from flask.cli import AppGroup
+from sqlalchemy import func, select
+
+from .models import db, Post
+
+uploads_cli = AppGroup('uploads', help='Mantenimiento de archivos subidos.')
+
+CHUNK_SIZE = 64 * 1024
+
+# Extensiones equivalentes que se guardan con un único nombre
+NORMALIZED_EXTENSIONS = {'jpeg': 'jpg'}
+
+# uploads/ab/cd/<sha256>.<ext> y sus variantes <sha256>_<nombre>.<ext>
+CONTENT_ADDRESSED = re.compile(r'^uploads/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(_\w+)?\.\w+$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def upload_path(image_url):
+    """Ruta en disco de una URL relativa 'uploads/...'"""
+    relative = image_url.split('/', 1)[1] if image_url.startswith('uploads/') else image_url
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], *relative.split('/'))
+
+
+def store_upload(file, ext):
+    """Guardar un archivo subido y retornar su URL relativa.
+
+    Si ya existe un archivo con el mismo contenido se reutiliza.
+    """
+    ext = NORMALIZED_EXTENSIONS.get(ext, ext)
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    os.makedirs(upload_folder, exist_ok=True)
+
+    # Escribir a un temporal en el mismo sistema de archivos calculando el hash
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=upload_folder, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            for chunk in iter(lambda: file.stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        name = digest.hexdigest()
+        image_url = f'uploads/{name[:2]}/{name[2:4]}/{name}.{ext}'
+        path = upload_path(image_url)
+
+        if os.path.exists(path):
+            # Duplicado: renovar la fecha para que release_upload no lo borre
+            # mientras la nueva referencia aún no está confirmada
+            os.utime(path)
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return image_url
+
+
+def _remove_files(image_url):
+    """Eliminar el original y sus variantes"""
+    path = upload_path(image_url)
+    stem, _ = os.path.splitext(os.path.basename(path))
+    folder = os.path.dirname(path)
+    for filename in os.listdir(folder) if os.path.isdir(folder) else []:
+        if filename == os.path.basename(path) or filename.startswith(f'{stem}_'):
+            os.remove(os.path.join(folder, filename))
+
+
+def release_upload(image_url):
+    """Eliminar un archivo si ya no lo referencia ninguna publicación.
+
+    Debe llamarse después del commit que quitó la referencia.
+    """
+    if not image_url:
+        return False
+
+    references = db.session.scalar(
+        select(func.count(Post.id)).where(Post.image_url == image_url)
+    )
+    if references:
+        return False
+
+    # Una subida duplicada reciente puede estar a punto de referenciarlo
+    path = upload_path(image_url)
+    grace = current_app.config['UPLOAD_RELEASE_GRACE']
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < grace:
+        return False
+
+    _remove_files(image_url)
+    return True
+
+
+def is_immutable(filename):
+    """Indicar si un archivo estático es direccionado por contenido"""
+    return CONTENT_ADDRESSED.match(filename) is not None
+
+
+def init_uploads(app):
+    """Servir los archivos direccionados por contenido con caché permanente"""
+
+    @app.after_request
+    def immutable_uploads(response):
+        if request.endpoint == 'static' and response.status_code in (200, 304) \
+                and is_immutable(request.view_args.get('filename', '')):
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+@uploads_cli.command('gc')
+@click.option('--dry-run', is_flag=True, help='Solo listar los archivos huérfanos.')
+def gc_command(dry_run):
+    """Eliminar archivos que ninguna publicación referencia"""
+    referenced = set()
+    for image_url, variants in db.session.execute(
+        select(Post.image_url, Post.image_variants).where(Post.image_url.isnot(None))
+    ):
+        referenced.add(upload_path(image_url))
+        for variant in (variants or {}).values():
+            referenced.update(upload_path(variant[key]) for key in ('src', 'webp') if key in variant)
+
+    grace = current_app.config['UPLOAD_RELEASE_GRACE']
+    now = time.time()
+    removed = 0
+    for folder, _, filenames in os.walk(current_app.config['UPLOAD_FOLDER']):
+        for filename in filenames:
+            path = os.path.join(folder, filename)
+            if path in referenced or now - os.path.getmtime(path) < grace:
+                continue
+            click.echo(path)
+            if not dry_run:
+                os.remove(path)
+            removed += 1
+
+    click.echo(f'{removed} archivos huérfanos' + (' (sin eliminar)' if dry_run else ' eliminados'))
@@ -1,6 +1,10 @@
 """
-Utilidades para sanitizar HTML del editor
+Utilidades de texto: sanitizar HTML del editor y generar slugs
 """
+import hashlib
+import re
+import unicodedata
+
 import bleach
 
 # Tags HTML permitidos
@@ -19,8 +23,13 @@ ALLOWED_ATTRIBUTES = {
     '*': ['class']  # Permitir class en todos los tags
 }
 
-# Estilos permitidos
-ALLOWED_STYLES = []
+# Identifica la configuración de sanitización con la que se generó el HTML
+# guardado; al cambiar las listas, ``flask content rerender`` regenera las
+# publicaciones afectadas
+SANITIZER_VERSION = hashlib.sha1(repr((
+    sorted(ALLOWED_TAGS),
+    sorted((tag, sorted(attrs)) for tag, attrs in ALLOWED_ATTRIBUTES.items())
+)).encode()).hexdigest()[:12]
 
 def sanitize_html(content):
     """
@@ -40,7 +49,6 @@ def sanitize_html(content):
         content,
         tags=ALLOWED_TAGS,
         attributes=ALLOWED_ATTRIBUTES,
-        styles=ALLOWED_STYLES,
         strip=True  # Eliminar tags no permitidos en lugar de escaparlos
     )
     
@@ -51,3 +59,17 @@ def sanitize_html(content):
     )
     
     return clean_content
+
+def slugify(value):
+    """
+    Convertir un texto en slug para URLs ("Música Electrónica" -> "musica-electronica")
+    
+    Args:
+        value (str): Texto original
+        
+    Returns:
+        str: Slug en minúsculas, sin acentos y con guiones
+    """
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return re.sub(r'[^a-z0-9]+', '-', value.lower()).strip('-')
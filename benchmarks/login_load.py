@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark: rendimiento de login frente a latencia de páginas bajo carga
+
+Lanza gunicorn con la misma topología que el Procfile (2 workers x 2 hilos)
+sobre una base de datos SQLite temporal, dispara logins concurrentes contra
+/api/auth/login y mide a la vez la latencia de /blog. Se ejecuta una vez con
+el hash en el hilo de la petición (PASSWORD_POOL_WORKERS=0) y otra con el
+pool de procesos.
+
+Ejecutar con: python benchmarks/login_load.py [--duration 10] [--login-clients 8]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(database_url):
+    """Crear el usuario de prueba en una base de datos nueva"""
+    code = (
+        'from app import create_app\n'
+        'from app.models import db, User\n'
+        'app = create_app()\n'
+        'with app.app_context():\n'
+        '    user = User(username="bench", email="bench@test.com")\n'
+        '    user.set_password("bench-password")\n'
+        '    db.session.add(user)\n'
+        '    db.session.commit()\n'
+    )
+    env = dict(os.environ, DATABASE_URL=database_url, PASSWORD_POOL_WORKERS='0')
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True, capture_output=True)
+
+
+def start_server(database_url, port, pool_workers):
+    env = dict(os.environ, DATABASE_URL=database_url, PASSWORD_POOL_WORKERS=str(pool_workers))
+    server = subprocess.Popen(
+        ['gunicorn', 'run:app', '--workers', '2', '--threads', '2', '--bind', f'127.0.0.1:{port}'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=5)
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError('gunicorn no arrancó')
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(port, duration, login_clients):
+    base = f'http://127.0.0.1:{port}'
+    body = json.dumps({'username': 'bench', 'password': 'bench-password'}).encode()
+    deadline = time.monotonic() + duration
+    logins = {'ok': 0, 'busy': 0, 'error': 0}
+    page_latencies = []
+    lock = threading.Lock()
+
+    def login_client():
+        while time.monotonic() < deadline:
+            request = urllib.request.Request(f'{base}/api/auth/login', data=body,
+                                             headers={'Content-Type': 'application/json'})
+            try:
+                urllib.request.urlopen(request, timeout=30)
+                outcome = 'ok'
+            except urllib.error.HTTPError as e:
+                outcome = 'busy' if e.code == 503 else 'error'
+            except OSError:
+                outcome = 'error'
+            with lock:
+                logins[outcome] += 1
+
+    def page_client():
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                urllib.request.urlopen(f'{base}/blog', timeout=30).read()
+            except OSError:
+                continue
+            page_latencies.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=login_client) for _ in range(login_clients)]
+    threads.append(threading.Thread(target=page_client))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'logins_per_second': round(logins['ok'] / duration, 1),
+        'logins_rejected_503': logins['busy'],
+        'login_errors': logins['error'],
+        'page_requests': len(page_latencies),
+        'page_p50_ms': round(statistics.median(page_latencies), 1) if page_latencies else None,
+        'page_p95_ms': round(percentile(page_latencies, 0.95), 1) if page_latencies else None,
+        'page_max_ms': round(max(page_latencies), 1) if page_latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=10, help='segundos por escenario')
+    parser.add_argument('--login-clients', type=int, default=8, help='clientes haciendo login en paralelo')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--pool-workers', type=int, default=1, help='procesos del pool en el segundo escenario')
+    args = parser.parse_args()
+
+    results = {}
+    for name, pool_workers in (('inline', 0), ('pool', args.pool_workers)):
+        with tempfile.TemporaryDirectory() as tmp:
+            database_url = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+            seed(database_url)
+            server = start_server(database_url, args.port, pool_workers)
+            try:
+                results[name] = run(args.port, args.duration, args.login_clients)
+            finally:
+                server.terminate()
+                server.wait()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
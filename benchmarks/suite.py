@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Benchmark: latencia y rendimiento de las páginas y la API bajo carga
+
+Crea una base de datos con un conjunto de datos realista (usuarios,
+publicaciones con etiquetas y comentarios), lanza gunicorn en local y recorre
+cada escenario (una ruta de la web o de la API) con N clientes concurrentes
+durante un tiempo fijo. Por escenario informa p50/p95/p99 de latencia,
+peticiones por segundo, errores y consultas SQL por petición (cabecera
+``X-Query-Count``, activada con ``QUERY_COUNT_HEADER``).
+
+Los resultados se guardan en JSON (``--output``) y se pueden comparar con una
+ejecución anterior (``--baseline``); con ``--max-regression`` el script
+termina con código 1 si algún escenario empeora más de esa fracción.
+
+Los datos se generan con ``flask seed`` (``--profile`` y tamaños opcionales);
+los datos y las rutas pedidas dependen solo de ``--seed``, así dos
+ejecuciones con los mismos argumentos hacen el mismo trabajo.
+
+Ejecutar con: python benchmarks/suite.py [--duration 10] [--concurrency 8] [--output resultados.json]
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ROOT)
+from app.seed import PROFILES, SEED_PASSWORD, comment_content  # noqa: E402
+
+# Primer usuario generado por ``flask seed``
+ADMIN = {'username': 'usuario0', 'email': 'usuario0@seed.test', 'password': SEED_PASSWORD}
+
+SEARCH_TERMS = ('rendimiento', 'base datos', 'proyecto equipo', 'viaje montaña', 'receta', 'índice consulta',
+                'escuela', 'servidor aplicación')
+
+
+def seed(database_url, sizes, rng_seed):
+    """Poblar una base de datos vacía con ``flask seed``"""
+    env = dict(os.environ, DATABASE_URL=database_url, FLASK_APP='run.py', PASSWORD_POOL_WORKERS='0')
+    options = [f'--{name}={value}' for name, value in sizes.items()]
+    subprocess.run(['flask', 'seed', *options, f'--seed={rng_seed}'], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+
+# ==================== SERVIDOR ====================
+
+def start_server(database_url, port, workers, threads):
+    env = dict(os.environ, DATABASE_URL=database_url, QUERY_COUNT_HEADER='true', STATS_RECONCILE_INTERVAL='0')
+    server = subprocess.Popen(
+        ['gunicorn', 'run:app', '--workers', str(workers), '--threads', str(threads),
+         '--bind', f'127.0.0.1:{port}'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(200):
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=5)
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError('gunicorn no arrancó')
+
+
+def api_token(base):
+    body = json.dumps({'username': ADMIN['username'], 'password': ADMIN['password']}).encode()
+    request = urllib.request.Request(f'{base}/api/auth/login', data=body, headers={'Content-Type': 'application/json'})
+    return json.load(urllib.request.urlopen(request, timeout=30))['token']
+
+
+def admin_opener(base):
+    """Cliente con la cookie de sesión del administrador"""
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    data = urllib.parse.urlencode({'email': ADMIN['email'], 'password': ADMIN['password']}).encode()
+    opener.open(f'{base}/auth/login', data=data, timeout=30).read()
+    return opener
+
+
+# ==================== ESCENARIOS ====================
+
+TAG_SCENARIOS = ('home.tag', 'api.get_tag_posts')
+
+
+def scenarios(sizes, tags=None):
+    """Nombre -> función (rng) que devuelve (método, ruta, cuerpo JSON, requiere sesión de admin).
+
+    ``tags`` son los slugs de las etiquetas pedidas en los escenarios de
+    etiquetas; sin etiquetas esos escenarios se omiten. Con None (aún no se
+    conocen) se incluyen todos, solo para validar los nombres pedidos.
+    """
+    posts, users = sizes['posts'], sizes['users']
+    pages = min(20, max(1, posts // 10))
+
+    def get(path):
+        return lambda rng: ('GET', path(rng), None, False)
+
+    available = {
+        'home.blog': get(lambda rng: f'/blog?page={rng.randint(1, pages)}'),
+        'home.search': get(lambda rng: '/search?' + urllib.parse.urlencode({'q': rng.choice(SEARCH_TERMS)})),
+        'home.tag': get(lambda rng: f'/tag/{rng.choice(tags)}'),
+        'post.view': get(lambda rng: f'/post/view/{rng.randint(1, posts)}'),
+        'admin.dashboard': lambda rng: ('GET', '/admin/dashboard', None, True),
+        'api.get_posts': get(lambda rng: f'/api/posts?page={rng.randint(1, pages)}'),
+        'api.get_post': get(lambda rng: f'/api/posts/{rng.randint(1, posts)}'),
+        'api.search': get(lambda rng: '/api/search?' + urllib.parse.urlencode({'q': rng.choice(SEARCH_TERMS)})),
+        'api.get_comments': get(lambda rng: f'/api/posts/{rng.randint(1, posts)}/comments'),
+        'api.get_tags': get(lambda rng: '/api/tags'),
+        'api.get_tag_posts': get(lambda rng: f'/api/tags/{rng.choice(tags)}/posts'),
+        'api.get_user': get(lambda rng: f'/api/users/{rng.randint(1, users)}'),
+        'api.create_comment': lambda rng: ('POST', f'/api/posts/{rng.randint(1, posts)}/comments',
+                                           {'content': comment_content(rng)}, False),
+    }
+    if tags is not None and not tags:
+        for name in TAG_SCENARIOS:
+            del available[name]
+    return available
+
+
+def percentile(values, fraction):
+    """Percentil con interpolación lineal sobre valores ordenados"""
+    if not values:
+        return None
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def run_scenario(base, build, concurrency, duration, warmup, rng_seed, token, admin):
+    samples = []
+    counts = {'errors': 0}
+    lock = threading.Lock()
+    start = time.monotonic()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+
+    def client(index):
+        rng = random.Random(rng_seed * 1000 + index)
+        opener = admin_opener(base) if admin else urllib.request.build_opener()
+        while True:
+            method, path, body, _ = build(rng)
+            headers = {'Accept-Encoding': 'gzip', 'Authorization': f'Bearer {token}'}
+            data = None
+            if body is not None:
+                data = json.dumps(body).encode()
+                headers['Content-Type'] = 'application/json'
+            request = urllib.request.Request(base + path, data=data, headers=headers, method=method)
+            began = time.monotonic()
+            if began >= deadline:
+                return
+            try:
+                with opener.open(request, timeout=30) as response:
+                    response.read()
+                    queries = int(response.headers.get('X-Query-Count', 0))
+                    db_ms = float(response.headers.get('X-DB-Time', 0))
+                ok = True
+            except (urllib.error.HTTPError, OSError):
+                ok = False
+            finished = time.monotonic()
+            if began < measure_from:
+                continue
+            with lock:
+                if ok:
+                    samples.append(((finished - began) * 1000, queries, db_ms))
+                else:
+                    counts['errors'] += 1
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies = sorted(sample[0] for sample in samples)
+    return {
+        'requests': len(samples),
+        'errors': counts['errors'],
+        'rps': round(len(samples) / duration, 1),
+        'p50_ms': round(percentile(latencies, 0.50), 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95), 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99), 2) if latencies else None,
+        'max_ms': round(latencies[-1], 2) if latencies else None,
+        'queries_per_request': round(statistics.mean(s[1] for s in samples), 2) if samples else None,
+        'db_ms_per_request': round(statistics.mean(s[2] for s in samples), 2) if samples else None,
+    }
+
+
+# ==================== COMPARACIÓN ====================
+
+def compare(results, baseline, max_regression):
+    """Imprimir la variación frente a ``baseline`` y devolver los escenarios que empeoran"""
+    regressions = []
+    print(f'\n{"escenario":<22}{"req/s":>10}{"Δ":>8}{"p95 ms":>10}{"Δ":>8}{"consultas":>11}{"Δ":>6}')
+    for name, current in results['scenarios'].items():
+        previous = baseline['scenarios'].get(name)
+        if not previous or not current['requests'] or not previous['requests']:
+            continue
+        rps_change = current['rps'] / previous['rps'] - 1 if previous['rps'] else 0
+        p95_change = current['p95_ms'] / previous['p95_ms'] - 1 if previous['p95_ms'] else 0
+        queries_change = current['queries_per_request'] - previous['queries_per_request']
+        print(f'{name:<22}{current["rps"]:>10}{rps_change:>+8.0%}{current["p95_ms"]:>10}{p95_change:>+8.0%}'
+              f'{current["queries_per_request"]:>11}{queries_change:>+6.1f}')
+        # Las consultas varían algo con los aciertos de caché: solo cuenta más de media por petición
+        if max_regression is not None and (p95_change > max_regression or -rps_change > max_regression
+                                           or queries_change > 0.5):
+            regressions.append(name)
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=10, help='segundos medidos por escenario')
+    parser.add_argument('--warmup', type=float, default=2, help='segundos descartados al inicio de cada escenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='clientes en paralelo')
+    parser.add_argument('--workers', type=int, default=2, help='workers de gunicorn')
+    parser.add_argument('--threads', type=int, default=2, help='hilos por worker de gunicorn')
+    parser.add_argument('--port', type=int, default=5056)
+    parser.add_argument('--scenarios', help='escenarios separados por comas (por defecto todos)')
+    parser.add_argument('--profile', choices=list(PROFILES), default='small', help='perfil de `flask seed`')
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--posts', type=int)
+    parser.add_argument('--comments', type=int)
+    parser.add_argument('--tags', type=int)
+    parser.add_argument('--seed', type=int, default=1, help='semilla de los datos y de las rutas pedidas')
+    parser.add_argument('--database-url', help='base de datos vacía a usar (por defecto SQLite temporal)')
+    parser.add_argument('--output', help='guardar los resultados en este archivo JSON')
+    parser.add_argument('--baseline', help='resultados JSON de una ejecución anterior para comparar')
+    parser.add_argument('--max-regression', type=float,
+                        help='fracción de empeoramiento de p95 o req/s que hace fallar (también +0.5 consultas/petición)')
+    args = parser.parse_args()
+
+    sizes = dict(PROFILES[args.profile])
+    sizes.update({name: getattr(args, name) for name in sizes if getattr(args, name) is not None})
+    available = scenarios(sizes)
+    selected = args.scenarios.split(',') if args.scenarios else list(available)
+    unknown = [name for name in selected if name not in available]
+    if unknown:
+        parser.error(f'escenarios desconocidos: {", ".join(unknown)}')
+
+    results = {
+        'meta': {
+            'date': datetime.utcnow().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'database': 'external' if args.database_url else 'sqlite',
+            'workers': args.workers, 'threads': args.threads, 'concurrency': args.concurrency,
+            'duration': args.duration, 'seed': args.seed, 'profile': args.profile, **sizes,
+        },
+        'scenarios': {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f'sqlite:///{os.path.join(tmp, "bench.db")}'
+        print('Creando datos...', file=sys.stderr)
+        seed(database_url, sizes, args.seed)
+        server = start_server(database_url, args.port, args.workers, args.threads)
+        try:
+            base = f'http://127.0.0.1:{args.port}'
+            token = api_token(base)
+            tags = [tag['slug'] for tag in json.load(urllib.request.urlopen(f'{base}/api/tags', timeout=30))['tags']]
+            available = scenarios(sizes, tags)
+            for name in selected:
+                if name not in available:
+                    print(f'{name}: sin etiquetas, se omite', file=sys.stderr)
+                    continue
+                print(f'{name}...', file=sys.stderr)
+                build = available[name]
+                admin = build(random.Random(0))[3]
+                results['scenarios'][name] = run_scenario(base, build, args.concurrency, args.duration,
+                                                          args.warmup, args.seed, token, admin)
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print(f'\nRegresiones: {", ".join(regressions)}', file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
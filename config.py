@@ -16,16 +16,99 @@ class Config:
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Pool de conexiones (PostgreSQL). WEB_CONCURRENCY / GUNICORN_THREADS son
+    # los que usa el Procfile; el pool de cada proceso tiene una conexión por
+    # hilo de gunicorn más una por hilo en segundo plano (BACKGROUND_WORKERS)
+    WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 2))
+    GUNICORN_THREADS = int(os.environ.get('GUNICORN_THREADS', 2))
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 0))  # 0 = derivado de los hilos
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 2))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5))  # segundos de espera por una conexión
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # segundos
+    DB_POOL_SLOW_WAIT = 0.1  # esperas por conexión (segundos) que se registran en el log
+    DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 5000))  # ms por consulta en peticiones; 0 = sin límite
+    
+    # Cabeceras X-Query-Count / X-DB-Time en cada respuesta (benchmarks; no activar en producción)
+    QUERY_COUNT_HEADER = os.environ.get('QUERY_COUNT_HEADER', 'false').lower() == 'true'
+    
+    # Métricas Prometheus en /metrics (app/instrumentation.py). Cada worker
+    # vuelca las suyas en METRICS_DIR ('' = instance/metrics; None = solo en
+    # memoria, un único proceso); vaciar el directorio al desplegar
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_DIR = os.environ.get('METRICS_DIR', '')
+    METRICS_FLUSH_INTERVAL = 5  # segundos entre volcados de cada worker
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # Bearer para el scraper; sin él solo administradores
+    
+    # Estadísticas por huella de sentencia y registro de consultas lentas
+    # (app/query_log.py, flask queries top). QUERY_STATS_DIR como METRICS_DIR
+    QUERY_STATS_ENABLED = os.environ.get('QUERY_STATS_ENABLED', 'true').lower() == 'true'
+    QUERY_STATS_DIR = os.environ.get('QUERY_STATS_DIR', '')
+    QUERY_STATS_MAX_FINGERPRINTS = 1000  # huellas distintas por proceso; el resto se agrupa
+    SLOW_QUERY_THRESHOLD = float(os.environ.get('SLOW_QUERY_THRESHOLD', 100))  # ms; 0 = no registrar
+    SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', 'background')  # background | sync | off
+    
     # Paginación
     POSTS_PER_PAGE = 6
+    COUNT_CACHE_TTL = int(os.environ.get('COUNT_CACHE_TTL', 30))  # segundos
+    COUNT_CACHE_MAX_ENTRIES = int(os.environ.get('COUNT_CACHE_MAX_ENTRIES', 1000))  # totales por proceso (LRU)
+    COUNT_ESTIMATE_THRESHOLD = 100000  # filas a partir de las que se usa la estimación de PostgreSQL
     
     # Upload de imágenes
     UPLOAD_FOLDER = 'app/static/uploads'
     MAX_CONTENT_LENGTH = 5 * 1024 * 1024  # 5MB
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    IMAGE_PROCESSING = os.environ.get('IMAGE_PROCESSING', 'background')  # background | sync | off
+    BACKGROUND_WORKERS = 1  # hilos por proceso para trabajos en segundo plano (app/background.py)
+    UPLOAD_RELEASE_GRACE = 60  # segundos que se conserva un archivo sin referencias recién reutilizado
+    
+    # Contenido: se sanitiza al guardar; los cuerpos mayores que el umbral
+    # (en caracteres) se procesan en segundo plano. 0 = siempre en la petición
+    CONTENT_RENDER_ASYNC_THRESHOLD = int(os.environ.get('CONTENT_RENDER_ASYNC_THRESHOLD', 64 * 1024))
+    
+    # Compresión de respuestas dinámicas (niveles bajos: prima la latencia)
+    COMPRESS_RESPONSES = os.environ.get('COMPRESS_RESPONSES', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = 500  # bytes
+    COMPRESS_LEVEL_GZIP = 5
+    COMPRESS_LEVEL_BROTLI = 4
+    
+    # API: elementos por petición en /api/posts/batch y /api/comments/batch
+    API_BATCH_MAX_ITEMS = int(os.environ.get('API_BATCH_MAX_ITEMS', 500))
+    # Tope de ?per_page= en los listados; para descargas completas usar /api/export
+    API_MAX_PER_PAGE = int(os.environ.get('API_MAX_PER_PAGE', 100))
+    
+    # JSON: 'orjson' (si está instalado) o 'stdlib'
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'orjson')
+    
+    # Estadísticas del panel (app/stats.py): recálculo completo en segundo plano
+    # si la instantánea es más antigua que el intervalo (0 = solo con el CLI)
+    STATS_RECONCILE_INTERVAL = int(os.environ.get('STATS_RECONCILE_INTERVAL', 3600))  # segundos
+    STATS_DAILY_RETENTION = 90  # días con altas diarias guardadas
+    STATS_DASHBOARD_DAYS = 14  # días mostrados en el panel
+    
+    # Caché de respuestas: 'memory' (LRU por proceso), 'sqlite' (compartida entre workers) o 'null'.
+    # 'memory' solo invalida en el worker que escribe: con varios workers los demás sirven
+    # respuestas obsoletas hasta CACHE_DEFAULT_TTL segundos, así que entonces se usa 'sqlite'
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or ('sqlite' if WEB_CONCURRENCY > 1 else 'memory')
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL', 60))  # segundos
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH')  # por defecto instance/response_cache.sqlite
+    # Fragmentos JSON por publicación (por proceso); 0 = desactivada
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 5000))
+    FRAGMENT_CACHE_TTL = 300  # segundos
+    
+    # Contraseñas: hash en un pool de procesos (0 = en el hilo de la petición).
+    # Cada hilo de gunicorn puede esperar su turno en cola; solo si la espera
+    # supera el tiempo de unos pocos hashes se responde 503
+    PASSWORD_HASH_METHOD = 'scrypt:32768:8:1'
+    PASSWORD_POOL_WORKERS = int(os.environ.get('PASSWORD_POOL_WORKERS', 1))
+    PASSWORD_POOL_QUEUE_LIMIT = int(os.environ.get('PASSWORD_POOL_QUEUE_LIMIT', GUNICORN_THREADS))
+    PASSWORD_POOL_QUEUE_TIMEOUT = float(os.environ.get('PASSWORD_POOL_QUEUE_TIMEOUT', 0.5))  # segundos antes de responder 503
     
     # JWT
-    JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=15)
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    JWT_VERSION_CHECK_TTL = 5  # segundos entre consultas de la versión de token de un usuario
+    # (retraso máximo con el que otros workers ven un token revocado)
     
     # Seguridad adicional para producción
     SESSION_COOKIE_SECURE = os.environ.get('FLASK_ENV') == 'production'
@@ -56,6 +139,15 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    PASSWORD_POOL_WORKERS = 0
+    CACHE_BACKEND = 'memory'
+    IMAGE_PROCESSING = 'sync'
+    UPLOAD_RELEASE_GRACE = 0
+    METRICS_DIR = None
+    QUERY_STATS_DIR = None
+    SLOW_QUERY_EXPLAIN = 'sync'
+    CONTENT_RENDER_ASYNC_THRESHOLD = 0
+    STATS_RECONCILE_INTERVAL = 0
 
 # Diccionario de configuraciones
 config = {
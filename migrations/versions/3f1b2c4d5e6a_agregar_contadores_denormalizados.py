@@ -0,0 +1,45 @@
+"""Agregar contadores denormalizados
+
+Revision ID: 3f1b2c4d5e6a
+Revises: 758ea46f7174
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1b2c4d5e6a'
+down_revision = '758ea46f7174'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('comments_count', sa.Integer(), nullable=False, server_default='0'))
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('posts_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('comments_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Inicializar los contadores con los datos existentes
+    op.execute(
+        'UPDATE posts SET comments_count = '
+        '(SELECT COUNT(*) FROM comments WHERE comments.post_id = posts.id)'
+    )
+    op.execute(
+        'UPDATE users SET '
+        'posts_count = (SELECT COUNT(*) FROM posts WHERE posts.user_id = users.id), '
+        'comments_count = (SELECT COUNT(*) FROM comments WHERE comments.user_id = users.id)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('comments_count')
+        batch_op.drop_column('posts_count')
+
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.drop_column('comments_count')
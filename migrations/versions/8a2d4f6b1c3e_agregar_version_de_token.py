@@ -0,0 +1,26 @@
+"""Agregar versión de token a usuarios
+
+Revision ID: 8a2d4f6b1c3e
+Revises: 3f1b2c4d5e6a
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a2d4f6b1c3e'
+down_revision = '3f1b2c4d5e6a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('token_version')
@@ -0,0 +1,30 @@
+"""Agregar estadísticas del panel de administración
+
+Revision ID: a8c4e2f0d6b3
+Revises: f2a6c8e0b4d7
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8c4e2f0d6b3'
+down_revision = 'f2a6c8e0b4d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Se llena con `flask stats reconcile` (o al abrir el panel, en segundo plano)
+    op.create_table('site_stats',
+        sa.Column('metric', sa.String(length=20), nullable=False),
+        sa.Column('bucket', sa.String(length=50), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('metric', 'bucket')
+    )
+
+
+def downgrade():
+    op.drop_table('site_stats')
@@ -0,0 +1,40 @@
+"""Agregar contador de publicaciones por etiqueta
+
+Revision ID: b3d7f1a5c9e2
+Revises: a8c4e2f0d6b3
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d7f1a5c9e2'
+down_revision = 'a8c4e2f0d6b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tags', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('posts_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.create_index('ix_tags_posts_count_id', ['posts_count', 'id'], unique=False)
+
+    with op.batch_alter_table('post_tags', schema=None) as batch_op:
+        batch_op.create_index('ix_post_tags_tag_id_post_id', ['tag_id', 'post_id'], unique=False)
+
+    # Inicializar el contador con los datos existentes
+    op.execute(
+        'UPDATE tags SET posts_count = '
+        '(SELECT COUNT(*) FROM post_tags WHERE post_tags.tag_id = tags.id)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('post_tags', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_tags_tag_id_post_id')
+
+    with op.batch_alter_table('tags', schema=None) as batch_op:
+        batch_op.drop_index('ix_tags_posts_count_id')
+        batch_op.drop_column('posts_count')
@@ -0,0 +1,26 @@
+"""Agregar variantes de imagen a publicaciones
+
+Revision ID: c7e9a1b3d5f2
+Revises: 8a2d4f6b1c3e
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e9a1b3d5f2'
+down_revision = '8a2d4f6b1c3e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_variants', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.drop_column('image_variants')
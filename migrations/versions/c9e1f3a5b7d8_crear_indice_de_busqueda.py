@@ -0,0 +1,33 @@
+"""Crear el índice de búsqueda y llenarlo con las publicaciones existentes
+
+Revision ID: c9e1f3a5b7d8
+Revises: b3d7f1a5c9e2
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+
+from app.search import create_index, fill_index
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e1f3a5b7d8'
+down_revision = 'b3d7f1a5c9e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Mismas estructuras que crea la aplicación al arrancar (posts_fts en
+    # SQLite, posts_search en PostgreSQL); el llenado reemplaza el índice
+    # vacío que el arranque haya podido crear antes de la migración
+    conn = op.get_bind()
+    fill_index(conn, create_index(conn))
+
+
+def downgrade():
+    conn = op.get_bind()
+    if conn.dialect.name == 'postgresql':
+        op.execute('DROP TABLE IF EXISTS posts_search')
+    elif conn.dialect.name == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS posts_fts')
@@ -0,0 +1,27 @@
+"""Indexar la URL de imagen de publicaciones
+
+Revision ID: d4b8e2f6a1c9
+Revises: c7e9a1b3d5f2
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b8e2f6a1c9'
+down_revision = 'c7e9a1b3d5f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Se consulta al liberar archivos subidos compartidos entre publicaciones
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_posts_image_url'), ['image_url'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_posts_image_url'))
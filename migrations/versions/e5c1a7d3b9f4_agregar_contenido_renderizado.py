@@ -0,0 +1,49 @@
+"""Agregar contenido renderizado a publicaciones
+
+Revision ID: e5c1a7d3b9f4
+Revises: d4b8e2f6a1c9
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.content import provisional_excerpt
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c1a7d3b9f4'
+down_revision = 'd4b8e2f6a1c9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_html', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('excerpt', sa.String(length=300), nullable=True))
+        batch_op.add_column(sa.Column('word_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('reading_time', sa.Integer(), nullable=False, server_default='1'))
+        batch_op.add_column(sa.Column('content_version', sa.String(length=12), nullable=True))
+
+    # Extractos provisionales en texto plano, como los de los cuerpos grandes;
+    # el HTML se genera con `flask content rerender`
+    posts = sa.table('posts', sa.column('id', sa.Integer), sa.column('content', sa.Text),
+                     sa.column('excerpt', sa.String))
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(posts.c.id, posts.c.content).order_by(posts.c.id)
+                        .execution_options(yield_per=500))
+    for batch in rows.partitions():
+        conn.execute(
+            posts.update().where(posts.c.id == sa.bindparam('post_id')),
+            [{'post_id': post_id, 'excerpt': provisional_excerpt(content or '')} for post_id, content in batch]
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.drop_column('content_version')
+        batch_op.drop_column('reading_time')
+        batch_op.drop_column('word_count')
+        batch_op.drop_column('excerpt')
+        batch_op.drop_column('content_html')
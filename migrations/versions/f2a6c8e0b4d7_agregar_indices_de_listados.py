@@ -0,0 +1,47 @@
+"""Agregar índices de listados y comentarios
+
+Revision ID: f2a6c8e0b4d7
+Revises: e5c1a7d3b9f4
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a6c8e0b4d7'
+down_revision = 'e5c1a7d3b9f4'
+branch_labels = None
+depends_on = None
+
+# Tabla -> [(nombre, columnas)]; ver __table_args__ en app/models.py
+INDEXES = {
+    'users': [
+        ('ix_users_created_at_id', ['created_at', 'id']),
+    ],
+    'posts': [
+        ('ix_posts_created_at_id', ['created_at', 'id']),
+        ('ix_posts_user_id_created_at', ['user_id', 'created_at']),
+        ('ix_posts_category', ['category']),
+    ],
+    'comments': [
+        ('ix_comments_post_id_created_at', ['post_id', 'created_at']),
+        ('ix_comments_created_at_id', ['created_at', 'id']),
+        ('ix_comments_user_id', ['user_id']),
+    ],
+}
+
+
+def upgrade():
+    for table, indexes in INDEXES.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for name, columns in indexes:
+                batch_op.create_index(name, columns, unique=False)
+
+
+def downgrade():
+    for table, indexes in INDEXES.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for name, _ in indexes:
+                batch_op.drop_index(name)
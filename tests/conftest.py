@@ -8,13 +8,15 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import pytest
+from contextlib import contextmanager
+from sqlalchemy import event
 from app import create_app
 from app.models import db, User, Post
 
 @pytest.fixture
 def app():
     """Crear aplicación para tests"""
-    app = create_app()
+    app = create_app('testing')
     app.config['TESTING'] = True
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
     app.config['WTF_CSRF_ENABLED'] = False
@@ -53,3 +55,25 @@ def auth_headers(client, app):
     
     token = response.get_json()['token']
     return {'Authorization': f'Bearer {token}'}
+
+@pytest.fixture
+def query_budget(app):
+    """Fallar si el bloque ejecuta más sentencias SQL que las permitidas"""
+    @contextmanager
+    def budget(max_queries):
+        statements = []
+        
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        
+        assert len(statements) <= max_queries, (
+            f'{len(statements)} consultas (presupuesto: {max_queries}):\n' + '\n'.join(statements)
+        )
+    
+    return budget
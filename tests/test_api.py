@@ -2,6 +2,7 @@
 Tests para la API REST
 """
 import json
+import re
 
 def test_login_success(client):
     """Test de login exitoso"""
@@ -89,3 +90,436 @@ def test_create_post_with_auth(client, auth_headers):
     assert response.status_code == 201
     data = response.get_json()
     assert data['post']['title'] == 'New Post'
+
+def test_search_ranking_and_accents(client, auth_headers):
+    """Test de búsqueda por relevancia sin distinguir acentos"""
+    client.post('/api/posts', headers=auth_headers, json={
+        'title': 'Notas varias',
+        'content': 'Un párrafo que menciona la programación de pasada'
+    })
+    client.post('/api/posts', headers=auth_headers, json={
+        'title': 'Programación en Python',
+        'content': 'Introducción a la programación'
+    })
+    
+    response = client.get('/api/search?q=programacion')
+    
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['total'] == 2
+    assert data['posts'][0]['title'] == 'Programación en Python'
+
+def test_search_index_follows_updates(client, auth_headers):
+    """Test de actualización del índice al editar y eliminar"""
+    response = client.post('/api/posts', headers=auth_headers, json={
+        'title': 'Recetas',
+        'content': 'Tortilla de patatas'
+    })
+    post_id = response.get_json()['post']['id']
+    
+    client.put(f'/api/posts/{post_id}', headers=auth_headers, json={'content': 'Gazpacho andaluz'})
+    assert client.get('/api/search?q=tortilla').get_json()['total'] == 0
+    assert client.get('/api/search?q=gazpa').get_json()['total'] == 1
+    
+    client.delete(f'/api/posts/{post_id}', headers=auth_headers)
+    assert client.get('/api/search?q=gazpacho').get_json()['total'] == 0
+
+def test_search_rejects_cursor(client, auth_headers):
+    """Test de búsqueda sin paginación por cursor: el orden es por relevancia"""
+    client.post('/api/posts', headers=auth_headers, json={'title': 'Python', 'content': 'Contenido'})
+    cursor = client.get('/api/posts?per_page=1&after=').get_json()['next_cursor'] or 'x'
+
+    response = client.get(f'/api/search?q=python&after={cursor}')
+    assert response.status_code == 400
+    assert 'cursor' in response.get_json()['error']
+    assert client.get('/search?q=python&before=').status_code == 400
+    assert client.get('/search?q=python&page=1').status_code == 200
+
+def test_get_posts_cursor_pagination(client, auth_headers):
+    """Test de paginación por cursor en ambas direcciones"""
+    for i in range(5):
+        client.post('/api/posts', headers=auth_headers, json={
+            'title': f'Post {i}',
+            'content': 'Content'
+        })
+    
+    first = client.get('/api/posts?per_page=2&after=').get_json()
+    assert [p['title'] for p in first['posts']] == ['Post 4', 'Post 3']
+    assert first['prev_cursor'] is None
+    
+    second = client.get(f"/api/posts?per_page=2&after={first['next_cursor']}").get_json()
+    assert [p['title'] for p in second['posts']] == ['Post 2', 'Post 1']
+    
+    last = client.get(f"/api/posts?per_page=2&after={second['next_cursor']}").get_json()
+    assert [p['title'] for p in last['posts']] == ['Post 0']
+    assert last['next_cursor'] is None
+    
+    back = client.get(f"/api/posts?per_page=2&before={last['prev_cursor']}").get_json()
+    assert [p['title'] for p in back['posts']] == ['Post 2', 'Post 1']
+
+def test_get_posts_invalid_cursor(client):
+    """Test de cursor inválido"""
+    response = client.get('/api/posts?after=no-es-un-cursor')
+    
+    assert response.status_code == 400
+
+def test_counters_follow_writes(client, auth_headers):
+    """Test de contadores denormalizados al crear y eliminar"""
+    response = client.post('/api/posts', headers=auth_headers, json={
+        'title': 'Con comentarios',
+        'content': 'Content'
+    })
+    post_id = response.get_json()['post']['id']
+    updated_at = client.get(f'/api/posts/{post_id}').get_json()['updated_at']
+    for i in range(2):
+        client.post(f'/api/posts/{post_id}/comments', headers=auth_headers, json={'content': f'Comentario {i}'})
+    client.post('/api/comments/batch', headers=auth_headers,
+                json={'comments': [{'post_id': post_id, 'content': 'Comentario 2'}]})
+    
+    # Comentar no modifica la publicación
+    post = client.get(f'/api/posts/{post_id}').get_json()
+    assert post['comments_count'] == 3
+    assert post['updated_at'] == updated_at
+    user = client.get('/api/users/1').get_json()
+    assert user['posts_count'] == 1
+    assert user['comments_count'] == 3
+    
+    client.delete(f'/api/posts/{post_id}', headers=auth_headers)
+    user = client.get('/api/users/1').get_json()
+    assert user['posts_count'] == 0
+    assert user['comments_count'] == 0
+
+def test_counters_repair_command(app, runner):
+    """Test del comando que recalcula los contadores"""
+    from app.models import User, Post, Comment, db
+    
+    user = User(username='author', email='author@test.com')
+    user.set_password('pass')
+    db.session.add(user)
+    db.session.commit()
+    post = Post(title='Post', content='Content', user_id=user.id)
+    db.session.add(post)
+    db.session.commit()
+    db.session.add(Comment(content='Hola', user_id=user.id, post_id=post.id))
+    db.session.commit()
+    updated_at = post.updated_at
+    
+    result = runner.invoke(args=['counters', 'repair'])
+    
+    assert '1 publicaciones, 1 usuarios' in result.output
+    db.session.expire_all()
+    assert post.comments_count == 1
+    assert post.updated_at == updated_at
+    assert user.posts_count == 1
+    assert user.comments_count == 1
+
+def test_content_rendered_on_write(client, auth_headers):
+    """Test del HTML sanitizado generado al crear y actualizar"""
+    response = client.post('/api/posts', headers=auth_headers, json={
+        'title': 'HTML',
+        'content': '<p onclick="x()">Texto <b>seguro</b></p><script>alert(1)</script>'
+    })
+    post_id = response.get_json()['post']['id']
+    
+    data = client.get(f'/api/posts/{post_id}').get_json()
+    assert data['content_html'] == '<p>Texto seguro</p>alert(1)'
+    assert data['excerpt'] == 'Texto seguro alert(1)'
+    assert data['word_count'] == 3
+    
+    client.put(f'/api/posts/{post_id}', headers=auth_headers, json={'content': '<p>Otro</p>'})
+    data = client.get(f'/api/posts/{post_id}').get_json()
+    assert data['content_html'] == '<p>Otro</p>'
+
+def test_large_content_rendered_in_background(app, client, auth_headers, monkeypatch):
+    """Test de cuerpos grandes sanitizados fuera de la petición"""
+    from app import content
+    from app.models import db, Post
+    
+    jobs = []
+    monkeypatch.setattr(content, 'submit', lambda fn, *args: jobs.append((fn, args)))
+    app.config['CONTENT_RENDER_ASYNC_THRESHOLD'] = 100
+    
+    response = client.post('/api/posts', headers=auth_headers, json={
+        'title': 'Largo', 'content': '<p>' + 'palabra ' * 50 + '</p>'
+    })
+    post_id = response.get_json()['post']['id']
+    assert db.session.get(Post, post_id).content_html is None
+    assert jobs == [(content.render_stored, (post_id,))]
+    
+    assert content.render_stored(post_id)
+    data = client.get(f'/api/posts/{post_id}').get_json()
+    assert data['word_count'] == 50
+
+def test_content_rerender_command(app, runner):
+    """Test del comando que regenera el HTML desactualizado"""
+    from app.models import User, Post, db
+    
+    user = User(username='author', email='author@test.com')
+    user.set_password('pass')
+    db.session.add(user)
+    db.session.commit()
+    db.session.add(Post(title='Antiguo', content='<p>Hola</p>', user_id=user.id))
+    db.session.commit()
+    
+    result = runner.invoke(args=['content', 'rerender'])
+    assert '1 publicaciones renderizadas' in result.output
+    assert Post.query.first().content_html == '<p>Hola</p>'
+    
+    result = runner.invoke(args=['content', 'rerender'])
+    assert '0 publicaciones renderizadas' in result.output
+
+def test_conditional_get_post(client, auth_headers):
+    """Test de 304 con If-None-Match e If-Modified-Since"""
+    response = client.post('/api/posts', headers=auth_headers, json={'title': 'ETag', 'content': 'Content'})
+    post_id = response.get_json()['post']['id']
+    
+    first = client.get(f'/api/posts/{post_id}')
+    etag = first.headers['ETag']
+    assert first.headers['Last-Modified']
+    
+    assert client.get(f'/api/posts/{post_id}', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get(f'/api/posts/{post_id}',
+                      headers={'If-Modified-Since': first.headers['Last-Modified']}).status_code == 304
+    
+    client.post(f'/api/posts/{post_id}/comments', headers=auth_headers, json={'content': 'Nuevo'})
+    assert client.get(f'/api/posts/{post_id}', headers={'If-None-Match': etag}).status_code == 200
+
+def test_conditional_get_post_list(client, auth_headers):
+    """Test de validador de listado derivado de la página"""
+    client.post('/api/posts', headers=auth_headers, json={'title': 'Uno', 'content': 'Content'})
+    etag = client.get('/api/posts').headers['ETag']
+    
+    assert client.get('/api/posts', headers={'If-None-Match': etag}).status_code == 304
+    
+    client.post('/api/posts', headers=auth_headers, json={'title': 'Dos', 'content': 'Content'})
+    assert client.get('/api/posts', headers={'If-None-Match': etag}).status_code == 200
+
+def test_token_auth_without_user_query(client, auth_headers, query_budget):
+    """Test de autorización por claims sin cargar el usuario"""
+    client.post('/api/posts', headers=auth_headers, json={'title': 'Primero', 'content': 'C'})
+    
+    # Incluye el UPSERT de las estadísticas del panel (app/stats.py)
+    with query_budget(6) as statements:
+        response = client.post('/api/posts', headers=auth_headers, json={'title': 'Segundo', 'content': 'C'})
+    
+    assert response.status_code == 201
+    assert not any('FROM users' in statement for statement in statements)
+
+def test_refresh_token(client, auth_headers):
+    """Test de renovación del token de acceso"""
+    response = client.post('/api/auth/login', json={'username': 'testuser', 'password': 'password123'})
+    refresh_token = response.get_json()['refresh_token']
+    
+    response = client.post('/api/auth/refresh', json={'refresh_token': refresh_token})
+    assert response.status_code == 200
+    token = response.get_json()['token']
+    
+    response = client.post('/api/posts', headers={'Authorization': f'Bearer {token}'},
+                           json={'title': 'Renovado', 'content': 'C'})
+    assert response.status_code == 201
+    
+    # Un token de refresco no sirve como token de acceso
+    response = client.post('/api/posts', headers={'Authorization': f'Bearer {refresh_token}'},
+                           json={'title': 'No', 'content': 'C'})
+    assert response.status_code == 401
+
+def test_revoke_tokens_on_role_change(app, client, auth_headers):
+    """Test de revocación inmediata al cambiar el rol"""
+    from app.models import User, db
+    from app.tokens import revoke_tokens
+    
+    user = User.query.filter_by(username='testuser').first()
+    user.role = 'editor'
+    revoke_tokens(user)
+    db.session.commit()
+    
+    response = client.post('/api/posts', headers=auth_headers, json={'title': 'X', 'content': 'C'})
+    assert response.status_code == 401
+    assert response.get_json()['error'] == 'Token revocado'
+
+def test_revoke_tokens_after_commit(app, client, auth_headers):
+    """Test de versión cacheada descartada tras el commit y no antes"""
+    import time
+    from app.models import User, db
+    from app.tokens import get_token_cache, revoke_tokens
+    
+    user = User.query.filter_by(username='testuser').first()
+    old_version = user.token_version or 0
+    revoke_tokens(user)
+    # Una petición concurrente lee la versión anterior antes del commit
+    get_token_cache()._versions[user.id] = (old_version, time.monotonic())
+    db.session.commit()
+    
+    response = client.post('/api/posts', headers=auth_headers, json={'title': 'X', 'content': 'C'})
+    assert response.status_code == 401
+
+def test_create_posts_batch(client, auth_headers, query_budget):
+    """Test de creación de publicaciones en lote con errores por elemento"""
+    items = [{'title': f'Lote {i}', 'content': f'<p>Contenido {i}</p>'} for i in range(50)]
+    items.insert(3, {'title': 'Sin contenido'})
+    
+    # SQLite no garantiza el orden de RETURNING en un INSERT multi-fila, así
+    # que SQLAlchemy inserta fila a fila; índice y contadores van en bloque
+    with query_budget(len(items) + 3) as statements:
+        response = client.post('/api/posts/batch', headers=auth_headers, json={'posts': items})
+    assert sum('posts_fts' in statement for statement in statements) == 1
+    
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data['created'] == 50
+    assert data['failed'] == 1
+    assert data['results'][3] == {'index': 3, 'error': 'content requerido'}
+    
+    post = client.get(f"/api/posts/{data['results'][4]['id']}").get_json()
+    assert post['title'] == 'Lote 3'
+    assert post['content_html'] == '<p>Contenido 3</p>'
+    
+    assert client.get('/api/users/1').get_json()['posts_count'] == 50
+    assert client.get('/api/search?q=lote').get_json()['total'] == 50
+
+def test_create_posts_batch_validation(client, auth_headers):
+    """Test de lotes vacíos, demasiado grandes o sin elementos válidos"""
+    assert client.post('/api/posts/batch', headers=auth_headers, json={'posts': []}).status_code == 400
+    
+    response = client.post('/api/posts/batch', headers=auth_headers, json={'posts': [{'title': 1}]})
+    assert response.status_code == 400
+    assert response.get_json()['results'][0]['error'] == 'title debe ser texto'
+    
+    client.application.config['API_BATCH_MAX_ITEMS'] = 2
+    response = client.post('/api/posts/batch', headers=auth_headers, json={'posts': [{}, {}, {}]})
+    assert response.status_code == 413
+
+def test_create_comments_batch(client, auth_headers):
+    """Test de creación de comentarios en lote en varias publicaciones"""
+    first = client.post('/api/posts', headers=auth_headers, json={'title': 'A', 'content': 'A'}).get_json()
+    second = client.post('/api/posts', headers=auth_headers, json={'title': 'B', 'content': 'B'}).get_json()
+    first_id, second_id = first['post']['id'], second['post']['id']
+    client.get(f'/api/posts/{first_id}')  # cachear la respuesta
+    
+    response = client.post('/api/comments/batch', headers=auth_headers, json={'comments': [
+        {'post_id': first_id, 'content': 'Uno'},
+        {'post_id': first_id, 'content': 'Dos'},
+        {'post_id': second_id, 'content': 'Tres'},
+        {'post_id': 999, 'content': 'Cuatro'},
+        {'post_id': [first_id], 'content': 'Cinco'},
+    ]})
+    
+    data = response.get_json()
+    assert response.status_code == 201
+    assert data['created'] == 3
+    assert [r.get('error') for r in data['results'][3:]] == ['Publicación no encontrada'] * 2
+    
+    assert client.get(f'/api/posts/{first_id}').get_json()['comments_count'] == 2
+    assert len(client.get(f'/api/posts/{second_id}/comments').get_json()['comments']) == 1
+    assert client.get('/api/users/1').get_json()['comments_count'] == 3
+
+def admin_headers(client):
+    """Headers con token de un administrador"""
+    from app.models import User, db
+    
+    admin = User(username='admin', email='admin@test.com', role='admin')
+    admin.set_password('admin123')
+    db.session.add(admin)
+    db.session.commit()
+    token = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'}).get_json()['token']
+    return {'Authorization': f'Bearer {token}'}
+
+def test_export_posts_ndjson(client, auth_headers):
+    """Test de exportación en streaming, incremental y comprimida"""
+    import gzip
+    from datetime import datetime, timedelta
+    from app.models import Post, db
+    
+    client.post('/api/posts/batch', headers=auth_headers, json={
+        'posts': [{'title': f'Post {i}', 'content': 'Contenido'} for i in range(5)]
+    })
+    Post.query.filter_by(title='Post 0').update({'updated_at': datetime(2020, 1, 1)})
+    db.session.commit()
+    
+    assert client.get('/api/export/posts', headers=auth_headers).status_code == 403
+    headers = admin_headers(client)
+    
+    response = client.get('/api/export/posts', headers=headers)
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data().splitlines()]
+    assert [row['title'] for row in rows] == [f'Post {i}' for i in range(5)]
+    assert 'content_html' not in rows[0]
+    
+    since = (datetime.utcnow() - timedelta(days=1)).isoformat()
+    response = client.get(f'/api/export/posts?since={since}', headers={**headers, 'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(gzip.decompress(response.get_data()).splitlines()) == 4
+    response = client.get('/api/export/posts', headers={**headers, 'Accept-Encoding': 'gzip;q=0, identity'})
+    assert 'Content-Encoding' not in response.headers
+    assert len(response.get_data().splitlines()) == 5
+    
+    users = client.get('/api/export/users', headers=headers).get_data(as_text=True)
+    assert 'password_hash' not in users
+    assert client.get('/api/export/posts?since=ayer', headers=headers).status_code == 400
+
+def test_export_command(app, runner, auth_headers, client, tmp_path):
+    """Test del comando de exportación a archivo gzip"""
+    import gzip
+    
+    client.post('/api/posts/batch', headers=auth_headers, json={
+        'posts': [{'title': f'Post {i}', 'content': 'Contenido'} for i in range(3)]
+    })
+    output = tmp_path / 'posts.ndjson.gz'
+    
+    result = runner.invoke(args=['export', 'posts', '-o', str(output)])
+    
+    assert '3 filas exportadas' in result.output
+    assert len(gzip.decompress(output.read_bytes()).splitlines()) == 3
+
+def test_get_posts_per_page_cap(client, auth_headers):
+    """Test del tope de per_page en el listado"""
+    client.post('/api/posts/batch', headers=auth_headers, json={
+        'posts': [{'title': f'Post {i}', 'content': 'Contenido'} for i in range(8)]
+    })
+    client.application.config['API_MAX_PER_PAGE'] = 5
+    
+    data = client.get('/api/posts?per_page=100000').get_json()
+    assert len(data['posts']) == 5
+    assert data['pages'] == 2
+    assert len(client.get('/api/posts?per_page=0').get_json()['posts']) == 1
+
+def test_get_posts_sparse_fields(client, auth_headers, query_budget):
+    """Test de ?fields= y de la representación compacta de los listados"""
+    from app.models import db
+    
+    client.post('/api/posts', headers=auth_headers, json={'title': 'Campos', 'content': '<p>Cuerpo largo</p>'})
+    
+    post = client.get('/api/posts').get_json()['posts'][0]
+    assert 'content' not in post
+    assert post['excerpt'] == 'Cuerpo largo'
+    assert post['author']['username'] == 'testuser'
+    
+    db.session.expunge_all()
+    with query_budget(3) as statements:
+        response = client.get('/api/posts?fields=id,title')
+    assert response.get_json()['posts'] == [{'id': 1, 'title': 'Campos'}]
+    select_posts = next(s for s in statements if 'FROM posts' in s and 'count(' not in s.lower())
+    assert not re.search(r'posts\.content\b', select_posts)
+    assert 'users' not in select_posts
+    
+    assert client.get('/api/posts?fields=id,password').status_code == 400
+    assert client.get('/api/posts/1?fields=title,content').get_json() == {
+        'title': 'Campos', 'content': '<p>Cuerpo largo</p>'
+    }
+    assert client.get('/api/search?q=campos&fields=title').get_json()['posts'] == [{'title': 'Campos'}]
+
+def test_json_provider_dates_iso(app, client, auth_headers):
+    """Test de fechas ISO 8601 con el proveedor JSON configurado y el estándar"""
+    from datetime import datetime
+    from app.json_provider import OrjsonProvider, StdlibJSONProvider, orjson
+    
+    assert isinstance(app.json, OrjsonProvider if orjson else StdlibJSONProvider)
+    client.post('/api/posts', headers=auth_headers, json={'title': 'Fecha', 'content': 'C'})
+    post = client.get('/api/posts/1').get_json()
+    assert datetime.fromisoformat(post['created_at'])
+    assert datetime.fromisoformat(client.get('/api/users/1').get_json()['created_at'])
+    
+    app.json = StdlibJSONProvider(app)
+    app.extensions['fragment_cache'].clear()
+    app.extensions['response_cache'].clear()
+    assert client.get('/api/posts/1').get_json()['created_at'] == post['created_at']
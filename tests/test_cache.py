@@ -0,0 +1,126 @@
+"""
+Tests de la caché de respuestas
+"""
+from app.cache import MemoryCache, SQLiteCache
+
+def test_api_post_cached_and_invalidated(client, auth_headers):
+    """Test de respuesta cacheada e invalidada al actualizar"""
+    response = client.post('/api/posts', headers=auth_headers, json={
+        'title': 'Original',
+        'content': 'Content'
+    })
+    post_id = response.get_json()['post']['id']
+    
+    assert client.get(f'/api/posts/{post_id}').headers['X-Cache'] == 'MISS'
+    assert client.get(f'/api/posts/{post_id}').headers['X-Cache'] == 'HIT'
+    
+    client.put(f'/api/posts/{post_id}', headers=auth_headers, json={'title': 'Editado'})
+    
+    response = client.get(f'/api/posts/{post_id}')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.get_json()['title'] == 'Editado'
+
+def test_comment_invalidates_only_its_post(client, auth_headers):
+    """Test de invalidación precisa al comentar"""
+    ids = []
+    for title in ('Uno', 'Dos'):
+        response = client.post('/api/posts', headers=auth_headers, json={'title': title, 'content': 'C'})
+        ids.append(response.get_json()['post']['id'])
+        client.get(f'/api/posts/{ids[-1]}')
+    
+    client.post(f'/api/posts/{ids[0]}/comments', headers=auth_headers, json={'content': 'Hola'})
+    
+    first = client.get(f'/api/posts/{ids[0]}')
+    assert first.headers['X-Cache'] == 'MISS'
+    assert first.get_json()['comments_count'] == 1
+    assert client.get(f'/api/posts/{ids[1]}').headers['X-Cache'] == 'HIT'
+
+def test_comment_refreshes_post_listing(client, auth_headers):
+    """Test de listados con comments_count al día tras comentar"""
+    response = client.post('/api/posts', headers=auth_headers, json={'title': 'Uno', 'content': 'C'})
+    post_id = response.get_json()['post']['id']
+    client.get('/api/posts')
+    cached = client.get('/api/posts')
+    assert cached.headers['X-Cache'] == 'HIT'
+    
+    client.post(f'/api/posts/{post_id}/comments', headers=auth_headers, json={'content': 'Hola'})
+    response = client.get('/api/posts', headers={'If-None-Match': cached.headers['ETag']})
+    assert response.status_code == 200
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.get_json()['posts'][0]['comments_count'] == 1
+    
+    client.post('/api/comments/batch', headers=auth_headers,
+                json={'comments': [{'post_id': post_id, 'content': 'Otro'}]})
+    assert client.get('/api/posts').get_json()['posts'][0]['comments_count'] == 2
+
+def test_count_cache_bounded(app, client):
+    """Test de totales de búsqueda cacheados sin crecer sin límite"""
+    counts = app.extensions['count_cache']
+    counts.max_entries = 3
+    for i in range(10):
+        assert client.get(f'/api/search?q=consulta{i}').status_code == 200
+    
+    assert counts.info()['entries'] == 3
+    assert counts.info()['evictions'] >= 7
+
+def test_memory_cache_lru_eviction():
+    """Test de expulsión LRU y contadores"""
+    cache = MemoryCache(max_entries=2)
+    cache.set('a', 1, tags=['posts'])
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    
+    cache.invalidate(['posts'])
+    assert cache.get('a') is None
+    assert cache.info()['evictions'] == 1
+    assert cache.info()['invalidations'] == 1
+
+def test_sqlite_cache_shared_between_instances(tmp_path):
+    """Test de caché SQLite compartida entre procesos"""
+    path = str(tmp_path / 'cache.sqlite')
+    worker1 = SQLiteCache(path)
+    worker2 = SQLiteCache(path)
+    
+    worker1.set('/blog', (200, [], b'html'), tags=['posts'])
+    assert worker2.get('/blog') == (200, [], b'html')
+    
+    worker2.invalidate(['posts'])
+    assert worker1.get('/blog') is None
+
+def test_post_fragment_follows_content_version(app, client, auth_headers):
+    """Test de fragmento regenerado al cambiar content_version sin cambiar updated_at"""
+    from app.models import db, Post
+    from app.serializers import post_fragment
+    
+    post_id = client.post('/api/posts', headers=auth_headers, json={'title': 'T', 'content': 'Viejo'}) \
+        .get_json()['post']['id']
+    post = db.session.get(Post, post_id)
+    assert b'Viejo' in bytes(post_fragment(post, ('id', 'content_html')))
+    
+    # Como el renderizado en segundo plano: mismo updated_at, otra versión
+    post.content_html = '<p>Nuevo</p>'
+    post.content_version = 'otra'
+    assert b'Nuevo' in bytes(post_fragment(post, ('id', 'content_html')))
+
+def test_post_fragments_reused_and_invalidated(app, client, auth_headers):
+    """Test de fragmentos JSON por publicación reutilizados entre listados"""
+    from app.cache import get_cache, get_fragment_cache
+    
+    ids = [client.post('/api/posts', headers=auth_headers, json={'title': title, 'content': 'C'})
+           .get_json()['post']['id'] for title in ('Uno', 'Dos')]
+    fragments = get_fragment_cache()
+    
+    client.get('/api/posts')
+    misses = fragments.stats.misses
+    get_cache().clear()
+    assert [post['title'] for post in client.get('/api/posts').get_json()['posts']] == ['Dos', 'Uno']
+    assert fragments.stats.misses == misses
+    
+    client.put(f'/api/posts/{ids[0]}', headers=auth_headers, json={'title': 'Editado'})
+    titles = [post['title'] for post in client.get('/api/posts').get_json()['posts']]
+    assert titles == ['Dos', 'Editado']
+    assert fragments.stats.misses == misses + 1
@@ -0,0 +1,74 @@
+"""
+Tests de compresión de respuestas y archivos estáticos precomprimidos
+"""
+import gzip
+import pytest
+
+brotli = pytest.importorskip('brotli')
+
+@pytest.fixture
+def post_id(client, auth_headers):
+    response = client.post('/api/posts', headers=auth_headers, json={
+        'title': 'Comprimir', 'content': '<p>' + 'texto repetido ' * 100 + '</p>'
+    })
+    return response.get_json()['post']['id']
+
+def test_html_gzip(client, post_id):
+    """Test de compresión gzip de páginas HTML"""
+    response = client.get('/blog', headers={'Accept-Encoding': 'gzip'})
+    
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert b'Comprimir' in gzip.decompress(response.get_data())
+
+def test_brotli_preferred(client, post_id):
+    """Test de negociación: brotli si el cliente lo acepta"""
+    response = client.get(f'/api/posts/{post_id}', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert b'texto repetido' in brotli.decompress(response.get_data())
+    
+    response = client.get(f'/api/posts/{post_id}', headers={'Accept-Encoding': 'gzip, br;q=0'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+
+def test_small_and_uncompressed_responses(client, post_id):
+    """Test de respuestas pequeñas o sin Accept-Encoding"""
+    response = client.get('/api/users/1', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    
+    response = client.get(f'/api/posts/{post_id}')
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json()['title'] == 'Comprimir'
+
+def test_compressed_etag_is_weak(client, post_id):
+    """Test de ETag débil en respuestas comprimidas y 304 posterior"""
+    headers = {'Accept-Encoding': 'gzip'}
+    response = client.get(f'/api/posts/{post_id}', headers=headers)
+    assert response.headers['ETag'].startswith('W/')
+    
+    response = client.get(f'/api/posts/{post_id}',
+                          headers={**headers, 'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+
+def test_precompressed_static(app, client, runner, tmp_path):
+    """Test de variantes .br/.gz generadas por flask assets compress"""
+    app.static_folder = str(tmp_path)
+    css = 'body { color: black; }\n' * 50
+    (tmp_path / 'style.css').write_text(css)
+    
+    result = runner.invoke(args=['assets', 'compress'])
+    assert '1 archivos comprimidos' in result.output
+    
+    response = client.get('/static/style.css', headers={'Accept-Encoding': 'br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert response.mimetype == 'text/css'
+    assert brotli.decompress(response.get_data()).decode() == css
+    response.close()
+    
+    response = client.get('/static/style.css', headers={'Accept-Encoding': 'gzip'})
+    assert gzip.decompress(response.get_data()).decode() == css
+    response.close()
+    
+    response = client.get('/static/style.css')
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    response.close()
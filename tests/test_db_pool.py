@@ -0,0 +1,42 @@
+"""
+Tests del pool de conexiones
+"""
+import pytest
+from sqlalchemy import create_engine, exc
+
+from app.db_pool import InstrumentedQueuePool, PoolStats, engine_options, instrument
+
+def test_engine_options_from_threads(app):
+    """Test del tamaño del pool derivado de hilos y trabajos en segundo plano"""
+    config = dict(app.config, SQLALCHEMY_DATABASE_URI='postgresql://u:p@localhost/blog',
+                  GUNICORN_THREADS=4, BACKGROUND_WORKERS=1, DB_POOL_SIZE=0)
+    options = engine_options(config)
+    assert options['pool_size'] == 5
+    assert options['pool_pre_ping'] is True
+    assert options['poolclass'] is InstrumentedQueuePool
+    
+    assert engine_options(dict(config, DB_POOL_SIZE=8))['pool_size'] == 8
+    assert engine_options(app.config) == {}
+
+def test_pool_stats_wait_and_saturation(tmp_path):
+    """Test de contadores de checkout, saturación y esperas agotadas"""
+    engine = create_engine(f'sqlite:///{tmp_path}/pool.db', poolclass=InstrumentedQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.05)
+    stats = PoolStats(slow_wait=0.01)
+    instrument(engine, stats)
+    
+    first = engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    first.close()
+    with engine.connect():
+        pass
+    
+    info = stats.as_dict(capacity=1)
+    assert info['checkouts'] == 2
+    assert info['checked_out'] == 0
+    assert info['peak_saturation'] == 1.0
+    assert info['timeouts'] == 1
+    assert info['slow_waits'] >= 1
+    assert info['connects'] == 1
+    engine.dispose()
@@ -0,0 +1,124 @@
+"""
+Tests de variantes de imágenes subidas
+"""
+import io
+import os
+import pytest
+from app.models import db, User, Post
+from app.uploads import upload_path, IMMUTABLE_CACHE_CONTROL
+
+PIL = pytest.importorskip('PIL')
+from PIL import Image
+
+@pytest.fixture
+def logged_in(app, client, tmp_path):
+    """Usuario con sesión iniciada y carpeta de subidas temporal"""
+    app.static_folder = str(tmp_path)
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / 'uploads')
+    user = User(username='autor', email='autor@test.com')
+    user.set_password('pass')
+    db.session.add(user)
+    db.session.commit()
+    client.post('/auth/login', data={'email': 'autor@test.com', 'password': 'pass'})
+    return tmp_path
+
+def make_image(width, height, fmt='JPEG'):
+    data = io.BytesIO()
+    Image.new('RGB', (width, height), 'red').save(data, fmt)
+    data.seek(0)
+    return data
+
+def test_upload_generates_variants(client, logged_in):
+    """Test de generación de miniatura y tamaño medio al crear"""
+    response = client.post('/post/create', data={
+        'title': 'Con imagen',
+        'content': 'Contenido',
+        'image': (make_image(2000, 1000), 'foto.jpg')
+    }, content_type='multipart/form-data')
+    assert response.status_code == 302
+    
+    post = Post.query.filter_by(title='Con imagen').first()
+    thumb = post.image_variants['thumb']
+    medium = post.image_variants['medium']
+    
+    assert (thumb['width'], thumb['height']) == (400, 200)
+    assert medium['width'] == 1200
+    assert os.path.exists(upload_path(thumb['src']))
+    assert 'webp' in thumb
+    
+    page = client.get(f'/post/view/{post.id}').get_data(as_text=True)
+    assert 'srcset=' in page
+    assert medium['src'] in page
+
+def test_small_images_are_not_upscaled(client, logged_in):
+    """Test de imágenes más pequeñas que la variante"""
+    client.post('/post/create', data={
+        'title': 'Pequeña',
+        'content': 'Contenido',
+        'image': (make_image(300, 300, 'PNG'), 'icono.png')
+    }, content_type='multipart/form-data')
+    
+    post = Post.query.filter_by(title='Pequeña').first()
+    assert post.image_variants['medium']['width'] == 300
+    assert post.image_variants['medium']['src'].endswith('.png')
+
+def create_post(client, title, image):
+    client.post('/post/create', data={
+        'title': title,
+        'content': 'Contenido',
+        'image': (image, 'foto.jpeg')
+    }, content_type='multipart/form-data')
+    return Post.query.filter_by(title=title).first()
+
+def test_identical_uploads_are_stored_once(client, logged_in):
+    """Test de deduplicación por contenido"""
+    first = create_post(client, 'Primera', make_image(50, 50))
+    second = create_post(client, 'Segunda', make_image(50, 50))
+    
+    assert first.image_url == second.image_url
+    assert first.image_url.endswith('.jpg')
+    name = os.path.basename(first.image_url).split('.')[0]
+    assert first.image_url == f'uploads/{name[:2]}/{name[2:4]}/{name}.jpg'
+    
+    originals = [f for _, _, files in os.walk(logged_in) for f in files if f.startswith(name + '.')]
+    assert originals == [f'{name}.jpg']
+
+def test_shared_upload_is_removed_with_last_reference(client, logged_in):
+    """Test de eliminación cuando ninguna publicación usa el archivo"""
+    first = create_post(client, 'Primera', make_image(50, 50))
+    second = create_post(client, 'Segunda', make_image(50, 50))
+    path = upload_path(first.image_url)
+    thumb = upload_path(first.image_variants['thumb']['src'])
+    first_id, second_id = first.id, second.id
+    
+    client.post(f'/post/delete/{first_id}')
+    assert os.path.exists(path)
+    
+    client.post(f'/post/delete/{second_id}')
+    assert not os.path.exists(path)
+    assert not os.path.exists(thumb)
+
+def test_uploads_are_served_immutable(client, logged_in):
+    """Test de caché permanente para archivos direccionados por contenido"""
+    post = create_post(client, 'Primera', make_image(50, 50))
+    
+    response = client.get(f'/static/{post.image_url}')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
+
+def test_reupload_same_image_keeps_variants(client, logged_in):
+    """Test de edición subiendo otra vez la misma imagen"""
+    post = create_post(client, 'Misma', make_image(60, 60))
+    image_url, variants = post.image_url, post.image_variants
+    
+    response = client.post(f'/post/update/{post.id}', data={
+        'title': 'Misma',
+        'content': 'Editado',
+        'image': (make_image(60, 60), 'foto.jpeg')
+    }, content_type='multipart/form-data', follow_redirects=True)
+    
+    assert 'Formato de imagen no válido' not in response.get_data(as_text=True)
+    db.session.expire_all()
+    assert post.image_url == image_url
+    assert post.image_variants == variants
+    assert os.path.exists(upload_path(image_url))
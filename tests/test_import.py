@@ -0,0 +1,126 @@
+"""
+Tests de importación masiva
+"""
+import gzip
+import json
+from app.models import db, User, Post, Tag
+
+def write_ndjson(path, rows):
+    path.write_text('\n'.join(json.dumps(row) for row in rows) + '\n', encoding='utf-8')
+    return str(path)
+
+def test_import_users_posts_and_comments(app, runner, client, tmp_path):
+    """Test de importación NDJSON con autores y etiquetas por clave natural"""
+    users = write_ndjson(tmp_path / 'users.ndjson', [
+        {'username': 'ana', 'email': 'ana@test.com', 'role': 'editor'},
+        {'username': 'luis', 'email': 'luis@test.com'},
+        {'username': 'ana', 'email': 'otra@test.com'},
+    ])
+    result = runner.invoke(args=['import', 'users', users])
+    assert '2 filas importadas, 1 omitidas' in result.output
+    assert 'usuario ana ya existe' in result.output
+    
+    posts = write_ndjson(tmp_path / 'posts.ndjson', [
+        {'id': 10, 'title': 'Música', 'content': '<p>Guitarra <script>x</script></p>', 'author': 'ana',
+         'tags': ['Música', 'Rock']},
+        {'title': 'Viajes', 'content': 'Madrid', 'author': 'luis', 'tags': ['musica']},
+        {'title': 'Sin autor', 'content': 'x', 'author': 'nadie'},
+    ])
+    result = runner.invoke(args=['import', 'posts', posts, '--batch-size', '2'])
+    assert '2 filas importadas, 1 omitidas' in result.output
+    assert 'línea 3: autor nadie no existe' in result.output
+    
+    comments = write_ndjson(tmp_path / 'comments.ndjson', [
+        {'post_id': 10, 'content': 'Genial', 'author': 'luis'},
+        {'post_id': 99, 'content': 'Perdido', 'author': 'luis'},
+    ])
+    result = runner.invoke(args=['import', 'comments', comments])
+    assert '1 filas importadas, 1 omitidas' in result.output
+    
+    post = db.session.get(Post, 10)
+    assert post.content_html == '<p>Guitarra x</p>'
+    assert sorted(tag.slug for tag in post.tags) == ['musica', 'rock']
+    assert Tag.query.count() == 2
+    assert Post.query.filter_by(title='Viajes').one().id == 11
+    
+    ana = User.query.filter_by(username='ana').one()
+    assert ana.role == 'editor'
+    assert not ana.check_password('')
+    assert ana.posts_count == 1
+    assert post.comments_count == 1
+    assert client.get('/api/search?q=guitarra').get_json()['total'] == 1
+
+def test_import_csv_gzip(app, runner, tmp_path):
+    """Test de importación CSV comprimida con etiquetas separadas por |"""
+    user = User(username='ana', email='ana@test.com')
+    user.set_password('pass')
+    db.session.add(user)
+    db.session.commit()
+    
+    path = tmp_path / 'posts.csv.gz'
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+        f.write('title,content,author,tags,created_at\n')
+        f.write('Uno,"Texto, con coma",ana,python|flask,2024-01-02T10:00:00\n')
+        f.write('Dos,Texto,ana,,fecha\n')
+    
+    result = runner.invoke(args=['import', 'posts', str(path), '--no-render'])
+    
+    assert '1 filas importadas, 1 omitidas' in result.output
+    assert 'created_at no es una fecha ISO 8601' in result.output
+    post = Post.query.one()
+    assert post.content == 'Texto, con coma'
+    assert post.content_html is None
+    assert [tag.name for tag in sorted(post.tags, key=lambda t: t.name)] == ['flask', 'python']
+
+def test_import_roundtrip_from_export(app, runner, client, auth_headers, tmp_path):
+    """Test de reimportar una exportación: los ids existentes se omiten"""
+    client.post('/api/posts/batch', headers=auth_headers, json={
+        'posts': [{'title': f'Post {i}', 'content': 'Contenido'} for i in range(3)]
+    })
+    export = tmp_path / 'posts.ndjson.gz'
+    runner.invoke(args=['export', 'posts', '-o', str(export)])
+    
+    result = runner.invoke(args=['import', 'posts', str(export)])
+    
+    assert '0 filas importadas, 3 omitidas' in result.output
+    assert Post.query.count() == 3
+
+def test_import_updates_only_imported_counters(app, runner, tmp_path):
+    """Test de contadores y estadísticas del panel actualizados solo con las filas importadas"""
+    from sqlalchemy import update
+    from app.models import SiteStat
+    from app.stats import reconcile_stats
+    
+    def snapshot():
+        return {(stat.metric, stat.bucket): stat.value
+                for stat in SiteStat.query.all() if stat.metric != 'reconciled_at' and stat.value}
+    
+    runner.invoke(args=['import', 'users', write_ndjson(tmp_path / 'users.ndjson', [
+        {'username': 'ana', 'email': 'ana@test.com'}, {'username': 'otro', 'email': 'otro@test.com'},
+    ])])
+    # Contador desincronizado de un usuario que la importación no toca
+    db.session.execute(update(User).where(User.username == 'otro').values(posts_count=7))
+    db.session.commit()
+    
+    runner.invoke(args=['import', 'posts', write_ndjson(tmp_path / 'posts.ndjson', [
+        {'id': 1, 'title': 'Uno', 'content': 'C', 'author': 'ana', 'category': 'viajes', 'tags': ['playa']},
+        {'title': 'Dos', 'content': 'C', 'author': 'ana', 'tags': ['playa']},
+    ]), '--batch-size', '1'])
+    runner.invoke(args=['import', 'comments', write_ndjson(tmp_path / 'comments.ndjson', [
+        {'post_id': 1, 'content': 'Hola', 'author': 'otro'},
+    ])])
+    db.session.expunge_all()
+    
+    ana, otro = User.query.order_by(User.id).all()
+    assert (ana.posts_count, ana.comments_count) == (2, 0)
+    assert (otro.posts_count, otro.comments_count) == (7, 1)
+    assert db.session.get(Post, 1).comments_count == 1
+    assert Tag.query.filter_by(slug='playa').one().posts_count == 2
+    
+    imported = snapshot()
+    assert imported[('users', '')] == 2
+    assert imported[('posts', '')] == 2
+    assert imported[('comments', '')] == 1
+    assert imported[('category', 'viajes')] == 1
+    reconcile_stats()
+    assert snapshot() == imported
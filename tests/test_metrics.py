@@ -0,0 +1,122 @@
+"""
+Tests de métricas Prometheus (/metrics)
+"""
+import json
+import subprocess
+import sys
+
+from app.metrics import Registry
+from app.models import db, User
+
+def test_metrics_access(app, client):
+    """Test de acceso a /metrics: administradores o token del scraper"""
+    assert client.get('/metrics').status_code == 403
+
+    app.config['METRICS_TOKEN'] = 'secreto'
+    assert client.get('/metrics', headers={'Authorization': 'Bearer otro'}).status_code == 403
+    response = client.get('/metrics', headers={'Authorization': 'Bearer secreto'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+
+    admin = User(username='admin', email='admin@test.com', role='admin')
+    admin.set_password('adminpass')
+    db.session.add(admin)
+    db.session.commit()
+    client.post('/auth/login', data={'email': 'admin@test.com', 'password': 'adminpass'})
+    assert client.get('/metrics').status_code == 200
+
+def test_metrics_per_endpoint(app, client, auth_headers):
+    """Test de latencia, estado, tamaño y consultas registrados por endpoint"""
+    client.post('/api/posts', headers=auth_headers, json={'title': 'Post', 'content': 'Contenido'})
+    client.get('/blog')
+    client.get('/blog')
+    client.get('/api/posts/999')
+
+    app.config['METRICS_TOKEN'] = 'secreto'
+    body = client.get('/metrics', headers={'Authorization': 'Bearer secreto'}).get_data(as_text=True)
+
+    assert 'http_requests_total{endpoint="home.blog",method="GET",status="200"} 2' in body
+    assert 'http_requests_total{endpoint="api.get_post",method="GET",status="404"} 1' in body
+    assert 'http_request_duration_seconds_count{endpoint="home.blog",method="GET"} 2' in body
+    assert 'http_request_duration_seconds_bucket{endpoint="home.blog",method="GET",le="+Inf"} 2' in body
+    assert 'http_response_size_bytes_count{endpoint="home.blog"} 2' in body
+    assert 'http_request_queries_count{endpoint="api.create_post"} 1' in body
+    # La propia petición a /metrics está en curso
+    assert 'http_requests_in_progress 1' in body
+
+    # La creación hace consultas: ninguna observación en la cubeta de 0
+    line = next(line for line in body.splitlines()
+                if line.startswith('http_request_queries_bucket{endpoint="api.create_post",le="0"}'))
+    assert line.endswith(' 0')
+
+def test_metrics_aggregated_across_processes(tmp_path):
+    """Test de suma de los archivos de varios workers; los gauges solo de procesos vivos"""
+    def registry():
+        r = Registry(str(tmp_path))
+        r.counter('requests_total', 'Peticiones', ('endpoint',))
+        r.gauge('in_progress', 'En curso')
+        r.histogram('latency_seconds', 'Latencia', buckets=(0.1, 1.0))
+        return r
+
+    # Worker terminado: su pid ya no existe
+    finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                              capture_output=True, text=True).stdout.strip()
+    (tmp_path / f'{finished}-0000.json').write_text(json.dumps({'pid': int(finished), 'values': [
+        ['requests_total', ['home.blog'], 3],
+        ['in_progress', [], 5],
+        ['latency_seconds', [], [[1, 0], 0.05, 1]],
+    ]}))
+
+    current = registry()
+    current.inc('requests_total', ('home.blog',), 2)
+    current.inc('in_progress')
+    current.observe('latency_seconds', 2)
+
+    body = current.render()
+    assert 'requests_total{endpoint="home.blog"} 5' in body
+    assert 'in_progress 1' in body
+    assert 'latency_seconds_bucket{le="0.1"} 1' in body
+    assert 'latency_seconds_bucket{le="1.0"} 1' in body
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in body
+    assert 'latency_seconds_count 2' in body
+    assert json.loads((tmp_path / current.path.rsplit('/', 1)[1]).read_text())['values']
+
+    # El archivo del worker terminado se fundió en archived.json, sin contarse dos veces
+    assert not (tmp_path / f'{finished}-0000.json').exists()
+    assert sorted(path.name for path in tmp_path.glob('*.json')) == \
+        sorted(['archived.json', current.path.rsplit('/', 1)[1]])
+    body = current.render()
+    assert 'requests_total{endpoint="home.blog"} 5' in body
+    assert 'latency_seconds_count 2' in body
+
+def test_metrics_compaction_accumulates(tmp_path):
+    """Test de archivos de varios workers terminados fundidos en un único archivo"""
+    registry = Registry(str(tmp_path))
+    registry.counter('requests_total', 'Peticiones')
+    registry.histogram('latency_seconds', 'Latencia', buckets=(0.1,))
+    for run in range(3):
+        finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                                  capture_output=True, text=True).stdout.strip()
+        (tmp_path / f'{finished}-{run}.json').write_text(json.dumps({'pid': int(finished), 'values': [
+            ['requests_total', [], 2],
+            ['latency_seconds', [], [[1], 0.05, 1]],
+        ]}))
+        registry.compact()
+
+    assert [path.name for path in tmp_path.glob('*.json')] == ['archived.json']
+    body = registry.render()
+    assert 'requests_total 6' in body
+    assert 'latency_seconds_bucket{le="0.1"} 3' in body
+
+def test_metrics_skip_files_already_compacted(tmp_path):
+    """Test de archivo ya fundido en archived.json pero sin borrar: no se cuenta dos veces"""
+    registry = Registry(str(tmp_path))
+    registry.counter('requests_total', 'Peticiones')
+    # compact() interrumpido entre la escritura de archived.json y el borrado
+    # (el pid 0 cuenta como vivo: este compact() no lo toca y lo ve solo la lectura)
+    (tmp_path / '0-0000.json').write_text(json.dumps({'pid': 0, 'values': [['requests_total', [], 2]]}))
+    (tmp_path / 'archived.json').write_text(json.dumps({
+        'pid': None, 'values': [['requests_total', [], 2]], 'compacted': ['0-0000.json'],
+    }))
+
+    assert 'requests_total 2' in registry.render()
@@ -79,3 +79,50 @@ def test_comment_creation(app):
         assert comment.id is not None
         assert comment.author.username == 'commenter'
         assert comment.post.title == 'Post'
+
+def test_password_rehash_on_login(app):
+    """Test de actualización de hashes con parámetros antiguos"""
+    from werkzeug.security import generate_password_hash
+    
+    with app.app_context():
+        user = User(username='legacy', email='legacy@test.com')
+        user.password_hash = generate_password_hash('password123', method='pbkdf2:sha256:1000')
+        
+        assert user.check_password('password123')
+        assert user.password_hash.startswith(app.config['PASSWORD_HASH_METHOD'] + '$')
+        assert user.check_password('password123')
+
+def test_password_pool_back_pressure():
+    """Test de rechazo cuando el pool de contraseñas está saturado"""
+    import threading
+    import time
+    import pytest
+    from app.passwords import PasswordPool, PasswordPoolBusy
+    
+    pool = PasswordPool(workers=1, queue_limit=0, timeout=0.01)
+    try:
+        # Ocupar el único hueco del pool
+        busy = threading.Thread(target=pool.run, args=(time.sleep, 1))
+        busy.start()
+        time.sleep(0.1)
+        
+        with pytest.raises(PasswordPoolBusy):
+            pool.run(len, 'x')
+        
+        busy.join()
+        assert pool.run(len, 'x') == 1
+    finally:
+        pool.shutdown()
+
+def test_render_content():
+    """Test de sanitización y campos derivados del contenido"""
+    from app.content import render_content
+    
+    rendered = render_content('<p>Hola <script>alert(1)</script>mundo</p><p>' + 'palabra ' * 400 + '</p>')
+    
+    assert '<script>' not in rendered['content_html']
+    assert rendered['content_html'].startswith('<p>Hola')
+    assert rendered['excerpt'].startswith('Hola alert(1)mundo palabra')
+    assert len(rendered['excerpt']) <= 151
+    assert rendered['word_count'] == 402
+    assert rendered['reading_time'] == 3
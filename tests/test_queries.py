@@ -0,0 +1,87 @@
+"""
+Tests de presupuesto de consultas por endpoint (detección de N+1)
+"""
+import pytest
+from app.models import db, User, Post, Comment
+
+# Consultas máximas por petición, independientes del número de filas
+# (incluye la consulta ligera del validador ETag donde aplica)
+QUERY_BUDGETS = {
+    '/blog': 2,
+    '/search?q=contenido': 2,
+    '/post/post': 1,
+    '/post/view/{post_id}': 4,
+    '/tag/general': 2,
+    '/api/posts': 3,
+    '/api/tags': 1,
+    '/api/tags/general/posts': 3,
+    '/api/posts/{post_id}/comments': 2,
+}
+
+@pytest.fixture
+def seeded(app):
+    """Varias publicaciones y comentarios de autores distintos"""
+    authors = []
+    for i in range(3):
+        user = User(username=f'autor{i}', email=f'autor{i}@test.com')
+        user.set_password('pass')
+        authors.append(user)
+    db.session.add_all(authors)
+    db.session.commit()
+    
+    posts = []
+    for i in range(9):
+        post = Post(title=f'Post {i}', content='Contenido de prueba', user_id=authors[i % 3].id)
+        posts.append(post)
+    db.session.add_all(posts)
+    db.session.commit()
+    
+    for i in range(6):
+        db.session.add(Comment(content=f'Comentario {i}', user_id=authors[i % 3].id, post_id=posts[0].id))
+    db.session.commit()
+    
+    from app.tags import set_post_tags
+    for post in posts:
+        set_post_tags(post, ['General', f'Tema {post.id % 3}'])
+    db.session.commit()
+    
+    post_id = posts[0].id
+    
+    # Fuera del presupuesto: índice de búsqueda y sesión sin objetos cacheados
+    from app.search import rebuild_index
+    rebuild_index()
+    db.session.expunge_all()
+    return {'post_id': post_id}
+
+@pytest.mark.parametrize('url', QUERY_BUDGETS)
+def test_endpoint_query_budget(client, seeded, query_budget, url):
+    """Test de consultas por endpoint dentro del presupuesto declarado"""
+    with query_budget(QUERY_BUDGETS[url]):
+        response = client.get(url.format(**seeded))
+    
+    assert response.status_code == 200
+
+def test_admin_dashboard_query_budget(client, seeded, query_budget):
+    """Test de consultas del panel de administración"""
+    admin = User(username='admin', email='admin@test.com', role='admin')
+    admin.set_password('adminpass')
+    db.session.add(admin)
+    db.session.commit()
+    client.post('/auth/login', data={'email': 'admin@test.com', 'password': 'adminpass'})
+    db.session.expunge_all()
+    
+    # Instantánea de estadísticas + usuarios y publicaciones recientes
+    with query_budget(3) as statements:
+        response = client.get('/admin/dashboard')
+    
+    assert response.status_code == 200
+    assert not any('count(' in statement.lower() for statement in statements)
+
+def test_query_count_header(app, client, seeded):
+    """Test de las cabeceras de consultas por petición usadas por los benchmarks"""
+    app.config['QUERY_COUNT_HEADER'] = True
+    
+    response = client.get(f'/api/posts/{seeded["post_id"]}/comments')
+    
+    assert response.headers['X-Query-Count'] == str(QUERY_BUDGETS['/api/posts/{post_id}/comments'])
+    assert float(response.headers['X-DB-Time']) >= 0
@@ -0,0 +1,138 @@
+"""
+Tests del registro de consultas lentas y de las estadísticas por huella
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+
+from sqlalchemy import text
+
+from app import create_app
+from app.models import db
+from app.query_log import QueryStats, fingerprint, parameter_shape
+
+def test_fingerprint_normalization():
+    """Test de huellas iguales para la misma sentencia con distintos valores"""
+    assert fingerprint("SELECT * FROM posts WHERE id = 5 AND title = 'Hola ''mundo'''") == \
+        'SELECT * FROM posts WHERE id = ? AND title = ?'
+    assert fingerprint('SELECT * FROM posts WHERE id IN (?, ?, ?)') == \
+        fingerprint('SELECT * FROM posts WHERE id IN (?)') == 'SELECT * FROM posts WHERE id IN (...)'
+    assert fingerprint('SELECT *\n  FROM users WHERE email = %(email_1)s LIMIT %(param_1)s') == \
+        'SELECT * FROM users WHERE email = ? LIMIT ?'
+    assert fingerprint('SELECT id::text FROM posts_1 WHERE id = $1') == 'SELECT id::text FROM posts_1 WHERE id = ?'
+    assert fingerprint('INSERT INTO tags (name, slug) VALUES (?, ?), (?, ?) RETURNING id') == \
+        'INSERT INTO tags (name, slug) VALUES (...) RETURNING id'
+
+    assert parameter_shape(('secreto', 3, None)) == '(str, int, NULL)'
+    assert parameter_shape({'email_1': 'a@b.c'}) == '{email_1: str}'
+    assert parameter_shape((1, 2, 3, 4, 5)) == '(int × 5)'
+    assert parameter_shape([(1, 'a'), (2, 'b')], executemany=True) == '2 × (int, str)'
+
+def test_slow_query_log(app, client, auth_headers, caplog):
+    """Test de consultas lentas registradas por endpoint, sin valores y con su plan"""
+    app.config['SLOW_QUERY_THRESHOLD'] = 0.0001
+    stats = app.extensions['query_stats']
+    stats.reset()
+
+    with caplog.at_level(logging.INFO, logger='app.query_log'):
+        client.post('/auth/login', data={'email': 'test@test.com', 'password': 'password123'})
+
+    slow = [record.getMessage() for record in caplog.records if record.levelno == logging.WARNING]
+    assert any(' en auth.login: SELECT ' in message and 'parámetros=(str' in message for message in slow)
+    assert 'test@test.com' not in caplog.text
+
+    entries = stats.top(limit=50, endpoint='auth.login')
+    assert entries and all(entry['slow'] == entry['count'] for entry in entries)
+    user_query = next(entry for entry in entries if 'FROM users WHERE users.email = ?' in entry['fingerprint'])
+    assert 'users' in user_query['plan']
+    assert 'Plan de la consulta lenta' in caplog.text
+
+def test_slow_cte_explained(app, client):
+    """Test de plan capturado también para consultas con WITH"""
+    app.config['SLOW_QUERY_THRESHOLD'] = 0.0001
+    stats = app.extensions['query_stats']
+    stats.reset()
+    db.session.execute(text('WITH recent AS (SELECT id FROM posts ORDER BY created_at DESC LIMIT 5) '
+                            'SELECT count(*) FROM recent'))
+
+    entry = next(entry for entry in stats.top(limit=50) if entry['fingerprint'].startswith('WITH recent'))
+    assert entry['slow'] == 1
+    assert 'posts' in entry['plan']
+
+def test_queries_top_command(app, client, runner):
+    """Test del informe de huellas más costosas"""
+    app.config['SLOW_QUERY_THRESHOLD'] = 0
+    app.extensions['query_stats'].reset()
+    for page in range(3):
+        client.get(f'/blog?page={page + 1}')
+
+    result = runner.invoke(args=['queries', 'top', '-n', '3', '--sort', 'count', '--endpoint', 'home.blog'])
+    assert result.exit_code == 0, result.output
+    assert result.output.startswith('1. ')
+    assert 'home.blog (3)' in result.output
+    assert ' 0 lentas' in result.output
+
+    runner.invoke(args=['queries', 'reset'])
+    result = runner.invoke(args=['queries', 'top'])
+    assert 'Sin estadísticas de consultas' in result.output
+
+def test_query_stats_across_processes(tmp_path):
+    """Test de suma de las estadísticas de varios workers y límite de huellas"""
+    worker = QueryStats(str(tmp_path), max_fingerprints=2)
+    worker.record('SELECT ?', 'home.blog', 0.002)
+    worker.record('SELECT ?', 'api.get_posts', 0.004, slow=True)
+    worker.record('SELECT * FROM posts', 'home.blog', 0.001)
+    worker.record('SELECT * FROM users', 'home.blog', 0.001)
+    # Archivo de otro worker
+    (tmp_path / '1-0000.json').write_text(json.dumps({'pid': 1, 'values': [
+        ['SELECT ?', 'home.blog', [1, 0.010, 0.010, 0]],
+    ], 'plans': {'SELECT ?': 'SCAN CONSTANT ROW'}}))
+
+    top = {entry['fingerprint']: entry for entry in worker.top()}
+    assert top['SELECT ?']['count'] == 3
+    assert top['SELECT ?']['endpoints'] == {'home.blog': 2, 'api.get_posts': 1}
+    assert top['SELECT ?']['slow'] == 1
+    assert top['SELECT ?']['plan'] == 'SCAN CONSTANT ROW'
+    assert top['(otras huellas)']['count'] == 1
+    assert [entry['fingerprint'] for entry in worker.top(sort='max', limit=1)] == ['SELECT ?']
+
+def test_query_stats_outside_requests(tmp_path):
+    """Test de sentencias fuera de peticiones: sin arranque ni comandos cortos, sí comandos largos"""
+    # Sin el fixture ``app``: pytest-flask abriría un contexto de petición
+    app = create_app('testing')
+    assert app.extensions['query_stats'].top() == []  # create_all del arranque
+    stats = app.extensions['query_stats'] = QueryStats(str(tmp_path))
+    runner = app.test_cli_runner()
+
+    with app.app_context():
+        runner.invoke(args=['queries', 'top'])
+        assert list(tmp_path.glob('*.json')) == []
+
+        result = runner.invoke(args=['seed', '--users', '2', '--posts', '5', '--comments', '5', '--tags', '2'])
+        assert result.exit_code == 0, result.output
+        assert {endpoint for entry in stats.top(limit=100) for endpoint in entry['endpoints']} == {'-'}
+        assert stats.path and os.path.exists(stats.path)
+        db.session.remove()
+        db.drop_all()
+
+def test_query_stats_compacts_dead_processes(tmp_path):
+    """Test de archivos de procesos terminados fundidos en archived.json"""
+    for run in range(2):
+        finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                                  capture_output=True, text=True).stdout.strip()
+        (tmp_path / f'{finished}-{run}.json').write_text(json.dumps({'pid': int(finished), 'values': [
+            ['SELECT ?', '-', [2, 0.5, 0.4, 1]],
+        ], 'plans': {'SELECT ?': 'SCAN posts'}}))
+
+    stats = QueryStats(str(tmp_path))
+    stats.record('SELECT ?', 'home.blog', 0.1)
+    entry = stats.top()[0]
+
+    assert entry['count'] == 5
+    assert entry['endpoints'] == {'-': 4, 'home.blog': 1}
+    assert entry['max'] == 0.4
+    assert entry['plan'] == 'SCAN posts'
+    assert sorted(path.name for path in tmp_path.glob('*.json')) == \
+        sorted(['archived.json', stats.path.rsplit('/', 1)[1]])
@@ -0,0 +1,122 @@
+"""
+Tests de planes de ejecución (EXPLAIN) de las consultas de los listados
+
+Se capturan las consultas que ejecuta cada endpoint y se comprueba que
+ninguna recorre una tabla completa sin índice ni ordena en memoria. En
+PostgreSQL se desactiva ``enable_seqscan`` para que el plan refleje los
+índices disponibles aunque la tabla de prueba sea pequeña.
+"""
+import json
+import re
+
+import pytest
+from sqlalchemy import event, insert, text
+from app.models import db, User, Post, Comment, Tag, post_tags
+
+ENDPOINTS = {
+    'home.blog': '/blog',
+    'post.view': '/post/view/{post_id}',
+    'admin.dashboard': '/admin/dashboard',
+    'api.get_comments': '/api/posts/{post_id}/comments',
+    'home.tag': '/tag/tema-0',
+    'api.get_tags': '/api/tags',
+}
+
+# SQLite: "SCAN posts" sin "USING ... INDEX" es un recorrido secuencial
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+# Tablas de tamaño acotado que no crece con los datos; recorrerlas es correcto
+BOUNDED_TABLES = {'site_stats'}
+
+@pytest.fixture
+def seeded(app, client):
+    """Base con suficientes filas para que el planificador prefiera los índices"""
+    users = [User(username=f'autor{i}', email=f'autor{i}@test.com', password_hash='-') for i in range(20)]
+    admin = User(username='admin', email='admin@test.com', role='admin')
+    admin.set_password('adminpass')
+    db.session.add_all([*users, admin])
+    db.session.commit()
+    
+    posts = [Post(title=f'Post {i}', content='Contenido', category=f'cat{i % 5}', user_id=users[i % 20].id)
+             for i in range(300)]
+    db.session.add_all(posts)
+    db.session.commit()
+    
+    db.session.add_all([Comment(content=f'Comentario {i}', user_id=users[i % 20].id, post_id=posts[i % 300].id)
+                        for i in range(1500)])
+    db.session.commit()
+    
+    tags = [Tag(name=f'Tema {i}', slug=f'tema-{i}') for i in range(10)]
+    db.session.add_all(tags)
+    db.session.flush()
+    db.session.execute(insert(post_tags), [{'post_id': post.id, 'tag_id': tags[i % 10].id}
+                                           for i, post in enumerate(posts)])
+    db.session.commit()
+    from app.counters import repair_counters
+    repair_counters()
+    
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(text('ANALYZE'))
+    db.session.commit()
+    
+    client.post('/auth/login', data={'email': 'admin@test.com', 'password': 'adminpass'})
+    post_id = posts[0].id
+    db.session.expunge_all()
+    return {'post_id': post_id}
+
+def capture_statements(client, url):
+    """Sentencias SELECT (con parámetros) ejecutadas al pedir ``url``"""
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+    
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    
+    assert response.status_code == 200
+    return statements
+
+def plan_problems(statement, parameters):
+    """Recorridos secuenciales y ordenaciones en memoria del plan de una sentencia"""
+    connection = db.session.connection()
+    
+    if connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        plan = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        nodes = [plan[0]['Plan']]
+        problems = []
+        while nodes:
+            node = nodes.pop()
+            if node['Node Type'] in ('Seq Scan', 'Sort') and node.get('Relation Name') not in BOUNDED_TABLES:
+                problems.append(f"{node['Node Type']} {node.get('Relation Name', '')}".strip())
+            nodes.extend(node.get('Plans', ()))
+        return problems
+    
+    rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+    problems = []
+    for row in rows:
+        scan = SQLITE_FULL_SCAN.match(row[-1])
+        if (scan and scan.group(1) not in BOUNDED_TABLES) or 'USE TEMP B-TREE' in row[-1]:
+            problems.append(row[-1])
+    return problems
+
+@pytest.mark.parametrize('endpoint', ENDPOINTS)
+def test_endpoint_query_plans(client, seeded, endpoint):
+    """Test de consultas por endpoint resueltas con índices"""
+    statements = capture_statements(client, ENDPOINTS[endpoint].format(**seeded))
+    assert statements
+    
+    failures = []
+    for statement, parameters in statements:
+        problems = plan_problems(statement, parameters)
+        if problems:
+            failures.append(f'{", ".join(problems)}:\n  {statement}')
+    db.session.rollback()
+    
+    assert not failures, f'{endpoint}: consultas sin índice\n' + '\n'.join(failures)
@@ -0,0 +1,65 @@
+"""
+Tests del generador de datos de prueba (flask seed)
+"""
+from sqlalchemy import func, select, text
+from app.models import db, User, Post, Comment, Tag, post_tags, SiteStat
+
+ARGS = ['seed', '--users', '5', '--posts', '40', '--comments', '300', '--tags', '8', '--batch-size', '16']
+
+def snapshot():
+    return (
+        db.session.execute(select(Post.id, Post.title, Post.user_id, Post.category, Post.image_url)
+                           .order_by(Post.id)).all(),
+        db.session.execute(select(Comment.post_id, Comment.user_id, Comment.content).order_by(Comment.id)).all(),
+        db.session.execute(select(post_tags.c.post_id, post_tags.c.tag_id)
+                           .order_by(post_tags.c.post_id, post_tags.c.tag_id)).all(),
+    )
+
+def test_seed_command(app, runner):
+    """Test de tamaños, contadores y distribución de los datos generados"""
+    result = runner.invoke(args=ARGS)
+    assert result.exit_code == 0, result.output
+    assert 'Datos generados: 5 usuarios, 40 publicaciones, 300 comentarios, 8 etiquetas' in result.output
+
+    assert db.session.scalar(select(func.count(User.id))) == 5
+    assert db.session.scalar(select(User.role).where(User.username == 'usuario0')) == 'admin'
+    assert db.session.scalar(select(func.count(Post.id)).where(Post.content_html.is_(None))) == 0
+
+    # Contadores y estadísticas actualizados por lote
+    counts = db.session.scalars(select(Post.comments_count).order_by(Post.comments_count.desc())).all()
+    assert sum(counts) == 300
+    assert counts[0] > 300 / 40 * 3  # ley de potencias: la más comentada concentra muchos
+    tag_total = db.session.scalar(select(func.sum(Tag.posts_count)))
+    assert tag_total == db.session.scalar(select(func.count()).select_from(post_tags))
+    assert db.session.get(SiteStat, ('posts', '')).value == 40
+
+    # Las imágenes son solo metadatos con variantes
+    post = db.session.scalars(select(Post).where(Post.image_url.is_not(None))).first()
+    assert post.image_variants['thumb']['width'] <= 400
+
+    result = runner.invoke(args=ARGS)
+    assert result.exit_code != 0
+    assert 'ya tiene datos generados' in result.output
+
+def test_seed_deterministic(app, runner):
+    """Test de datos idénticos con la misma semilla"""
+    runner.invoke(args=ARGS)
+    first = snapshot()
+
+    db.session.remove()
+    db.drop_all()
+    db.session.execute(text('DELETE FROM posts_fts'))
+    db.create_all()
+    db.session.commit()
+
+    runner.invoke(args=ARGS)
+    assert snapshot() == first
+
+    db.session.remove()
+    db.drop_all()
+    db.session.execute(text('DELETE FROM posts_fts'))
+    db.create_all()
+    db.session.commit()
+
+    runner.invoke(args=[*ARGS, '--seed', '7'])
+    assert snapshot() != first
@@ -0,0 +1,49 @@
+"""
+Tests de las estadísticas del panel de administración
+"""
+from app.models import db, SiteStat
+from app.stats import dashboard_stats, reconcile_stats
+
+def snapshot():
+    return {(stat.metric, stat.bucket): stat.value
+            for stat in SiteStat.query.all() if stat.metric != 'reconciled_at' and stat.value}
+
+def test_stats_maintained_on_writes(app, client, auth_headers):
+    """Test de estadísticas incrementales iguales al recálculo completo"""
+    ids = [client.post('/api/posts', headers=auth_headers, json={'title': f'P{i}', 'content': 'C', 'category': 'tech'})
+           .get_json()['post']['id'] for i in range(3)]
+    client.post('/api/posts/batch', headers=auth_headers, json={'posts': [
+        {'title': 'Lote', 'content': 'C'}, {'title': 'Lote 2', 'content': 'C', 'category': 'tech'}
+    ]})
+    client.put(f'/api/posts/{ids[0]}', headers=auth_headers, json={'category': 'vida'})
+    client.post(f'/api/posts/{ids[1]}/comments', headers=auth_headers, json={'content': 'Hola'})
+    client.post('/api/comments/batch', headers=auth_headers, json={'comments': [
+        {'post_id': ids[1], 'content': 'Uno'}, {'post_id': ids[2], 'content': 'Dos'}
+    ]})
+    client.delete(f'/api/posts/{ids[1]}', headers=auth_headers)
+    db.session.expunge_all()
+    
+    incremental = snapshot()
+    assert incremental[('posts', '')] == 4
+    assert incremental[('comments', '')] == 1
+    assert incremental[('category', 'tech')] == 2
+    assert incremental[('category', 'vida')] == 1
+    
+    reconcile_stats()
+    assert snapshot() == incremental
+    
+    stats = dashboard_stats()
+    assert (stats['total_users'], stats['total_posts'], stats['total_comments']) == (1, 4, 1)
+    assert stats['category_stats'][0] == ('tech', 2)
+    assert stats['daily_stats'][0][1:] == (1, 4, 1)
+    assert stats['stats_reconciled_at'] is not None
+
+def test_stats_reconcile_command(app, runner):
+    """Test del recálculo desde el CLI"""
+    db.session.execute(SiteStat.__table__.delete())
+    db.session.commit()
+    
+    result = runner.invoke(args=['stats', 'reconcile'])
+    assert result.exit_code == 0
+    assert 'Estadísticas recalculadas' in result.output
+    assert dashboard_stats()['total_users'] == 0
@@ -0,0 +1,105 @@
+"""
+Tests de etiquetas de publicaciones
+"""
+from app.models import db, Post, Tag
+
+def tag_counts():
+    db.session.expire_all()
+    return {tag.slug: tag.posts_count for tag in Tag.query.all()}
+
+def test_create_post_with_tags(client, auth_headers):
+    """Test de etiquetas resueltas por slug al crear y al editar por la API"""
+    response = client.post('/api/posts', headers=auth_headers, json={
+        'title': 'Con etiquetas', 'content': 'Contenido', 'tags': ['Python', 'python ', 'Bases de Datos']
+    })
+    assert response.status_code == 201
+    post_id = response.get_json()['post']['id']
+
+    client.post('/api/posts', headers=auth_headers, json={'title': 'Otra', 'content': 'Texto', 'tags': 'PYTHON'})
+    assert tag_counts() == {'python': 2, 'bases-de-datos': 1}
+
+    data = client.get(f'/api/posts/{post_id}').get_json()
+    assert sorted(tag['slug'] for tag in data['tags']) == ['bases-de-datos', 'python']
+
+    response = client.put(f'/api/posts/{post_id}', headers=auth_headers, json={'tags': ['Flask']})
+    assert response.status_code == 200
+    assert tag_counts() == {'python': 1, 'bases-de-datos': 0, 'flask': 1}
+    assert [tag['slug'] for tag in client.get(f'/api/posts/{post_id}').get_json()['tags']] == ['flask']
+
+    # Sin 'tags' en la petición no se tocan
+    client.put(f'/api/posts/{post_id}', headers=auth_headers, json={'title': 'Nuevo título'})
+    assert tag_counts()['flask'] == 1
+
+def test_invalid_tags(client, auth_headers):
+    """Test de validación de etiquetas"""
+    response = client.post('/api/posts', headers=auth_headers, json={
+        'title': 'T', 'content': 'C', 'tags': [f'tag {i}' for i in range(11)]
+    })
+    assert response.status_code == 400
+
+    response = client.post('/api/posts', headers=auth_headers, json={'title': 'T', 'content': 'C', 'tags': [1]})
+    assert response.status_code == 400
+    assert Post.query.count() == 0
+
+def test_tag_posts_listing(client, auth_headers):
+    """Test del listado de una etiqueta con el total del contador"""
+    for i in range(3):
+        client.post('/api/posts', headers=auth_headers, json={
+            'title': f'Post {i}', 'content': 'Contenido', 'tags': ['Flask'] if i != 1 else ['Django']
+        })
+
+    data = client.get('/api/tags/flask/posts').get_json()
+    assert data['tag'] == {'name': 'Flask', 'slug': 'flask', 'posts_count': 2}
+    assert data['total'] == 2
+    assert [post['title'] for post in data['posts']] == ['Post 2', 'Post 0']
+
+    page = client.get('/api/tags/flask/posts?per_page=1&after=').get_json()
+    assert [post['title'] for post in page['posts']] == ['Post 2']
+    page = client.get(f'/api/tags/flask/posts?per_page=1&after={page["next_cursor"]}').get_json()
+    assert [post['title'] for post in page['posts']] == ['Post 0']
+
+    assert client.get('/api/tags/no-existe/posts').status_code == 404
+
+    tags = client.get('/api/tags').get_json()['tags']
+    assert [(tag['slug'], tag['posts_count']) for tag in tags] == [('django', 1), ('flask', 2)]
+
+    response = client.get('/tag/flask')
+    assert response.status_code == 200
+    assert b'Post 2' in response.data and b'Post 1' not in response.data
+
+def test_tag_listing_follows_writes(client, auth_headers):
+    """Test de invalidación de listados cacheados al cambiar o borrar etiquetas"""
+    post_id = client.post('/api/posts', headers=auth_headers, json={
+        'title': 'Etiquetada', 'content': 'Contenido', 'tags': ['Flask']
+    }).get_json()['post']['id']
+    assert client.get('/api/tags/flask/posts').get_json()['total'] == 1
+
+    client.put(f'/api/posts/{post_id}', headers=auth_headers, json={'tags': ['Flask', 'Web']})
+    assert client.get('/api/tags/web/posts').get_json()['total'] == 1
+
+    client.delete(f'/api/posts/{post_id}', headers=auth_headers)
+    assert tag_counts() == {'flask': 0, 'web': 0}
+    assert client.get('/api/tags/flask/posts').get_json()['posts'] == []
+    assert client.get('/api/tags').get_json()['tags'] == []
+
+def test_web_post_tags(client, auth_headers):
+    """Test de etiquetas desde los formularios web"""
+    client.post('/auth/login', data={'email': 'test@test.com', 'password': 'password123'})
+    client.post('/post/create', data={'title': 'Web', 'content': 'Contenido', 'tags': 'flask, Web'})
+    post = Post.query.filter_by(title='Web').one()
+
+    response = client.get(f'/post/view/{post.id}')
+    assert b'href="/tag/flask"' in response.data
+
+    client.post(f'/post/update/{post.id}', data={'title': 'Web', 'content': 'Contenido', 'tags': 'web'})
+    assert tag_counts() == {'flask': 0, 'web': 1}
+
+def test_counters_repair_tags(app, client, auth_headers, runner):
+    """Test de reparación de los contadores de etiquetas"""
+    client.post('/api/posts', headers=auth_headers, json={'title': 'T', 'content': 'C', 'tags': ['Flask']})
+    db.session.execute(db.update(Tag).values(posts_count=7))
+    db.session.commit()
+
+    result = runner.invoke(args=['counters', 'repair'])
+    assert '1 etiquetas' in result.output
+    assert tag_counts() == {'flask': 1}